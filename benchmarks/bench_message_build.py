@@ -0,0 +1,39 @@
+"""Per-message build time with and without the shared attachment cache.
+
+Usage: python benchmarks/bench_message_build.py [attachment_mb] [messages]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.email_utils import AttachmentCache, create_message
+
+def bench(label, n, build):
+    start = time.perf_counter()
+    for i in range(n):
+        build(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed / n * 1000:8.2f} ms/message")
+    return elapsed
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'brochure.pdf')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(int(size_mb * 1024 * 1024)))
+
+        body = "Hello <<company_name>>,\n\nWe would like to collaborate with you.\n" * 5
+        print(f"Attachment: {size_mb} MB, {n} messages")
+        before = bench("uncached", n, lambda i: create_message(f"user{i}@example.com", f"Subject {i}", body, [path]))
+        cache = AttachmentCache()
+        after = bench("cached", n, lambda i: create_message(f"user{i}@example.com", f"Subject {i}", body, [path], cache=cache))
+        print(f"Speedup: {before / after:.1f}x")
+
+if __name__ == '__main__':
+    main()
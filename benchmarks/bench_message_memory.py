@@ -0,0 +1,42 @@
+"""Peak Python memory to build one message: in-memory raw vs. streamed spool.
+
+Usage: python benchmarks/bench_message_memory.py [attachment_mb]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.email_utils import AttachmentCache, create_message, create_message_file
+
+def measure(label, build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if hasattr(result, 'close'):
+        result.close()
+    print(f"{label:<22} peak {peak / 1024 / 1024:8.1f} MB   {elapsed * 1000:8.1f} ms")
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 25
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'proposal.pdf')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(int(size_mb * 1024 * 1024)))
+
+        print(f"Attachment: {size_mb} MB")
+        args = ("hello@example.com", "Subject", "Hello,\n\nSee attached.", [path])
+        measure("raw (create_message)", lambda: create_message(*args))
+        cache = AttachmentCache()
+        cache.get(path)
+        measure("raw, warm cache", lambda: create_message(*args, cache=cache))
+        measure("streamed spool", lambda: create_message_file(*args))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Append and load throughput of the sent-log backends.
+
+Usage: python benchmarks/bench_sent_log.py [entries]
+
+The legacy per-row pandas to_csv path is measured on a small sample and
+extrapolated, since running it for 1M rows takes hours.
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from src.sent_log import CsvSentLog, SqliteSentLog, import_csv_log
+
+LEGACY_SAMPLE = 2000
+
+def legacy_append(path, n):
+    for i in range(n):
+        df = pd.DataFrame({
+            'timestamp': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
+            'name': [f"Company {i}"],
+            'email': [f"user{i}@example.com"]
+        })
+        df.to_csv(path, mode='a', index=False, header=not os.path.exists(path))
+
+def timed(label, fn, n=None):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    rate = f" ({n / elapsed:,.0f}/s)" if n else ""
+    print(f"{label:<36} {elapsed:8.2f}s{rate}")
+    return result
+
+def append_all(log, n):
+    for i in range(n):
+        log.append(f"user{i}@example.com", f"Company {i}", campaign="bench")
+    log.close()
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"Entries: {n:,}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = os.path.join(tmp, 'legacy.csv')
+        start = time.perf_counter()
+        legacy_append(legacy, LEGACY_SAMPLE)
+        per_row = (time.perf_counter() - start) / LEGACY_SAMPLE
+        print(f"{'legacy pandas append (extrapolated)':<36} {per_row * n:8.2f}s ({1 / per_row:,.0f}/s)")
+
+        csv_path = os.path.join(tmp, 'sent_log.csv')
+        timed("csv journal append", lambda: append_all(CsvSentLog(csv_path), n), n)
+        timed("legacy pandas load", lambda: set(pd.read_csv(csv_path)['email'].unique()))
+        timed("csv journal load", lambda: CsvSentLog(csv_path).load())
+
+        db_path = os.path.join(tmp, 'sent_log.db')
+        timed("sqlite append (commit per row)", lambda: append_all(SqliteSentLog(db_path), min(n, 100_000)), min(n, 100_000))
+        os.remove(db_path)
+        imported = os.path.join(tmp, 'imported.db')
+        timed("sqlite import from csv", lambda: import_csv_log(csv_path, imported), n)
+        db = SqliteSentLog(imported)
+        timed("sqlite load", db.load)
+        timed("sqlite indexed lookup x10k", lambda: [db.contains(f"user{i}@example.com") for i in range(10_000)], 10_000)
+        db.close()
+
+if __name__ == '__main__':
+    main()
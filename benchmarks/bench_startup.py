@@ -0,0 +1,68 @@
+"""Startup time of main.py for commands that never call the Gmail API.
+
+Usage: python benchmarks/bench_startup.py [repeats]
+
+Runs each command in a fresh interpreter and reports the median wall time,
+plus the slowest top-level imports seen by `python -X importtime`.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'main.py')
+
+def timed_run(args, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, MAIN] + args, cwd=cwd, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL, input=b'n\n', check=False)
+    return time.perf_counter() - start
+
+def timed_run_python(args, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=cwd, check=False)
+    return time.perf_counter() - start
+
+def top_imports(args, cwd, limit=5):
+    result = subprocess.run([sys.executable, '-X', 'importtime', MAIN] + args, cwd=cwd,
+                            capture_output=True, input=b'n\n', check=False)
+    rows = []
+    for line in result.stderr.decode(errors='replace').splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith('  '):
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        os.makedirs(os.path.join(tmp, 'auth'))
+        os.makedirs(os.path.join(tmp, 'data'))
+        with open(os.path.join(tmp, 'auth', 'credentials.json'), 'w') as f:
+            f.write('{}')
+        with open(os.path.join(tmp, 'data', 'contacts.csv'), 'w') as f:
+            f.write("company_name,company_email\nExample Corp,hello@example.com\n")
+        with open(os.path.join(tmp, 'template.txt'), 'w') as f:
+            f.write("Hello <<company_name>>")
+
+        baseline = statistics.median(
+            timed_run_python(['-c', 'pass'], tmp) for _ in range(repeats)
+        )
+        print(f"{'python -c pass':<28} {baseline * 1000:8.1f} ms")
+        commands = [
+            ['--help'],
+            ['--setup'],
+            ['--stats', '-t', 'template.txt'],
+            ['--dry-run', '--yes', '-t', 'template.txt'],
+        ]
+        for args in commands:
+            median = statistics.median(timed_run(args, tmp) for _ in range(repeats))
+            print(f"{' '.join(args):<28} {median * 1000:8.1f} ms")
+            for micros, module in top_imports(args, tmp):
+                print(f"    {module:<24} {micros / 1000:8.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Per-recipient render time: compiled templates vs. the replace-per-column loops.
+
+Usage: python benchmarks/bench_template_render.py [columns] [renders]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.email_utils import render_template
+from src.template_manager import TemplateManager
+
+SUBJECT = "【合作邀請】臺大資訊系卡 × {company_name} 宣傳與贊助合作提案"
+
+def legacy_render(template_content, subject_format, context):
+    """TemplateManager.render before templates were compiled."""
+    body = template_content
+    for key, value in context.items():
+        body = body.replace(f"<<{key}>>", str(value))
+    return subject_format.format(**context), body
+
+def main():
+    columns = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    context = {'company_name': 'Example Corp', 'company_email': 'hello@example.com'}
+    context.update({f'field_{i}': f'value {i}' for i in range(columns)})
+    paragraph = "We would like to collaborate with <<company_name>> on the upcoming event. " * 8
+    body = "Hello <<company_name>>,\n\n" + "\n\n".join([paragraph] * 10) + "\n\n<<field_0>>\nBest regards"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'template.txt')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(body)
+        manager = TemplateManager(path, SUBJECT)
+        manager.load_template()
+        assert manager.render(context) == legacy_render(body, SUBJECT, context)
+
+        print(f"Template: {len(body):,} chars, context: {len(context)} columns, {n:,} renders")
+        cases = [
+            ("legacy TemplateManager.render", lambda: legacy_render(body, SUBJECT, context)),
+            ("email_utils.render_template", lambda: render_template(body, context)),
+            ("compiled TemplateManager.render", lambda: manager.render(context)),
+        ]
+        for label, fn in cases:
+            elapsed = timeit.timeit(fn, number=n)
+            print(f"{label:<34} {elapsed / n * 1e6:8.2f} us/render")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""A local stand-in for the Gmail API client used by EmailEngine.
+
+Supports users().messages().send(...).execute(), batch requests via
+new_batch_http_request, configurable latency and random 429/403 injection.
+"""
+import random
+import threading
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+class _SendRequest:
+    def __init__(self, service, body, media_body):
+        self.service = service
+        self.body = body
+        self.media_body = media_body
+
+    def execute(self, http=None, num_retries=0):
+        self.service.sleep(self.service.latency)
+        return self.service._deliver(self)
+
+class _Batch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, callback=None, request_id=None):
+        self.requests.append((request_id or str(len(self.requests)), request, callback or self.callback))
+
+    def execute(self, http=None):
+        # One round trip for the whole batch
+        self.service.sleep(self.service.latency)
+        self.service.batches += 1
+        for request_id, request, callback in self.requests:
+            try:
+                response, exception = self.service._deliver(request), None
+            except HttpError as e:
+                response, exception = None, e
+            callback(request_id, response, exception)
+
+class FakeGmailService:
+    """Accepts messages in memory after `latency` seconds.
+
+    `rate_limit_rate` / `forbidden_rate` are the probabilities that a send
+    fails with 429 (with Retry-After: `retry_after`) or a non-quota 403.
+    """
+
+    def __init__(self, latency=0.0, rate_limit_rate=0.0, forbidden_rate=0.0,
+                 retry_after=None, seed=0, sleep=time.sleep, keep_messages=False):
+        self.latency = latency
+        self.rate_limit_rate = rate_limit_rate
+        self.forbidden_rate = forbidden_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.sleep = sleep
+        self.keep_messages = keep_messages
+        self.delivered = []
+        self.sent = 0
+        self.rate_limited = 0
+        self.forbidden = 0
+        self.batches = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+
+    # Resource chain: service.users().messages().send(...)
+    def users(self):
+        return self
+
+    def messages(self):
+        return self
+
+    def send(self, userId='me', body=None, media_body=None):
+        return _SendRequest(self, body, media_body)
+
+    def new_batch_http_request(self, callback=None):
+        return _Batch(self, callback)
+
+    def _deliver(self, request):
+        with self.lock:
+            roll = self.random.random()
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                headers = {'status': '429'}
+                if self.retry_after is not None:
+                    headers['retry-after'] = str(self.retry_after)
+                raise HttpError(httplib2.Response(headers), b'Rate limit exceeded')
+            if roll < self.rate_limit_rate + self.forbidden_rate:
+                self.forbidden += 1
+                raise HttpError(httplib2.Response({'status': '403'}), b'Recipient address rejected')
+
+            self.sent += 1
+            if request.media_body is not None:
+                size = request.media_body.size()
+            else:
+                size = len(request.body.get('raw', ''))
+            self.bytes_received += size
+            if self.keep_messages:
+                self.delivered.append(request.body)
+            return {'id': str(self.sent), 'labelIds': ['SENT']}
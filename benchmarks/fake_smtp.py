@@ -0,0 +1,192 @@
+"""A local stand-in SMTP server for exercising SmtpTransport.
+
+Speaks enough ESMTP for smtplib (EHLO with PIPELINING and AUTH, MAIL, RCPT,
+DATA, RSET, NOOP, QUIT). It accepts any credentials (or none, with
+accept_auth=False) and can inject latency, temporary 451 failures and
+permanent 550 rejections. No TLS: point the transport at it with
+starttls=False.
+"""
+import random
+import socket
+import socketserver
+import threading
+import time
+
+class _Handler(socketserver.StreamRequestHandler):
+    # Replies are small separate writes; don't let Nagle hold them back
+    disable_nagle_algorithm = True
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def setup(self):
+        super().setup()
+        self.pending = b''
+        with self.server.fake.lock:
+            self.server.fake.clients.add(self.request)
+
+    def finish(self):
+        with self.server.fake.lock:
+            self.server.fake.clients.discard(self.request)
+        super().finish()
+
+    def readline(self):
+        if self.pending:
+            end = self.pending.find(b'\n')
+            if end != -1:
+                line, self.pending = self.pending[:end + 1], self.pending[end + 1:]
+                return line
+            line, self.pending = self.pending, b''
+            return line + self.rfile.readline()
+        return self.rfile.readline()
+
+    def read_data(self):
+        """Read a DATA payload up to the lone '.' line, in large reads rather than line by line."""
+        buf = bytearray(b'\r\n' + self.pending)
+        self.pending = b''
+        start = 0
+        while True:
+            end = buf.find(b'\r\n.\r\n', start)
+            if end != -1:
+                self.pending = bytes(buf[end + 5:])
+                data = bytes(buf[2:end + 2])
+                return data.replace(b'\r\n..', b'\r\n.')
+            start = max(0, len(buf) - 4)
+            chunk = self.rfile.read1(65536)
+            if not chunk:
+                return None
+            buf += chunk
+
+    def handle(self):
+        server = self.server.fake
+        with server.lock:
+            server.connections += 1
+        self.reply('220 fake-smtp ready')
+        sender = None
+        recipients = []
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.wfile.write(b'250-fake-smtp\r\n250-PIPELINING\r\n250-8BITMIME\r\n250 AUTH PLAIN LOGIN XOAUTH2\r\n')
+            elif verb == 'AUTH':
+                if server.accept_auth:
+                    self.reply('235 2.7.0 Accepted')
+                else:
+                    self.reply('535 5.7.8 Username and Password not accepted')
+            elif verb == 'MAIL':
+                sender = command[10:].strip('<> ')
+                recipients = []
+                self.reply('250 2.1.0 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip('<> '))
+                self.reply('250 2.1.5 OK')
+            elif verb == 'DATA':
+                if not recipients:
+                    self.reply('554 5.5.1 No valid recipients')
+                    continue
+                self.reply('354 Go ahead')
+                data = self.read_data()
+                if data is None:
+                    return
+                reply = server.deliver(sender, recipients, data)
+                if reply is None:
+                    # Accepted, but the connection fails before the client hears so
+                    return
+                self.reply(reply)
+                recipients = []
+            elif verb == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 2.0.0 OK')
+            elif verb == 'NOOP':
+                self.reply('250 2.0.0 OK')
+            elif verb == 'QUIT':
+                self.reply('221 2.0.0 Bye')
+                return
+            else:
+                self.reply('502 5.5.2 Command not implemented')
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class FakeSmtpServer:
+    """Accepts messages in memory after `latency` seconds each.
+
+    `temp_fail_rate` / `reject_rate` are the probabilities that a message is
+    answered with 451 (retry later) or 550 (rejected). The first
+    `unanswered` accepted messages get no reply at all: the connection
+    closes right after the message is stored. drop_connections() closes
+    every open connection, as an idle timeout on a real server would.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, temp_fail_rate=0.0, reject_rate=0.0,
+                 seed=0, keep_messages=False, accept_auth=True, unanswered=0):
+        self.latency = latency
+        self.temp_fail_rate = temp_fail_rate
+        self.reject_rate = reject_rate
+        self.random = random.Random(seed)
+        self.keep_messages = keep_messages
+        self.accept_auth = accept_auth
+        self.unanswered = unanswered
+        self.clients = set()
+        self.delivered = []
+        self.sent = 0
+        self.temp_failed = 0
+        self.rejected = 0
+        self.connections = 0
+        self.bytes_received = 0
+        self.lock = threading.Lock()
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def deliver(self, sender, recipients, data):
+        time.sleep(self.latency)
+        with self.lock:
+            roll = self.random.random()
+            if roll < self.temp_fail_rate:
+                self.temp_failed += 1
+                return '451 4.7.0 Temporary failure, try again later'
+            if roll < self.temp_fail_rate + self.reject_rate:
+                self.rejected += 1
+                return '550 5.1.1 Recipient address rejected'
+            self.sent += 1
+            self.bytes_received += len(data)
+            if self.keep_messages:
+                self.delivered.append((sender, recipients, data))
+            if self.unanswered:
+                self.unanswered -= 1
+                return None
+            return f'250 2.0.0 OK {self.sent}'
+
+    def drop_connections(self):
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-smtp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
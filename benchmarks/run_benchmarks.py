@@ -0,0 +1,188 @@
+"""End-to-end offline benchmark of the sending pipeline against FakeGmailService.
+
+Generates synthetic contact lists and reports, per list size, the time and
+peak-RSS growth of each hot path (contact loading, classification, rendering,
+MIME build, sent-log writes) and messages/sec for a full EmailEngine.run.
+
+Usage:
+    python benchmarks/run_benchmarks.py --rows 1000 10000 100000 1000000
+    python benchmarks/run_benchmarks.py --rows 10000 --attachment-mb 2 --latency 0.05 --workers 8
+    python benchmarks/run_benchmarks.py --rows 10000 --transport smtp   # against FakeSmtpServer
+"""
+import argparse
+import contextlib
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from config import CONFIG
+from src.data_manager import DataManager
+from src.email_utils import AttachmentCache, create_message
+from src.engine import EmailEngine
+from src.template_manager import TemplateManager
+from src.transport import SmtpTransport
+from benchmarks.fake_gmail import FakeGmailService
+from benchmarks.fake_smtp import FakeSmtpServer
+
+TEMPLATE = (
+    "Hello <<company_name>>,\n\n"
+    "We would like to invite <<company_name>> to sponsor our event in <<city>>.\n"
+    + "Please find our proposal attached for your review.\n" * 20
+    + "\nBest regards,\nThe Team"
+)
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def generate_contacts(path, rows, skip_ratio=0.05, missing_ratio=0.02):
+    """Write a synthetic contacts CSV with a few tagged and empty rows."""
+    index = pd.RangeIndex(rows)
+    names = 'Company ' + index.astype(str)
+    names = names.where(index % int(1 / skip_ratio) != 0, '!' + names)
+    emails = 'contact' + index.astype(str) + '@domain' + (index % 500).astype(str) + '.example.com'
+    emails = emails.where(index % int(1 / missing_ratio) != 1, '')
+    pd.DataFrame({
+        'company_name': names,
+        'company_email': emails,
+        'city': 'Taipei',
+    }).to_csv(path, index=False)
+
+class Stage:
+    """Collects wall time and peak-RSS growth for named stages."""
+
+    def __init__(self):
+        self.results = []
+
+    @contextlib.contextmanager
+    def __call__(self, name, items=None):
+        rss_before = peak_rss_mb()
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        self.results.append((name, elapsed, items, peak_rss_mb() - rss_before))
+
+    def report(self):
+        print(f"  {'stage':<22} {'time':>9} {'items/s':>12} {'+peak RSS':>11}")
+        for name, elapsed, items, rss in self.results:
+            rate = f"{items / elapsed:,.0f}" if items and elapsed else "-"
+            print(f"  {name:<22} {elapsed:8.3f}s {rate:>12} {rss:9.1f}MB")
+
+def run_size(rows, args, tmp):
+    contacts_file = os.path.join(tmp, f'contacts_{rows}.csv')
+    template_file = os.path.join(tmp, 'template.txt')
+    log_file = os.path.join(tmp, f'sent_log_{rows}.{args.log_backend}')
+    generate_contacts(contacts_file, rows)
+    with open(template_file, 'w', encoding='utf-8') as f:
+        f.write(TEMPLATE)
+
+    attachments = []
+    if args.attachment_mb:
+        path = os.path.join(tmp, 'proposal.pdf')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(int(args.attachment_mb * 1024 * 1024)))
+        attachments = [path]
+
+    stage = Stage()
+    data_manager = DataManager(contacts_file, log_file, chunk_size=rows + 1)
+    template_manager = TemplateManager(template_file, CONFIG['EMAIL_SUBJECT_FORMAT'])
+
+    with stage("load contacts", rows):
+        data_manager.load_contacts()
+        data_manager.load_sent_log()
+        template_manager.load_template()
+    with stage("classify", rows):
+        plan = data_manager.get_plan()
+
+    sample = plan.pending[:args.sample]
+    records = data_manager.contacts.iloc[sample].to_dict('records')
+    with stage("render", len(records)):
+        rendered = [template_manager.render(row) for row in records]
+    cache = AttachmentCache()
+    mime_count = min(len(rendered), args.mime_sample)
+    with stage("mime build", mime_count):
+        for (subject, body), row in zip(rendered[:mime_count], records):
+            create_message(row['company_email'], subject, body, attachments, cache=cache)
+    with stage("log writes", len(records)):
+        for row in records:
+            data_manager.log_send(row['company_email'], row['company_name'])
+        data_manager.flush_log()
+    data_manager.reset_log()
+
+    service = FakeGmailService(
+        latency=args.latency,
+        rate_limit_rate=args.rate_limit_rate,
+        forbidden_rate=args.forbidden_rate,
+        retry_after=args.retry_after,
+    )
+    send_rows = min(rows, args.send_rows)
+    data_manager.contacts = data_manager.contacts.head(send_rows)
+    data_manager.total_rows = send_rows
+    data_manager.load_sent_log()
+    config = dict(CONFIG, ATTACHMENTS=attachments, WAIT_SECONDS=0, SEND_RATE=args.send_rate,
+                  SEND_BURST=max(1, args.workers), DAILY_QUOTA=None, ADAPTIVE_RATE=False,
+                  RETRY_QUEUE_FILE=os.path.join(tmp, f'retry_queue_{rows}.jsonl'),
+                  DEAD_LETTER_FILE=os.path.join(tmp, f'dead_letters_{rows}.jsonl'),
+                  RETRY_BASE_DELAY=args.retry_delay)
+    smtp_server = transport = None
+    if args.transport == 'smtp':
+        # The SMTP stand-in answers 451 where the fake API would send 429, and 550 for 403
+        smtp_server = FakeSmtpServer(latency=args.latency, temp_fail_rate=args.rate_limit_rate,
+                                     reject_rate=args.forbidden_rate).start()
+        host, port = smtp_server.address
+        transport = SmtpTransport(host, port, sender='bench@example.com', starttls=False,
+                                  pool_size=max(1, args.workers))
+    engine = EmailEngine(service, data_manager, template_manager, config, transport=transport)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        start = time.perf_counter()
+        try:
+            sent, skipped, errors = engine.run(workers=args.workers, batch_size=args.batch_size)
+        finally:
+            elapsed = time.perf_counter() - start
+            engine.transport.close()
+            if smtp_server is not None:
+                smtp_server.stop()
+    stage.results.append(("end-to-end run", elapsed, sent + errors, 0.0))
+
+    print(f"\n{rows:,} contacts (end-to-end on {send_rows:,}):")
+    stage.report()
+    if smtp_server is not None:
+        print(f"  sent {sent:,}, skipped {skipped:,}, failed {errors:,}, "
+              f"451s {smtp_server.temp_failed}, SMTP connections {smtp_server.connections}")
+    else:
+        print(f"  sent {sent:,}, skipped {skipped:,}, failed {errors:,}, "
+              f"429s {service.rate_limited}, batches {service.batches}")
+    print(f"  throughput: {sent / elapsed:,.1f} messages/sec, process peak RSS {peak_rss_mb():.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline sending pipeline benchmark")
+    parser.add_argument("--rows", type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument("--attachment-mb", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake API latency per request (s)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Probability of a 429 per send")
+    parser.add_argument("--retry-after", type=float, default=0, help="Retry-After sent with injected 429s (s)")
+    parser.add_argument("--retry-delay", type=float, default=0.5, help="First retry-queue delay when no Retry-After is given (s)")
+    parser.add_argument("--forbidden-rate", type=float, default=0.0, help="Probability of a 403 per send")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=0)
+    parser.add_argument("--send-rate", type=float, default=10000, help="Token-bucket rate for the run")
+    parser.add_argument("--send-rows", type=int, default=2000, help="Contacts used for the end-to-end run")
+    parser.add_argument("--sample", type=int, default=50000, help="Pending rows used for render/log stages")
+    parser.add_argument("--mime-sample", type=int, default=2000, help="Messages used for the MIME stage")
+    parser.add_argument("--transport", choices=['gmail_api', 'smtp'], default='gmail_api')
+    parser.add_argument("--log-backend", choices=['csv', 'db'], default='csv')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            run_size(rows, args, tmp)
+
+if __name__ == '__main__':
+    main()
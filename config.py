@@ -4,17 +4,81 @@ CONFIG = {
     'SCOPES': ['https://www.googleapis.com/auth/gmail.send'],
     
     # Files
-    'CONTACTS_FILE': 'data/contacts.csv',    # CSV with company_name, company_email
+    'CONTACTS_FILE': 'data/contacts.csv',    # CSV, JSONL or Parquet with company_name, company_email
+    'CONTACTS_CHUNK_SIZE': 50000,            # Lists longer than this are streamed in chunks of this many rows
     'TEMPLATE_FILE': 'assets/template.txt', # Email body template (<<company_name>>)
     'ATTACHMENTS': [
         'assets/2026系卡企劃書.pdf', 
         # 'assets/another_file.pdf'
     ], # Can be a single string or a list of strings
+    'ATTACHMENT_COLUMN': 'attachments',  # Contacts column with per-contact files ('a.pdf; b.docx'), sent after ATTACHMENTS
+    'ATTACHMENT_DIR': None,              # Relative paths in that column start here (None = working directory)
+    'ATTACHMENT_CACHE_MB': 64,           # Memory for encoded attachment parts shared between messages (LRU)
     'CREDENTIALS_FILE': 'auth/credentials.json',
     'TOKEN_FILE': 'auth/token.json',
-    'LOG_FILE': 'data/sent_log.csv',     # Track sent emails to avoid duplicates
+    'DISCOVERY_CACHE_FILE': 'auth/gmail_discovery.json', # Optional local Gmail API discovery document
+    'ACCOUNTS': [                         # Optional extra sender accounts, each with its own token and quota
+        # {'name': 'main', 'token_file': 'auth/token.json'},
+        # {'name': 'second', 'token_file': 'auth/token_second.json', 'daily_quota': 500},
+    ],
+    'DAILY_QUOTA': 2000,                 # Sends per account per rolling 24h (None = no ledger)
+    'LOG_FILE': 'data/sent_log.csv',     # Track sent emails to avoid duplicates (.db for the SQLite backend)
+    'CHECKPOINT_FILE': 'data/checkpoint.json', # Resume point for the contacts file (None to always re-scan)
+    'PROFILE_FILE': 'data/profile.json', # --profile report (Prometheus text goes next to it as .prom)
+    'RETRY_QUEUE_FILE': 'data/retry_queue.jsonl', # Failed sends waiting for another attempt (None = retry inline)
+    'DEAD_LETTER_FILE': 'data/dead_letters.jsonl', # Contacts that used up their attempts (--replay-dead-letters)
+    'JOB_QUEUE_FILE': 'data/jobs.db',    # Campaigns queued for --daemon (SQLite)
+    'DAEMON_POLL_SECONDS': 5,            # How often an idle daemon checks for new jobs
+    'PROGRESS_INTERVAL': 0.5,            # Seconds between progress bar refreshes and 'progress' events
+    'SUPPRESSION_FILES': {               # Addresses never to email (one per line, or CSV with an 'email' column)
+        'unsubscribe': 'data/unsubscribes.txt',
+        'bounce': 'data/bounces.txt',
+    },
+    'SUPPRESSION_INDEX': 'data/suppression', # Base path of the on-disk index built from those files
+    'CAMPAIGN': '',                      # Optional campaign label recorded with each send
     
     # Email Settings
     'EMAIL_SUBJECT_FORMAT': "【合作邀請】臺大資訊系卡 × {company_name} 宣傳與贊助合作提案",
     'WAIT_SECONDS': 3,                  # Anti-spam delay
+    'SPOOL_DIR': 'data/spool',               # Pre-rendered messages (dry runs, --spool, --export)
+    'RENDER_WORKERS': None,                  # Processes used to pre-render messages (None = one per CPU)
+    'TRANSPORT': 'gmail_api',                # 'gmail_api' or 'smtp'
+    'SMTP': {                                # Used when TRANSPORT is 'smtp'
+        'host': 'smtp.gmail.com',
+        'port': 587,
+        'starttls': True,
+        'ssl': False,                        # True for implicit TLS (port 465)
+        'auth': 'xoauth2',                   # 'xoauth2' (needs the https://mail.google.com/ scope), 'login' or None
+        'sender': '',                        # Envelope sender / From address
+        'username': '',
+        'password': '',
+        'pool_size': 2,                      # Persistent connections kept open
+        'timeout': 60,
+        'pipelining': True,
+    },
+    'STREAMING_THRESHOLD': 4 * 1024 * 1024, # Attachments above this total (bytes) are streamed via media upload (sent outside batches)
+
+    # Concurrent Sending (used when MAX_WORKERS > 1)
+    'MAX_WORKERS': 1,                   # Sends kept in flight at once
+    'SEND_RATE': None,                  # Messages per second (None = 1 / WAIT_SECONDS)
+    'SEND_BURST': 1,                    # Sends allowed back-to-back before pacing kicks in
+    'BATCH_SIZE': 0,                    # Messages per Gmail batch request (0 = no batching, max 100)
+
+    # Recipient Domains
+    'DOMAIN_ROUND_ROBIN': True,         # Interleave pending contacts across recipient domains instead of file order
+    'DOMAIN_RATE': None,                # Max messages per second to any one domain (None = no cap)
+    'DOMAIN_RATES': {                   # Per-domain caps, overriding DOMAIN_RATE
+        # 'bigcorp.com': 0.2,
+    },
+
+    # Adaptive Pacing (AIMD: speed up while clean, back off on 429 / Retry-After)
+    'ADAPTIVE_RATE': False,             # Replaces WAIT_SECONDS / SEND_RATE pacing when enabled
+    'MIN_SEND_RATE': 0.05,              # Messages per second
+    'MAX_SEND_RATE': 10.0,
+    'RATE_STATE_FILE': 'data/rate_state.json', # Learned rate per account, reused on the next run
+
+    # Retry Queue (used when RETRY_QUEUE_FILE is set)
+    'MAX_SEND_ATTEMPTS': 4,             # Attempts per message before it is dead-lettered
+    'RETRY_BASE_DELAY': 15,             # Seconds before the first retry, doubling per attempt (Retry-After wins)
+    'RETRY_MAX_DELAY': 900,
 }
@@ -1,9 +1,13 @@
 import os
+import time
+from datetime import datetime
 from config import CONFIG
-from src.auth import get_gmail_service
-from src.data_manager import DataManager
+from src.auth import build_gmail_service, get_credentials
+from src.email_utils import split_attachment_cell
+from src.http_pool import AuthorizedHttpPool, CredentialRefresher
+from src.progress import ProgressReporter, open_event_stream
+from src.sent_log import SqliteSentLog, import_csv_log
 from src.template_manager import TemplateManager
-from src.engine import EmailEngine
 from src.setup_assistant import show_setup_guide
 from src.cli import CLIHandler
 from src.ui import UI, YELLOW, GREEN, RED, RESET
@@ -15,6 +19,190 @@ def check_credentials():
         print(f"Run {YELLOW}python main.py --setup{RESET} for a guide on how to get it.")
         exit(1)
 
+def wait_for_window(next_window):
+    """Sleep until the quota window reopens (plus a small margin)."""
+    delay = (next_window - datetime.now()).total_seconds() + 60
+    if delay > 0:
+        time.sleep(delay)
+
+def uses_smtp():
+    return CONFIG.get('TRANSPORT', 'gmail_api') == 'smtp'
+
+def build_smtp_transport(settings, creds=None, pool_size=None):
+    """SMTP transport from CONFIG['SMTP'] (XOAUTH2 uses `creds`)."""
+    from src.transport import SmtpTransport
+    return SmtpTransport.from_config(settings, creds, pool_size)
+
+def get_sender_accounts(workers=1):
+    """Authenticate every account in CONFIG['ACCOUNTS'], skipping those that fail.
+
+    With several `workers`, each account gets its own pool of connections
+    (or SMTP sessions), as its sends then run concurrently.
+    """
+    from src.engine import SenderAccount
+
+    accounts = []
+    for entry in CONFIG.get('ACCOUNTS', []):
+        name = entry.get('name') or entry['token_file']
+        print(f"Authenticating account {name}...")
+        creds = get_credentials(entry['token_file'])
+        if creds:
+            CredentialRefresher(creds, entry['token_file']).start()
+            service = build_gmail_service(creds)
+            transport = None
+            http_pool = None
+            if uses_smtp():
+                # Per-account overrides, e.g. {'sender': 'sales@example.com'}
+                settings = dict(CONFIG['SMTP'], **entry.get('smtp', {}))
+                transport = build_smtp_transport(settings, creds, max(workers, settings.get('pool_size', 1)))
+            elif workers > 1:
+                http_pool = AuthorizedHttpPool(creds, workers)
+            accounts.append(SenderAccount(name, service, entry['token_file'], entry.get('daily_quota'), transport,
+                                          http_pool))
+        else:
+            print(f"{YELLOW}Skipping account {name}: authentication failed.{RESET}")
+    return accounts
+
+def build_senders(workers):
+    """Authenticate and build what sends mail: (service, accounts, http_pool, transport), or None."""
+    service = None
+    http_pool = None
+    transport = None
+    accounts = get_sender_accounts(workers)
+    if CONFIG.get('ACCOUNTS') and not accounts:
+        return None
+    if accounts:
+        service = accounts[0].service
+    elif uses_smtp():
+        creds = None
+        if CONFIG['SMTP'].get('auth', 'xoauth2') == 'xoauth2':
+            creds = get_credentials()
+            if not creds:
+                return None
+            CredentialRefresher(creds, CONFIG['TOKEN_FILE']).start()
+        transport = build_smtp_transport(CONFIG['SMTP'], creds, max(workers, CONFIG['SMTP'].get('pool_size', 1)))
+    else:
+        creds = get_credentials()
+        if not creds:
+            return None
+        # Refresh the token ahead of expiry so long runs never stall on re-auth
+        CredentialRefresher(creds, CONFIG['TOKEN_FILE']).start()
+        service = build_gmail_service(creds)
+        if workers > 1:
+            http_pool = AuthorizedHttpPool(creds, workers)
+    return service, accounts, http_pool, transport
+
+def open_progress(args):
+    """ProgressReporter for --skip-log / --events, or None if the event stream cannot be opened."""
+    try:
+        events = open_event_stream(args.events) if args.events else None
+    except (OSError, ValueError) as e:
+        print(f"{RED}Error: cannot open event stream {args.events}: {e}{RESET}")
+        return None
+    return ProgressReporter(args.skip_log, events, CONFIG.get('PROGRESS_INTERVAL', 0.5))
+
+def manage_jobs(args):
+    """--submit, --jobs and --cancel: talk to the daemon's job queue."""
+    from src.contacts_source import ContactsSource
+    from src.job_queue import JobQueue
+
+    queue = JobQueue(CONFIG['JOB_QUEUE_FILE'])
+    try:
+        if args.submit:
+            try:
+                ContactsSource(args.contacts).validate()
+                if not os.path.exists(args.template):
+                    raise FileNotFoundError(f"Template file not found: {args.template}")
+            except (OSError, ValueError) as e:
+                print(f"{RED}Error: {e}{RESET}")
+                return
+            attachments = args.attach if args.attach is not None else CONFIG.get('ATTACHMENTS', [])
+            job_id = queue.submit(args.contacts, args.template, attachments, args.subject,
+                                  args.campaign if args.campaign is not None else CONFIG.get('CAMPAIGN', ''),
+                                  args.priority)
+            print(f"{GREEN}Queued job {job_id}{RESET} (priority {args.priority}) in {CONFIG['JOB_QUEUE_FILE']}")
+        elif args.cancel is not None:
+            if queue.cancel(args.cancel):
+                print(f"{YELLOW}Job {args.cancel} cancelled.{RESET}")
+            else:
+                print(f"{RED}Job {args.cancel} is not waiting in the queue.{RESET}")
+        else:
+            UI.show_jobs(queue.jobs())
+    finally:
+        queue.close()
+
+def run_daemon(args):
+    """--daemon: authenticate once, then run queued jobs until stopped."""
+    import signal
+    from src.daemon import CampaignDaemon
+    from src.job_queue import JobQueue
+
+    if not (uses_smtp() and CONFIG['SMTP'].get('auth', 'xoauth2') != 'xoauth2'):
+        check_credentials()
+    senders = build_senders(args.workers)
+    if senders is None:
+        return
+    service, accounts, http_pool, transport = senders
+    progress = open_progress(args)
+    if progress is None:
+        return
+    queue = JobQueue(CONFIG['JOB_QUEUE_FILE'])
+    daemon = CampaignDaemon(queue, CONFIG, service, accounts, http_pool, transport, progress,
+                            workers=args.workers, batch_size=args.batch_size,
+                            poll_interval=CONFIG.get('DAEMON_POLL_SECONDS', 5))
+    # `kill` finishes the current job first; Ctrl+C interrupts it (it is resumed on restart)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}Daemon stopped.{RESET}")
+    finally:
+        progress.close()
+        queue.close()
+        for sender in [transport, http_pool] + [a.transport for a in accounts]:
+            if sender is not None:
+                sender.close()
+        if args.profile:
+            write_profile(daemon.metrics, args.profile)
+
+def write_profile(metrics, json_path):
+    """Write the --profile report as JSON plus Prometheus text."""
+    prom_path = os.path.splitext(json_path)[0] + '.prom'
+    metrics.write_json(json_path)
+    metrics.write_prometheus(prom_path)
+    print(f"Profile written to {json_path} and {prom_path}")
+
+def run_engine(engine, args, data_manager):
+    """Run the engine, optionally waiting out daily quota windows (--schedule)."""
+    from src.engine import QuotaWindowExhausted
+
+    # Dry runs always render real messages, so there is something to inspect
+    spool_dir = CONFIG['SPOOL_DIR'] if args.dry_run or args.spool or args.export else None
+
+    while True:
+        try:
+            sent, skipped, errors = engine.run(is_dry_run=args.dry_run, workers=args.workers,
+                                               batch_size=args.batch_size, spool_dir=spool_dir)
+            UI.show_final_summary(sent, skipped, errors, args.dry_run, CONFIG['LOG_FILE'],
+                                  engine.progress.skip_counts, args.skip_log, engine.retry_queue)
+            if engine.spool is not None:
+                exported = engine.spool.export(args.export) if args.export else None
+                UI.show_spool(engine.spool, exported, args.export)
+            
+        except QuotaWindowExhausted as e:
+            UI.show_quota_pause(e, args.schedule)
+            if args.schedule:
+                wait_for_window(e.next_window)
+                data_manager.load_sent_log()
+                continue
+        except Exception as e:
+            UI.show_interruption(e, CONFIG, data_manager)
+            # We don't re-raise here because UI.show_interruption handled the user-facing part
+            # and main() is the entry point.
+        break
+    if engine.spool is not None:
+        engine.spool.close()
+
 def main():
     args = CLIHandler.parse_args(CONFIG)
     
@@ -22,13 +210,60 @@ def main():
         show_setup_guide()
         return
 
+    if args.submit or args.jobs or args.cancel is not None:
+        manage_jobs(args)
+        return
+
+    # Heavy modules (pandas, numpy, tqdm) are only imported past this point,
+    # so --setup and --help start instantly
+    from src.data_manager import DataManager
+    from src.engine import EmailEngine
+
+    if args.daemon:
+        run_daemon(args)
+        return
+
     # Initialize Managers
-    data_manager = DataManager(args.contacts, CONFIG['LOG_FILE'])
+    data_manager = DataManager(
+        args.contacts,
+        CONFIG['LOG_FILE'],
+        CONFIG.get('CAMPAIGN'),
+        CONFIG.get('SUPPRESSION_FILES'),
+        CONFIG.get('SUPPRESSION_INDEX'),
+        CONFIG.get('CONTACTS_CHUNK_SIZE'),
+        CONFIG.get('CHECKPOINT_FILE')
+    )
     template_manager = TemplateManager(args.template, CONFIG['EMAIL_SUBJECT_FORMAT'])
 
+    if args.import_log:
+        if not isinstance(data_manager.sent_log, SqliteSentLog):
+            print(f"{RED}Error: --import-log needs a SQLite LOG_FILE (e.g. data/sent_log.db).{RESET}")
+            return
+        try:
+            count = import_csv_log(args.import_log, data_manager.sent_log)
+        except Exception as e:
+            print(f"{RED}Error: {e}{RESET}")
+            return
+        data_manager.flush_log()
+        print(f"{GREEN}Imported {count} records from {args.import_log} into {CONFIG['LOG_FILE']}.{RESET}")
+        return
+
     if args.reset:
         data_manager.reset_log()
         print(f"{YELLOW}Sent log cleared.{RESET}")
+    elif args.rescan and data_manager.checkpoint is not None:
+        data_manager.checkpoint.reset()
+
+    if args.replay_dead_letters:
+        from src.retry_queue import RetryQueue
+        if not CONFIG.get('RETRY_QUEUE_FILE'):
+            print(f"{RED}Error: --replay-dead-letters needs RETRY_QUEUE_FILE to be set.{RESET}")
+            return
+        replayed = RetryQueue(CONFIG['RETRY_QUEUE_FILE'], CONFIG.get('DEAD_LETTER_FILE', 'data/dead_letters.jsonl')).replay_dead_letters()
+        print(f"{YELLOW}{replayed} dead-lettered contacts will be retried.{RESET}")
+        if replayed and data_manager.checkpoint is not None:
+            # Their rows may be behind the resume point
+            data_manager.checkpoint.reset()
 
     # Check/Generate Contacts
     if not os.path.exists(args.contacts):
@@ -48,12 +283,18 @@ def main():
             print(f"{GREEN}Created {args.template}. Please edit it and rerun.{RESET}")
         return
 
-    check_credentials()
+    # A password-authenticated SMTP relay needs no Google credentials
+    if not (uses_smtp() and CONFIG['SMTP'].get('auth', 'xoauth2') != 'xoauth2'):
+        check_credentials()
 
     # Load Data
     try:
         data_manager.load_contacts()
+        if args.dry_run:
+            # Dry runs start from the checkpoint but must not move it
+            data_manager.checkpoint = None
         data_manager.load_sent_log()
+        data_manager.load_suppression()
         template_manager.load_template()
     except Exception as e:
         print(f"{RED}Error: {e}{RESET}")
@@ -62,12 +303,20 @@ def main():
     # Display Information
     UI.show_header(CONFIG, args)
     
-    stats = data_manager.get_stats()
+    summary = data_manager.summarize(template_manager.field_names(), attachment_column=CONFIG.get('ATTACHMENT_COLUMN'),
+                                     domains=args.stats, round_robin=CONFIG.get('DOMAIN_ROUND_ROBIN'))
+    stats = summary['stats']
     attachments = CONFIG.get('ATTACHMENTS', [])
     if isinstance(attachments, str):
         attachments = [attachments]
+    personal = {}
+    for cell, count in summary['attachment_cells'].items():
+        for path in split_attachment_cell(cell, CONFIG.get('ATTACHMENT_DIR')):
+            personal[path] = personal.get(path, 0) + count
     
-    UI.show_stats(stats, args, data_manager.contacts, data_manager.sent_emails, attachments)
+    UI.show_stats(stats, args, summary['upcoming'], attachments, summary['rejected'], personal)
+    if args.stats:
+        UI.show_domains(summary['domains'], CONFIG)
 
     if stats['net_to_send'] == 0:
         print(f"\n{RED}Warning: No emails to send.{RESET}")
@@ -76,8 +325,13 @@ def main():
             print(f"Use {YELLOW}--reset{RESET} if you want to resend to everyone.")
         return
 
+    # Placeholder Validation
+    problems = template_manager.validate(data_manager.columns, summary['empty'])
+    if not UI.show_template_problems(problems):
+        return
+
     # Preview
-    preview = template_manager.get_preview(data_manager.contacts, data_manager.sent_emails)
+    preview = template_manager.get_preview(summary['first_pending'])
     UI.show_preview(preview)
 
     # Confirmation
@@ -85,23 +339,31 @@ def main():
         print("Cancelled.")
         return
 
-    # Gmail Service
+    # Gmail Service / Transport
     service = None
+    accounts = []
+    http_pool = None
+    transport = None
     if not args.dry_run:
-        service = get_gmail_service()
-        if not service:
+        senders = build_senders(args.workers)
+        if senders is None:
             return
+        service, accounts, http_pool, transport = senders
 
     # Engine Execution
-    engine = EmailEngine(service, data_manager, template_manager, CONFIG)
+    progress = open_progress(args)
+    if progress is None:
+        return
+    engine = EmailEngine(service, data_manager, template_manager, CONFIG, accounts, http_pool=http_pool,
+                         transport=transport, progress=progress)
     try:
-        sent, skipped, errors = engine.run(is_dry_run=args.dry_run)
-        UI.show_final_summary(sent, skipped, errors, args.dry_run, CONFIG['LOG_FILE'])
-            
-    except Exception as e:
-        UI.show_interruption(e, CONFIG, data_manager)
-        # We don't re-raise here because UI.show_interruption handled the user-facing part
-        # and main() is the entry point.
+        run_engine(engine, args, data_manager)
+    finally:
+        progress.close()
+        for sender in [engine] + accounts:
+            sender.transport.close()
+        if args.profile:
+            write_profile(engine.metrics, args.profile)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,185 @@
+import re
+import unicodedata
+
+import numpy as np
+
+_ATOM = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+"
+# Dot-atom local part and a hostname with a TLD; quoted local parts and IP literals are not accepted
+_ADDRESS = re.compile(
+    rf"{_ATOM}(?:\.{_ATOM})*@(?:[A-Za-z0-9](?:[A-Za-z0-9-]{{0,61}}[A-Za-z0-9])?\.)+[A-Za-z]{{2,63}}"
+)
+# Between addresses in one cell: whitespace, commas, semicolons, the ideographic comma
+_SEPARATOR = re.compile(r"[\s,;、]+")
+_WRAPPERS = "<>\"'()[]"
+_INVISIBLE = dict.fromkeys(map(ord, "\u200b\u200c\u200d\u2060\ufeff"))
+_INVISIBLE_PATTERN = "[\u200b\u200c\u200d\u2060\ufeff]"
+# What a cell needs before split_cell can find an address in it that the plain check rejected
+_SPLITTABLE = r"[\s,;、<>\"'()\[\]]|mailto:"
+# Byte classes for _plainly_valid: 0 never allowed, 1 letter, 2 digit, 3 allowed only before
+# the '@', 4 '-', 5 '.', 6 '@', 7 the newline between addresses
+_CLASS = np.zeros(256, dtype=np.uint8)
+_CLASS[list(b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz')] = 1
+_CLASS[list(b'0123456789')] = 2
+_CLASS[list(b"!#$%&'*+/=?^_`{|}~")] = 3
+_CLASS[list(b'-.@\n')] = [4, 5, 6, 7]
+_BLOCK = 65536
+
+def clean_address(cell):
+    """NFKC-normalize a cell (full-width letters, '＠' and ideographic spaces become ASCII),
+    drop zero-width characters and strip surrounding whitespace."""
+    if cell.isascii():
+        return cell.strip()
+    return unicodedata.normalize('NFKC', cell).translate(_INVISIBLE).strip()
+
+def is_valid_address(address):
+    return len(address) <= 254 and _ADDRESS.fullmatch(address) is not None
+
+def split_cell(cell):
+    """The addresses in a cell such as 'a@x.com; b@y.com' or 'Name <a@x.com>'.
+
+    Tokens without an '@' (display names) are dropped, as are angle brackets,
+    quotes and 'mailto:' prefixes around an address.
+    """
+    addresses = []
+    for token in _SEPARATOR.split(cell):
+        token = token.strip(_WRAPPERS)
+        if token[:7].lower() == 'mailto:':
+            token = token[7:]
+        if '@' in token:
+            addresses.append(token)
+    return addresses
+
+def _flags(results, count):
+    return np.fromiter(results, dtype=bool, count=count)
+
+def clean_addresses(cells):
+    """clean_address over an array of already stripped strings.
+
+    Only the non-ASCII cells need Unicode normalization; that is done on
+    them as a column (and they are stripped again, for the spaces NFKC
+    can produce).
+    """
+    import pandas as pd
+
+    foreign = ~_flags(map(str.isascii, cells), len(cells))
+    if not foreign.any():
+        return cells
+    cells = cells.copy()
+    cells[foreign] = (pd.Series(cells[foreign], dtype='str').str.normalize('NFKC')
+                      .str.replace(_INVISIBLE_PATTERN, '', regex=True).str.strip().to_numpy(dtype=object))
+    return cells
+
+def _plainly_valid(addresses):
+    """A sufficient check for is_valid_address, done on the bytes of a whole block at once.
+
+    The addresses are joined with newlines and every check looks for a
+    rare bad feature (a byte outside the pattern, two separators in a
+    row, a second '@', a special character or label-edge hyphen in the
+    domain, a TLD that is not 2-63 letters, more than 64 characters) whose
+    positions are then mapped to rows. True means valid; False only
+    means the address needs the full pattern.
+    """
+    n = len(addresses)
+    data = np.frombuffer(('\n' + '\n'.join(addresses) + '\n').encode('utf-8', 'surrogatepass'), dtype=np.uint8)
+    classes = np.take(_CLASS, data)
+    newlines = np.flatnonzero(classes == 7)
+    if len(newlines) != n + 1:
+        # An address holding a newline; leave the whole block to the pattern
+        return np.zeros(n, dtype=bool)
+    starts, ends = newlines[:-1], newlines[1:]
+    plain = ends - starts <= 65
+
+    def reject(positions):
+        plain[np.searchsorted(ends, positions)] = False
+
+    separator = classes >= 5
+    reject(np.flatnonzero(classes == 0))
+    reject(np.flatnonzero(separator[1:] & separator[:-1]) + 1)
+    # Rows with anything but exactly one '@' are already rejected, so at_sign, and last_dot
+    # below, may pick up a position from an earlier row for them
+    at = np.flatnonzero(classes == 6)
+    bounds = np.searchsorted(at, newlines)
+    plain &= np.diff(bounds) == 1
+    at_sign = at[bounds[1:] - 1] if len(at) else starts
+    special = np.flatnonzero(classes == 3)
+    reject(special[special > at_sign[np.searchsorted(ends, special)]])
+    hyphen = np.flatnonzero(classes == 4)
+    reject(hyphen[separator[hyphen - 1] | separator[hyphen + 1]])
+    dots = np.flatnonzero(classes == 5)
+    last_dot = dots[np.searchsorted(dots, ends) - 1] if len(dots) else starts
+    plain &= (last_dot > at_sign) & (ends - last_dot >= 3) & (ends - last_dot <= 64)
+    non_letters = np.flatnonzero((classes >= 2) & (classes <= 4))
+    plain &= np.searchsorted(non_letters, ends) == np.searchsorted(non_letters, last_dot)
+    return plain
+
+def valid_addresses(addresses):
+    """is_valid_address over an array of strings, as a boolean array.
+
+    With pyarrow installed, pandas' string columns run the pattern natively
+    (RE2) over the whole column. Without it, .str.fullmatch would loop in
+    Python anyway, so ordinary addresses are settled by _plainly_valid in
+    blocks and the compiled pattern only runs on the rest.
+    """
+    import pandas as pd
+
+    if getattr(pd.api.types.pandas_dtype('str'), 'storage', None) == 'pyarrow':
+        # The pattern's source rather than the compiled object, so pandas can hand it to pyarrow
+        column = pd.Series(addresses, dtype='str')
+        valid = column.str.fullmatch(_ADDRESS.pattern).to_numpy(dtype=bool, copy=True)
+        valid &= np.fromiter(map(len, addresses), dtype=np.intp, count=len(addresses)) <= 254
+        return valid
+    valid = np.zeros(len(addresses), dtype=bool)
+    for start in range(0, len(addresses), _BLOCK):
+        valid[start:start + _BLOCK] = _plainly_valid(addresses[start:start + _BLOCK])
+    rest = np.flatnonzero(~valid)
+    valid[rest] = _flags(map(is_valid_address, addresses[rest]), len(rest))
+    return valid
+
+def parse_address_cells(cells):
+    """Clean and validate a column of address cells, splitting cells that hold several addresses.
+
+    `cells` is an object array of stripped strings. Returns (addresses,
+    valid, positions), with one entry per address in cell order: the
+    cleaned address, whether its syntax is valid and the position of the
+    cell it came from. Normalization and the syntax check run on the whole
+    column; only cells that fail it and hold a separator, bracket or
+    'mailto:' are split in Python, so a column of ordinary addresses never
+    leaves the fast path. A cell with no usable address gives a single
+    invalid entry.
+    """
+    import pandas as pd
+
+    addresses = clean_addresses(cells)
+    valid = valid_addresses(addresses)
+    positions = np.arange(len(addresses))
+    if valid.all():
+        return addresses, valid, positions
+    if addresses is cells:
+        addresses = addresses.copy()
+
+    rejected = np.flatnonzero(~valid)
+    splittable = pd.Series(addresses[rejected], dtype='str').str.contains(_SPLITTABLE, case=False)
+    extra = {}
+    for i in rejected[splittable.to_numpy(dtype=bool)]:
+        found = split_cell(addresses[i])
+        if found:
+            addresses[i] = found[0]
+            valid[i] = is_valid_address(found[0])
+            if len(found) > 1:
+                extra[i] = found[1:]
+    if not extra:
+        return addresses, valid, positions
+
+    counts = np.ones(len(addresses), dtype=np.intp)
+    for i, more in extra.items():
+        counts[i] += len(more)
+    starts = np.cumsum(counts) - counts
+    positions = np.repeat(positions, counts)
+    expanded = np.empty(len(positions), dtype=object)
+    expanded_valid = np.empty(len(positions), dtype=bool)
+    expanded[starts] = addresses
+    expanded_valid[starts] = valid
+    for i, more in extra.items():
+        expanded[starts[i] + 1:starts[i] + 1 + len(more)] = more
+        expanded_valid[starts[i] + 1:starts[i] + 1 + len(more)] = [is_valid_address(a) for a in more]
+    return expanded, expanded_valid, positions
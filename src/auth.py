@@ -1,21 +1,56 @@
+import json
 import os.path
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from config import CONFIG
 
-def get_gmail_service():
-    """Authenticate with Google and return the Gmail service."""
+# Google client libraries are imported inside the functions that use them so
+# that commands which never talk to the API (--setup, --stats, --dry-run) start fast.
+
+def load_discovery_document():
+    """Return the Gmail discovery document from the local cache or the client's bundled copy.
+
+    Returns None if neither is available (very old google-api-python-client).
+    """
+    cache_file = CONFIG.get('DISCOVERY_CACHE_FILE')
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            return f.read()
+    try:
+        from googleapiclient.discovery_cache import get_static_doc
+    except ImportError:
+        return None
+    return get_static_doc('gmail', 'v1')
+
+def build_gmail_service(creds):
+    """Build the Gmail client without fetching the discovery document over the network."""
+    from googleapiclient.discovery import build, build_from_document
+
+    document = load_discovery_document()
+    if document:
+        return build_from_document(document, credentials=creds)
+
+    service = build('gmail', 'v1', credentials=creds)
+    cache_file = CONFIG.get('DISCOVERY_CACHE_FILE')
+    if cache_file:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(service._rootDesc, f)
+    return service
+
+def get_credentials(token_file=None):
+    """Load, refresh or obtain (via browser consent) OAuth credentials for an account."""
+    from google.oauth2.credentials import Credentials
+
+    token_file = token_file or CONFIG['TOKEN_FILE']
     creds = None
-    if os.path.exists(CONFIG['TOKEN_FILE']):
-        creds = Credentials.from_authorized_user_file(CONFIG['TOKEN_FILE'], CONFIG['SCOPES'])
+    if os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file, CONFIG['SCOPES'])
         
     if not creds or not creds.valid:
         if creds and creds.expired and creds.refresh_token:
+            from google.auth.transport.requests import Request
             creds.refresh(Request())
         else:
             try:
+                from google_auth_oauthlib.flow import InstalledAppFlow
                 flow = InstalledAppFlow.from_client_secrets_file(CONFIG['CREDENTIALS_FILE'], CONFIG['SCOPES'])
                 creds = flow.run_local_server(port=0)
             except Exception as e:
@@ -23,7 +58,7 @@ def get_gmail_service():
                 print(f"Ensure {CONFIG['CREDENTIALS_FILE']} is present and correct.")
                 return None
                 
-        with open(CONFIG['TOKEN_FILE'], 'w') as token:
+        with open(token_file, 'w') as token:
             token.write(creds.to_json())
             
-    return build('gmail', 'v1', credentials=creds)
+    return creds
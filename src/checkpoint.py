@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import time
+
+# Bytes hashed from the start of the contacts file for its fingerprint
+FINGERPRINT_BYTES = 1024 * 1024
+
+def file_fingerprint(path):
+    """Size, mtime and a hash of the first MB: enough to tell an edited file."""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        digest = hashlib.blake2b(f.read(FINGERPRINT_BYTES), digest_size=16).hexdigest()
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'head': digest}
+
+class Checkpoint:
+    """Persistent resume point for one contacts file and campaign.
+
+    `row` is a watermark: every contact before it has been sent (and logged)
+    or skipped. Rows can finish out of order when sends run concurrently, so
+    finished rows past the watermark are held until the gap closes. A row
+    that never finishes (a failed send) leaves a gap that never closes; once
+    more than `max_held` rows are held, they are dropped and no more are
+    held, so the watermark stays put and a resume re-reads from there (the
+    sent log skips what was sent). The file is rewritten atomically every
+    `save_every` advances or `save_interval` seconds, and on save().
+
+    `locate` maps a row to its byte offset in the contacts file, or None if
+    unknown (ContactsSource.offset). The last (row, offset) pair it gave is
+    saved as `seek`, so a resume can seek there instead of re-reading the rows
+    before it.
+    """
+
+    def __init__(self, path, contacts_file, campaign='', save_every=100, save_interval=1.0, locate=None,
+                 max_held=100_000):
+        self.path = path
+        self.contacts_file = contacts_file
+        self.campaign = campaign or ''
+        self.save_every = save_every
+        self.save_interval = save_interval
+        self.locate = locate
+        self.max_held = max_held
+        self.row = 0
+        self.seek = None
+        self._fingerprint = None
+        self._done = set()
+        self._stalled = False
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def resume_row(self):
+        """Row to resume from: the saved watermark if the contacts file is unchanged, else 0."""
+        self._fingerprint = file_fingerprint(self.contacts_file)
+        self.row = 0
+        self.seek = None
+        self._done.clear()
+        self._stalled = False
+        if not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if (state.get('contacts') == os.path.abspath(self.contacts_file)
+                and state.get('campaign', '') == self.campaign
+                and state.get('fingerprint') == self._fingerprint):
+            self.row = int(state.get('row', 0))
+            seek = state.get('seek')
+            if seek and int(seek[0]) <= self.row:
+                self.seek = (int(seek[0]), int(seek[1]))
+        return self.row
+
+    def done(self, row):
+        """Mark a row as finished (sent or skipped) and advance the watermark."""
+        if row != self.row:
+            if row > self.row and not self._stalled:
+                self._done.add(row)
+                if len(self._done) > self.max_held:
+                    self._done.clear()
+                    self._stalled = True
+            return
+        self.row += 1
+        while self.row in self._done:
+            self._done.remove(self.row)
+            self.row += 1
+        self._unsaved += 1
+        if self._unsaved >= self.save_every or time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        if self._fingerprint is None:
+            return
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        offset = self.locate(self.row) if self.locate is not None else None
+        if offset is not None:
+            self.seek = (self.row, offset)
+        state = {
+            'contacts': os.path.abspath(self.contacts_file),
+            'campaign': self.campaign,
+            'fingerprint': self._fingerprint,
+            'row': self.row,
+        }
+        if self.seek is not None:
+            state['seek'] = list(self.seek)
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.path)
+        self._unsaved = 0
+        self._last_save = time.monotonic()
+
+    def reset(self):
+        """Forget the resume point (e.g. after the sent log is cleared)."""
+        self.row = 0
+        self.seek = None
+        self._done.clear()
+        self._stalled = False
+        if os.path.exists(self.path):
+            os.remove(self.path)
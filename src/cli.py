@@ -7,9 +7,28 @@ class CLIHandler:
         parser = argparse.ArgumentParser(description="Gmail Bulk Sender")
         parser.add_argument("-d", "--dry-run", action="store_true", help="Enable dry run mode (simulation)")
         parser.add_argument("--reset", action="store_true", help="Clear the sent log before starting")
+        parser.add_argument("--rescan", action="store_true", help="Ignore the resume checkpoint and re-scan the whole contacts file")
         parser.add_argument("-c", "--contacts", type=str, default=config['CONTACTS_FILE'], help="Path to contacts CSV")
         parser.add_argument("-t", "--template", type=str, default=config['TEMPLATE_FILE'], help="Path to email template")
         parser.add_argument("-s", "--stats", action="store_true", help="Show contact list statistics")
         parser.add_argument("-y", "--yes", action="store_true", help="Skip confirmation prompt")
+        parser.add_argument("-w", "--workers", type=int, default=config.get('MAX_WORKERS', 1), help="Number of concurrent sends")
+        parser.add_argument("-b", "--batch-size", type=int, default=config.get('BATCH_SIZE', 0), help="Send messages in Gmail batch requests of this size (max 100)")
+        parser.add_argument("--replay-dead-letters", action="store_true", help="Give contacts in the dead-letter file (DEAD_LETTER_FILE) another round of attempts")
+        parser.add_argument("--spool", action="store_true", help="Pre-render every message into the on-disk spool (SPOOL_DIR) before sending")
+        parser.add_argument("--export", type=str, metavar="PATH", help="Export the rendered messages to an mbox file (*.mbox) or a directory of .eml files")
+        parser.add_argument("--import-log", type=str, metavar="CSV", help="Import an existing sent_log.csv into the SQLite sent log (LOG_FILE must end in .db)")
+        parser.add_argument("--schedule", action="store_true", help="When the daily quota is used up, wait for the next window and resume")
+        parser.add_argument("--skip-log", type=str, metavar="CSV", help="Write every skipped contact (reason, name, email) to this file")
+        parser.add_argument("--events", type=str, metavar="PATH|fd:N", help="Stream JSON Lines progress events to a file or an inherited file descriptor")
+        parser.add_argument("--profile", type=str, nargs='?', const=config.get('PROFILE_FILE', 'data/profile.json'), metavar="JSON", help="Write per-stage timings to a JSON report and a Prometheus .prom file")
+        parser.add_argument("--daemon", action="store_true", help="Run as a service: authenticate once and send the campaigns queued with --submit")
+        parser.add_argument("--submit", action="store_true", help="Queue the campaign (--contacts, --template, --attach, --subject) for the daemon")
+        parser.add_argument("--priority", type=int, default=0, help="Priority of a --submit job (higher runs first)")
+        parser.add_argument("--attach", type=str, action="append", metavar="FILE", help="Attachment for a --submit job (repeatable; default ATTACHMENTS)")
+        parser.add_argument("--subject", type=str, metavar="FORMAT", help="Subject format for a --submit job (default EMAIL_SUBJECT_FORMAT)")
+        parser.add_argument("--campaign", type=str, help="Campaign label for a --submit job (default CAMPAIGN)")
+        parser.add_argument("--jobs", action="store_true", help="Show the daemon's job queue and each job's status")
+        parser.add_argument("--cancel", type=int, metavar="JOB", help="Cancel a queued job")
         parser.add_argument("--setup", action="store_true", help="Show the Google API setup guide")
         return parser.parse_args()
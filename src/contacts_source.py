@@ -0,0 +1,297 @@
+import json
+import os
+import numpy as np
+
+MANDATORY_COLUMNS = ['company_name', 'company_email']
+DEFAULT_CHUNK_SIZE = 50_000
+# Bytes scanned at a time for row offsets, and how many recent chunks keep theirs
+SCAN_BLOCK = 1024 * 1024
+KEEP_OFFSETS = 8
+# Bytes that may come right before an opening quote and right after a closing one
+_BEFORE_OPEN = np.frombuffer(b',\n"', dtype=np.uint8)
+_AFTER_CLOSE = np.frombuffer(b',\r\n"', dtype=np.uint8)
+
+FORMATS = {
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+}
+
+def contacts_format(path):
+    """Format of a contacts file, from its extension (unknown extensions read as CSV)."""
+    return FORMATS.get(os.path.splitext(path)[1].lower(), 'csv')
+
+class _RowOffsets:
+    """Byte offsets at which the rows of a CSV or JSON Lines file start.
+
+    Scans the raw bytes alongside the parser, a block at a time: a newline
+    ends a record unless it falls inside a quoted field (an odd number of
+    quotes before it; escaped quotes come in pairs), and records holding
+    only spaces and tabs are skipped, as pandas skips blank lines. JSON
+    Lines has no quoting to track, since strings cannot hold raw newlines.
+
+    Quote counting only agrees with the parser while every quote opens a
+    field or closes one. A quote inside an unquoted field ('5" disk') or
+    text after a closing quote is literal to pandas, so `reliable` turns
+    False when one is seen; the offsets from then on cannot be trusted.
+    """
+
+    def __init__(self, path, offset, quoted):
+        self.file = open(path, 'rb')
+        self.file.seek(offset)
+        self.position = offset
+        self.quoted = quoted
+        self.in_quotes = False
+        self.record_start = offset
+        self.record_filled = False
+        self.reliable = True
+        # The byte before the block (a record start to begin with), and whether the block
+        # before ended on a closing quote, whose next byte still has to be checked
+        self.previous = ord('\n')
+        self.closed = False
+        self.starts = []
+        self.ready = 0
+
+    def close(self):
+        self.file.close()
+
+    def take(self, rows):
+        """Offsets of the next `rows` rows, plus the offset just past them."""
+        while self.ready <= rows and self._scan():
+            pass
+        found = np.concatenate(self.starts) if self.starts else np.empty(0, dtype=np.int64)
+        if len(found) <= rows:
+            found = np.append(found, self.position)
+        self.starts = [found[rows:]]
+        self.ready = len(found) - rows
+        return found[:rows + 1]
+
+    def finished(self):
+        """Whether no rows are left, reading on to the end of the file."""
+        while self._scan():
+            pass
+        # take() leaves the end-of-file offset behind once it runs out
+        return not any((starts < self.position).any() for starts in self.starts)
+
+    def _scan(self):
+        block = self.file.read(SCAN_BLOCK)
+        if not block:
+            if self.record_filled:
+                self._add(np.array([self.record_start], dtype=np.int64))
+                self.record_filled = False
+            return False
+        data = np.frombuffer(block, dtype=np.uint8)
+        ends = np.flatnonzero(data == ord('\n'))
+        if self.quoted:
+            # A newline is inside quotes after an odd number of quote characters (counting earlier blocks)
+            quotes = np.flatnonzero(data == ord('"'))
+            if self.reliable:
+                self._check_quotes(data, quotes)
+            if len(quotes) or self.in_quotes:
+                inside = (np.searchsorted(quotes, ends) + self.in_quotes) % 2 == 1
+                ends = ends[~inside]
+                self.in_quotes = (len(quotes) + self.in_quotes) % 2 == 1
+        # Whether each record (and the unfinished one at the end of the block) has more than whitespace
+        bounds = np.concatenate(([0], ends + 1))
+        if bounds[-1] == len(data):
+            bounds = bounds[:-1]
+        blank = (data == ord(' ')) | (data == ord('\t')) | (data == ord('\r')) | (data == ord('\n'))
+        filled = np.logical_or.reduceat(~blank, bounds)
+        if len(ends):
+            filled[0] |= self.record_filled
+            offsets = self.position + bounds
+            offsets[0] = self.record_start
+            self._add(offsets[:len(ends)][filled[:len(ends)]])
+            self.record_start = self.position + int(ends[-1]) + 1
+            self.record_filled = len(filled) > len(ends) and bool(filled[-1])
+        else:
+            self.record_filled |= bool(filled[0])
+        self.position += len(block)
+        return True
+
+    def _check_quotes(self, data, quotes):
+        # An opening quote must start a field (or be the second of an escaped pair), and a
+        # closing one must end it (or be the first of a pair)
+        if self.closed and data[0] not in _AFTER_CLOSE:
+            self.reliable = False
+        opening = (np.arange(len(quotes)) + self.in_quotes) % 2 == 0
+        before = data[quotes[opening] - 1]
+        if len(before) and quotes[opening][0] == 0:
+            before[0] = self.previous
+        after = quotes[~opening] + 1
+        self.closed = bool(len(after)) and after[-1] == len(data)
+        if self.closed:
+            after = after[:-1]
+        if not (np.isin(before, _BEFORE_OPEN).all() and np.isin(data[after], _AFTER_CLOSE).all()):
+            self.reliable = False
+        self.previous = data[-1]
+
+    def _add(self, offsets):
+        if len(offsets):
+            self.starts.append(offsets)
+            self.ready += len(offsets)
+
+def _parquet():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Reading Parquet contacts requires pyarrow (pip install pyarrow)") from None
+    return pq
+
+class ContactsSource:
+    """Reads a contacts file (CSV, JSON Lines or Parquet) in bounded-size chunks.
+
+    Only the header is read by `validate()`; `chunks()` yields DataFrames of at
+    most `chunk_size` rows, indexed by their position in the file. For CSV and
+    JSON Lines, the byte offsets of the rows in the last few chunks read are
+    kept, so that a checkpoint can later resume by seeking (see offset()).
+    Seeking is turned off for the file if the offsets stop matching the
+    rows pandas parses.
+    """
+
+    def __init__(self, path, chunk_size=None):
+        self.path = path
+        self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        self.format = contacts_format(path)
+        # (first row, offsets) per recent chunk; replaced, never mutated, as other threads read it
+        self._offsets = []
+        self.seekable = True
+
+    def columns(self):
+        """Column names, read without loading any rows."""
+        if self.format == 'parquet':
+            return list(_parquet().read_schema(self.path).names)
+        if self.format == 'jsonl':
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        return list(json.loads(line))
+            return []
+        import pandas as pd
+        return list(pd.read_csv(self.path, nrows=0).columns)
+
+    def validate(self):
+        """Check the mandatory columns up front; returns the column names."""
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Contacts file not found: {self.path}")
+        found = self.columns()
+        missing = [col for col in MANDATORY_COLUMNS if col not in found]
+        if missing:
+            raise ValueError(
+                f"Missing mandatory columns: {', '.join(missing)}\n"
+                f"Found columns: {', '.join(found)}\n"
+                f"Tip: Ensure the {self.format.upper()} headers match exactly: {', '.join(MANDATORY_COLUMNS)}"
+            )
+        return found
+
+    def offset(self, row):
+        """Byte offset at which `row` starts, if it is in one of the chunks read last (and seeking is on)."""
+        for first, offsets in reversed(self._offsets):
+            if first <= row < first + len(offsets):
+                return int(offsets[row - first])
+        return None
+
+    def chunks(self, start=0, seek=None):
+        """Yield the contacts as DataFrames of at most `chunk_size` rows.
+
+        Rows before `start` are skipped without being parsed into frames.
+        `seek`, a (row, byte offset) pair from offset() with row <= `start`,
+        lets CSV and JSON Lines reading jump there instead of skipping from
+        the top of the file. Each chunk is indexed by row position in the file.
+        """
+        import pandas as pd
+        position = start
+        for chunk in self._read_chunks(start, seek):
+            chunk.index = pd.RangeIndex(position, position + len(chunk))
+            position += len(chunk)
+            yield chunk
+
+    def _read_chunks(self, start, seek):
+        if self.format == 'parquet':
+            yield from self._read_parquet(start)
+            return
+        row, offset = seek if seek and seek[0] <= start else (0, None)
+        # Without a seek point, pandas reads from the top (header included) and the scan only
+        # supplies offsets, which are checked against the rows pandas finds
+        scan = _RowOffsets(self.path, self._first_row_offset() if offset is None else offset,
+                           quoted=self.format == 'csv')
+        skip = 0
+        try:
+            if start > row:
+                # Rows between the seek point and `start`: found in the raw bytes, not parsed
+                skipped = scan.take(start - row)
+                if scan.reliable and len(skipped) == start - row + 1:
+                    offset = int(skipped[-1])
+                else:
+                    # The scan cannot be trusted here: parse those rows and drop them instead
+                    self._stop_seeking()
+                    skip = start - row
+            read = self._read_jsonl if self.format == 'jsonl' else self._read_csv
+            for chunk in read(offset):
+                if skip:
+                    dropped = min(skip, len(chunk))
+                    chunk, skip = chunk.iloc[dropped:], skip - dropped
+                    if chunk.empty:
+                        continue
+                if self.seekable:
+                    offsets = scan.take(len(chunk))
+                    if scan.reliable and len(offsets) == len(chunk) + 1:
+                        self._offsets = self._offsets[-(KEEP_OFFSETS - 1):] + [(start, offsets)]
+                    else:
+                        self._stop_seeking()
+                start += len(chunk)
+                yield chunk
+            if self.seekable and not scan.finished():
+                # More rows in the raw bytes than pandas parsed
+                self._stop_seeking()
+        finally:
+            scan.close()
+
+    def _stop_seeking(self):
+        self.seekable = False
+        self._offsets = []
+
+    def _first_row_offset(self):
+        """Byte offset just past the header (0 for JSON Lines, which has none)."""
+        if self.format == 'jsonl':
+            return 0
+        scan = _RowOffsets(self.path, 0, quoted=True)
+        try:
+            return int(scan.take(1)[-1])
+        finally:
+            scan.close()
+
+    def _read_parquet(self, start):
+        parquet = _parquet().ParquetFile(self.path)
+        skip = start
+        for group in range(parquet.num_row_groups):
+            rows = parquet.metadata.row_group(group).num_rows
+            if skip >= rows:
+                skip -= rows
+                continue
+            for batch in parquet.iter_batches(batch_size=self.chunk_size, row_groups=[group]):
+                if skip >= batch.num_rows:
+                    skip -= batch.num_rows
+                    continue
+                yield batch.slice(skip).to_pandas()
+                skip = 0
+
+    def _read_jsonl(self, offset):
+        import pandas as pd
+        with open(self.path, 'r', encoding='utf-8') as f:
+            f.seek(offset or 0)
+            yield from pd.read_json(f, lines=True, chunksize=self.chunk_size, dtype=False)
+
+    def _read_csv(self, offset):
+        import pandas as pd
+        with open(self.path, 'rb') as f:
+            if offset is None:
+                reader = pd.read_csv(f, chunksize=self.chunk_size)
+            else:
+                f.seek(offset)
+                # Past the header, so the names come from columns()
+                reader = pd.read_csv(f, chunksize=self.chunk_size, header=None, names=self.columns())
+            with reader:
+                yield from reader
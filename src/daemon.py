@@ -0,0 +1,147 @@
+import os
+import threading
+from datetime import datetime
+
+from .data_manager import DataManager
+from .engine import EmailEngine, QuotaWindowExhausted, make_attachment_cache
+from .metrics import Metrics
+from .progress import ProgressReporter
+from .template_manager import TemplateManager
+from .ui import GREEN, RED, RESET, YELLOW
+
+class CampaignDaemon:
+    """Runs queued campaigns (see JobQueue) one after another in a single long-lived process.
+
+    What is expensive to set up is built once and shared by every job: the
+    authenticated Gmail client or SMTP pool and sender accounts (passed in),
+    the attachment cache (encoded parts are reused while the files are
+    unchanged, within ATTACHMENT_CACHE_MB), the suppression index (reloaded only when its source files
+    change), the set of sent addresses and the daily quota ledger. The
+    daemon should be the only process sending with LOG_FILE while it runs.
+    """
+
+    def __init__(self, queue, config, service=None, accounts=None, http_pool=None, transport=None,
+                 progress=None, metrics=None, workers=None, batch_size=None, poll_interval=5.0):
+        self.queue = queue
+        self.config = config
+        self.service = service
+        self.accounts = accounts or []
+        self.http_pool = http_pool
+        self.transport = transport
+        self.progress = progress or ProgressReporter(interval=config.get('PROGRESS_INTERVAL', 0.5))
+        self.metrics = metrics or Metrics()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.attachment_cache = make_attachment_cache(config)
+        self.sent_emails = None
+        self.quota_ledger = None
+        self._suppression = None
+        self._suppression_fingerprint = None
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Stop once the current job is finished."""
+        self._stop.set()
+
+    def serve(self, once=False):
+        """Run jobs as they become ready; with `once`, return when none is."""
+        requeued = self.queue.requeue_running()
+        if requeued:
+            print(f"{YELLOW}Resuming {requeued} jobs interrupted by an earlier shutdown.{RESET}")
+        print(f"Waiting for jobs in {self.queue.path} (Ctrl+C to stop)...")
+        while not self._stop.is_set():
+            job = self.queue.claim()
+            if job is None:
+                if once:
+                    return
+                self._stop.wait(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        """Run one claimed job through EmailEngine and record its outcome; returns the new status."""
+        print(f"\n{GREEN}Job {job['id']}{RESET}: {job['contacts']} (priority {job['priority']})")
+        self.progress.event('job_start', job=job['id'], contacts=job['contacts'], priority=job['priority'])
+        config = dict(self.config, ATTACHMENTS=job['attachments'], CAMPAIGN=job['campaign'],
+                      EMAIL_SUBJECT_FORMAT=job['subject'] or self.config['EMAIL_SUBJECT_FORMAT'])
+        checkpoint_file = self._checkpoint_file(job)
+        counts = {}
+        try:
+            engine = self._prepare(job, config, checkpoint_file)
+            try:
+                sent, skipped, failed = engine.run(workers=self.workers, batch_size=self.batch_size)
+            finally:
+                counts = {'sent': engine.sent_count, 'skipped': engine.skipped_count, 'failed': engine.error_count}
+                # Keep what the engine built for the next job
+                self.sent_emails = engine.data_manager.sent_emails
+                self.quota_ledger = getattr(engine, 'quota', None)
+        except QuotaWindowExhausted as e:
+            print(f"{YELLOW}{e}. Job {job['id']} resumes at {e.next_window:%Y-%m-%d %H:%M}.{RESET}")
+            self.queue.defer(job['id'], e.next_window, error=str(e), **counts)
+            status = 'queued'
+        except KeyboardInterrupt:
+            self.queue.defer(job['id'], datetime.now(), error="Interrupted", **counts)
+            self.progress.event('job_end', job=job['id'], status='queued', **counts)
+            raise
+        except Exception as e:
+            print(f"{RED}Job {job['id']} failed: {e}{RESET}")
+            self.queue.finish(job['id'], 'failed', error=str(e), **counts)
+            status = 'failed'
+        else:
+            self.queue.finish(job['id'], 'done', sent=sent, skipped=skipped, failed=failed)
+            print(f"{GREEN}Job {job['id']} done:{RESET} sent {sent}, skipped {skipped}, failed {failed}")
+            if checkpoint_file and os.path.exists(checkpoint_file):
+                os.remove(checkpoint_file)
+            status = 'done'
+        self.progress.event('job_end', job=job['id'], status=status, **counts)
+        return status
+
+    def _prepare(self, job, config, checkpoint_file):
+        """Load the job's contacts and template against the warm caches; returns its engine."""
+        data_manager = DataManager(
+            job['contacts'],
+            config['LOG_FILE'],
+            job['campaign'],
+            config.get('SUPPRESSION_FILES'),
+            config.get('SUPPRESSION_INDEX'),
+            config.get('CONTACTS_CHUNK_SIZE'),
+            checkpoint_file
+        )
+        template_manager = TemplateManager(job['template'], config['EMAIL_SUBJECT_FORMAT'])
+        data_manager.load_contacts()
+        data_manager.load_sent_log(self.sent_emails)
+        data_manager.load_suppression(self._suppression_index(config))
+        template_manager.load_template()
+        # Also counts the addresses after multi-address cells are split, for the progress total
+        summary = data_manager.summarize(template_manager.field_names(), upcoming=0)
+        rejected = summary['stats']['rejected']
+        if rejected:
+            print(f"{YELLOW}{rejected} invalid addresses will not be sent, e.g. "
+                  f"{', '.join(address for _, address in summary['rejected'])}{RESET}")
+        problems = template_manager.validate(data_manager.columns, summary['empty'])
+        if problems['unknown']:
+            raise ValueError(f"Template uses fields with no matching contacts column: {', '.join(problems['unknown'])}")
+        return EmailEngine(self.service, data_manager, template_manager, config, self.accounts, self.metrics,
+                           self.http_pool, self.transport, self.progress, self.attachment_cache, self.quota_ledger)
+
+    def _suppression_index(self, config):
+        """The suppression index, reloaded only when its source files have changed."""
+        from .suppression import load_suppression_index, sources_fingerprint
+
+        sources = config.get('SUPPRESSION_FILES')
+        if not sources or not config.get('SUPPRESSION_INDEX'):
+            return None
+        fingerprint = sources_fingerprint(sources)
+        if fingerprint != self._suppression_fingerprint:
+            self._suppression = load_suppression_index(sources, config['SUPPRESSION_INDEX'])
+            self._suppression_fingerprint = fingerprint
+        return self._suppression
+
+    def _checkpoint_file(self, job):
+        """Each job resumes from its own checkpoint (CHECKPOINT_FILE with the job id added)."""
+        path = self.config.get('CHECKPOINT_FILE')
+        if not path:
+            return None
+        root, ext = os.path.splitext(path)
+        return f"{root}_job{job['id']}{ext}"
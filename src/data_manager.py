@@ -1,108 +1,425 @@
 import os
-import pandas as pd
-from datetime import datetime
+import itertools
+import threading
+import numpy as np
+from .addresses import parse_address_cells
+from .checkpoint import Checkpoint
+from .contacts_source import ContactsSource
+from .scheduler import domain_counts, fair_order
+from .sent_log import open_sent_log
+from .suppression import load_suppression_index, normalize_address
+
+PENDING = 0
+MISSING_EMAIL = 1
+MANUALLY_SKIPPED = 2
+ALREADY_SENT = 3
+DUPLICATE = 4
+SUPPRESSED = 5
+INVALID = 6
+
+SKIP_REASONS = {
+    MISSING_EMAIL: "Empty email",
+    MANUALLY_SKIPPED: "Excluded name (!)",
+    ALREADY_SENT: "Already sent",
+    DUPLICATE: "Duplicate address",
+    SUPPRESSED: "Unsubscribed or bounced",
+    INVALID: "Invalid address",
+}
+
+def _clean_column(contacts, column):
+    """Stripped string values of a column, as the old str(row.get(col, '')).strip() produced."""
+    import pandas as pd
+
+    if column not in contacts.columns:
+        return np.full(len(contacts), '', dtype=object)
+    values = contacts[column].to_numpy(dtype=object)
+    if pd.api.types.infer_dtype(values, skipna=False) != 'string':
+        # Only the other cells (usually the NaN of empty ones) need str(v), which makes NaN 'nan'
+        values = values.copy()
+        other = ~_flags(map(isinstance, values, itertools.repeat(str)), len(values))
+        values[other] = [str(v) for v in values[other]]
+    return np.array(list(map(str.strip, values)), dtype=object)
+
+def _flags(results, count):
+    """Boolean array from an iterator of bools, e.g. a map of a builtin method (no per-row Python frame)."""
+    return np.fromiter(results, dtype=bool, count=count)
+
+def _contained(values, keys):
+    """Boolean array: which of `values` are in the set `keys`."""
+    return _flags(map(keys.__contains__, values), len(values))
+
+class SendPlan:
+    """Per-address classification of the contacts list, computed once and shared.
+
+    Addresses are cleaned and validated first (see addresses.parse_address_cells):
+    a cell holding several addresses becomes one entry per address, and
+    `positions` maps each entry back to its row position in the contacts.
+    `status` holds one of PENDING / MISSING_EMAIL / MANUALLY_SKIPPED /
+    INVALID / ALREADY_SENT / DUPLICATE / SUPPRESSED per entry (in file
+    order); `pending` holds the indices of the entries to send, in order.
+    Addresses are compared in normalized form (see
+    suppression.normalize_address).
+    """
+
+    def __init__(self, names, emails, status, positions=None):
+        self.names = names
+        self.emails = emails
+        self.status = status
+        self.positions = np.arange(len(status)) if positions is None else positions
+        # Every row has at least one entry, so a split cell shows up as more entries than rows
+        split = len(self.positions) and self.positions[-1] + 1 < len(self.positions)
+        self.split_cells = int(np.count_nonzero(np.bincount(self.positions) > 1)) if split else 0
+        self.pending = np.flatnonzero(status == PENDING)
+        self._fair_order = None
+
+    @classmethod
+    def classify(cls, contacts, sent_keys, suppression=None, seen=None):
+        """Classify `contacts` against normalized sent addresses.
+
+        Pass the same `seen` set for consecutive chunks of one file so that
+        duplicates are detected across chunk boundaries.
+        """
+        import pandas as pd
+
+        names = _clean_column(contacts, 'company_name')
+        emails, valid, positions = parse_address_cells(_clean_column(contacts, 'company_email'))
+        # Casting to one-character strings leaves each name's first character
+        manual = names.astype('U1') == '!'
+        if len(positions) != len(names):
+            names = names[positions]
+            manual = manual[positions]
+
+        # Cleaned addresses are already NFKC-normalized and stripped, so lower() gives normalize_address()
+        keys = np.array(list(map(str.lower, emails)), dtype=object)
+        missing = (keys == '') | (keys == 'nan')
+        candidates = ~missing & ~manual & valid
+        already = np.zeros(len(emails), dtype=bool)
+        if sent_keys:
+            already[candidates] = _contained(keys[candidates], sent_keys)
+            candidates &= ~already
+        # Repeats within this chunk, and addresses already seen in earlier chunks
+        index = np.flatnonzero(candidates)
+        repeated = pd.Series(keys[index], dtype=object).duplicated().to_numpy(dtype=bool)
+        if seen:
+            repeated = repeated | _contained(keys[index], seen)
+        if seen is not None:
+            seen.update(keys[index[~repeated]])
+        duplicate = np.zeros(len(emails), dtype=bool)
+        duplicate[index] = repeated
+
+        # The first condition that holds wins
+        status = np.select(
+            [missing, manual, ~valid, already, duplicate],
+            [MISSING_EMAIL, MANUALLY_SKIPPED, INVALID, ALREADY_SENT, DUPLICATE],
+            PENDING
+        ).astype(np.int8)
+        if suppression is not None:
+            candidates = np.flatnonzero(status == PENDING)
+            hits = suppression.lookup_many(keys[candidates].tolist())
+            status[candidates[hits != 0]] = SUPPRESSED
+        return cls(names, emails, status, positions)
+
+    def skip_reason(self, index):
+        return SKIP_REASONS.get(int(self.status[index]))
+
+    def counts(self):
+        counts = np.bincount(self.status, minlength=len(SKIP_REASONS) + 1)
+        return {
+            'total': len(self.status),
+            # Every row has at least one entry, and positions run in file order
+            'rows': int(self.positions[-1]) + 1 if len(self.positions) else 0,
+            'already_sent': int(counts[ALREADY_SENT]),
+            'missing_email': int(counts[MISSING_EMAIL]),
+            'manually_skipped': int(counts[MANUALLY_SKIPPED]),
+            'duplicates': int(counts[DUPLICATE]),
+            'suppressed': int(counts[SUPPRESSED]),
+            'rejected': int(counts[INVALID]),
+            'split_cells': self.split_cells,
+            'to_be_skipped': int(counts[MISSING_EMAIL] + counts[MANUALLY_SKIPPED] + counts[DUPLICATE] + counts[SUPPRESSED]
+                                 + counts[INVALID]),
+            'net_to_send': int(counts[PENDING])
+        }
+
+    def upcoming(self, limit, round_robin=False):
+        """(name, email) of the next `limit` pending contacts (in fair_order() with `round_robin`)."""
+        pending = self.fair_order() if round_robin else self.pending
+        return [(self.names[i], self.emails[i]) for i in pending[:limit]]
+
+    def rejected(self, limit):
+        """(name, address) of the first `limit` entries rejected as invalid."""
+        return [(self.names[i], self.emails[i]) for i in np.flatnonzero(self.status == INVALID)[:limit]]
+
+    def fair_order(self):
+        """Indices of the pending entries, interleaved round-robin across recipient domains."""
+        if self._fair_order is None:
+            self._fair_order = self.pending[fair_order(self.emails[self.pending])]
+        return self._fair_order
+
+    def domain_counts(self):
+        """Pending addresses per recipient domain."""
+        return domain_counts(self.emails[self.pending])
+
+    def row_entries(self):
+        """Number of entries per row position, or None if no cell was split."""
+        return np.bincount(self.positions) if self.split_cells else None
+
+def _add_counts(totals, counts):
+    if totals is None:
+        return dict(counts)
+    return {key: totals[key] + value for key, value in counts.items()}
 
 class DataManager:
-    def __init__(self, contacts_file, log_file):
+    def __init__(self, contacts_file, log_file, campaign=None, suppression_files=None, suppression_index=None,
+                 chunk_size=None, checkpoint_file=None):
         self.contacts_file = contacts_file
+        self.source = ContactsSource(contacts_file, chunk_size)
         self.log_file = log_file
+        self.campaign = campaign or ''
+        self.suppression_files = suppression_files or {}
+        self.suppression_index_path = suppression_index
+        self.suppression = None
+        self.sent_log = open_sent_log(log_file)
+        self.checkpoint = (Checkpoint(checkpoint_file, contacts_file, self.campaign, locate=self.source.offset)
+                           if checkpoint_file else None)
+        self.start_row = 0
+        self.start_seek = None
+        self._pending_rows = {}
+        self._row_entries = {}
         self.contacts = None
+        self.columns = None
+        self.total_rows = None
+        # Rows can hold several addresses; known once the list has been classified (summarize())
+        self.total_addresses = None
         self.sent_emails = set()
+        self._sent_keys = None
+        self._plan = None
+        self._log_lock = threading.Lock()
 
     def load_contacts(self):
-        """Read the contacts CSV file."""
-        if not os.path.exists(self.contacts_file):
-            raise FileNotFoundError(f"Contacts file not found: {self.contacts_file}")
-        
-        self.contacts = pd.read_csv(self.contacts_file)
-        
-        # Strict validation of mandatory columns
-        mandatory = ['company_name', 'company_email']
-        missing = [col for col in mandatory if col not in self.contacts.columns]
-        
-        if missing:
-            found = list(self.contacts.columns)
-            raise ValueError(
-                f"Missing mandatory columns: {', '.join(missing)}\n"
-                f"Found columns: {', '.join(found)}\n"
-                f"Tip: Ensure the CSV headers match exactly: {', '.join(mandatory)}"
-            )
-            
-        return self.contacts
+        """Validate the contacts file and read it, if it fits in a single chunk.
+
+        Larger files are left on disk (`contacts` stays None) and streamed
+        chunk by chunk through iter_plans(), so memory does not grow with the
+        list. With a checkpoint for this (unchanged) file, reading starts at
+        the first row not yet processed.
+        """
+        import pandas as pd
+        self.columns = self.source.validate()
+        self._plan = None
+        self.total_rows = None
+        self.total_addresses = None
+        self.start_row = self.checkpoint.resume_row() if self.checkpoint else 0
+        self.start_seek = self.checkpoint.seek if self.checkpoint else None
 
-    def load_sent_log(self):
-        """Load sent emails from the log file."""
-        if not os.path.exists(self.log_file):
-            self.sent_emails = set()
-            return self.sent_emails
-        
+        chunks = self.source.chunks(self.start_row, self.start_seek)
         try:
-            df = pd.read_csv(self.log_file)
-            self.sent_emails = set(df['email'].unique())
-        except Exception:
-            self.sent_emails = set()
+            first = next(chunks, None)
+        finally:
+            chunks.close()
+        if first is None:
+            first = pd.DataFrame(columns=self.columns, index=pd.RangeIndex(self.start_row, self.start_row))
+        if len(first) < self.source.chunk_size:
+            self.contacts = first
+            self.total_rows = len(first)
+        else:
+            self.contacts = None
+        return self.contacts
+
+    @property
+    def is_streaming(self):
+        return self.contacts is None and self.columns is not None
+
+    def load_sent_log(self, sent_emails=None):
+        """Load sent emails from the log file.
+
+        A caller that already holds the set for this log (the daemon, across
+        jobs) passes it as `sent_emails`; it is then shared, not re-read.
+        """
+        self.sent_emails = self.sent_log.load() if sent_emails is None else sent_emails
+        self._sent_keys = None
+        self._plan = None
         return self.sent_emails
 
-    def log_send(self, email, name):
-        """Record a successful send in the log file."""
-        if os.path.dirname(self.log_file):
-            os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
-            
-        file_exists = os.path.exists(self.log_file)
-        log_data = {
-            'timestamp': [datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
-            'name': [name],
-            'email': [email]
-        }
-        df = pd.DataFrame(log_data)
-        df.to_csv(self.log_file, mode='a', index=False, header=not file_exists)
+    def load_suppression(self, index=None):
+        """Load (rebuilding if the source files changed) the unsubscribe/bounce index.
+
+        An `index` already loaded by the caller is used as is.
+        """
+        if index is not None:
+            self.suppression = index
+        elif self.suppression_files and self.suppression_index_path:
+            self.suppression = load_suppression_index(self.suppression_files, self.suppression_index_path)
+        else:
+            self.suppression = None
+        self._plan = None
+        return self.suppression
+
+    def log_send(self, email, name, account=''):
+        """Record a successful send in the log file. Safe to call from worker threads."""
+        with self._log_lock:
+            self._append_log(email, name, account)
+            self._finish_pending(email)
+
+    def track_row(self, email, row, entries=1):
+        """Note the file row of a pending contact, so its send advances the checkpoint.
+
+        `entries` is the number of addresses the row's cell was split into;
+        the checkpoint only moves past the row once all of them are finished.
+        """
+        if self.checkpoint is not None:
+            with self._log_lock:
+                self._pending_rows[email] = row
+                if entries > 1:
+                    self._row_entries.setdefault(row, entries)
+
+    def mark_row_done(self, row, entries=1):
+        """Advance the checkpoint past a row (or one of its `entries` addresses) that was skipped."""
+        if self.checkpoint is not None:
+            with self._log_lock:
+                if entries > 1:
+                    self._row_entries.setdefault(row, entries)
+                self._row_finished(row)
+
+    def mark_email_done(self, email):
+        """Advance the checkpoint past a tracked contact that turned out not to need sending."""
+        if self.checkpoint is not None:
+            with self._log_lock:
+                self._finish_pending(email)
+
+    def _finish_pending(self, email):
+        row = self._pending_rows.pop(email, None)
+        if row is not None:
+            self._row_finished(row)
+
+    def _row_finished(self, row):
+        remaining = self._row_entries.get(row)
+        if remaining is not None:
+            if remaining > 1:
+                self._row_entries[row] = remaining - 1
+                return
+            del self._row_entries[row]
+        self.checkpoint.done(row)
+
+    def _append_log(self, email, name, account):
+        self.sent_log.append(email, name, campaign=self.campaign, account=account)
         self.sent_emails.add(email)
 
+    def flush_log(self):
+        """Make every logged send durable (fsync / WAL checkpoint)."""
+        with self._log_lock:
+            self.sent_log.close()
+            if self.checkpoint is not None:
+                self.checkpoint.save()
+
     def reset_log(self):
         """Delete the existing log file."""
-        if os.path.exists(self.log_file):
-            os.remove(self.log_file)
-            self.sent_emails = set()
+        with self._log_lock:
+            self.sent_log.reset()
+            if self.checkpoint is not None:
+                self.checkpoint.reset()
+        self.sent_emails = set()
+        self._sent_keys = None
+        self._plan = None
 
-    def get_stats(self):
-        """Calculate statistics about the contacts list."""
+    def sent_keys(self):
+        """Normalized form of the sent log as loaded, for classification."""
+        if self._sent_keys is None:
+            self._sent_keys = {normalize_address(e) for e in self.sent_emails}
+        return self._sent_keys
+
+    def get_plan(self):
+        """Return the cached SendPlan of an in-memory contacts list.
+
+        The plan reflects the sent log as loaded; sends made afterwards are
+        tracked in sent_emails, not in the plan. Streamed lists have no single
+        plan; use iter_plans() instead.
+        """
+        if self.columns is None:
+            self.load_contacts()
         if self.contacts is None:
+            raise RuntimeError("Contacts are streamed; use iter_plans()")
+        if self._plan is None:
+            self._plan = SendPlan.classify(self.contacts, self.sent_keys(), self.suppression)
+        return self._plan
+
+    def iter_plans(self):
+        """Yield (contacts_chunk, SendPlan) pairs covering the whole list in file order."""
+        if self.columns is None:
             self.load_contacts()
-        
-        total = len(self.contacts)
-        already_sent = 0
-        missing_email = 0
-        manually_skipped = 0
-        to_send = 0
-        
-        for _, row in self.contacts.iterrows():
-            email = str(row.get('company_email', '')).strip()
-            name = str(row.get('company_name', '')).strip()
-            
-            is_empty_email = not email or email.lower() == 'nan'
-            is_skip_tag = name.startswith('!')
-            
-            if is_empty_email:
-                missing_email += 1
-            elif is_skip_tag:
-                manually_skipped += 1
-            elif email in self.sent_emails:
-                already_sent += 1
-            else:
-                to_send += 1
-                
+        if self.contacts is not None:
+            yield self.contacts, self.get_plan()
+            return
+        seen = set()
+        for chunk in self.source.chunks(self.start_row, self.start_seek):
+            yield chunk, SendPlan.classify(chunk, self.sent_keys(), self.suppression, seen=seen)
+
+    def summarize(self, fields=(), upcoming=5, rejected=5, attachment_column=None, domains=False,
+                  round_robin=False):
+        """Everything shown before sending, computed in one pass over the list.
+
+        Returns a dict with 'stats' (SendPlan.counts() summed over the rows
+        still to process: 'rows' of them holding 'total' addresses, plus
+        'resumed_from', the checkpoint row),
+        'upcoming' (the next pending (name, email) pairs), 'rejected' (the
+        first invalid (name, address) pairs), 'first_pending' ((email, row)
+        of the first pending contact, or None) and 'empty' (field -> number
+        of pending rows with no value, for each of `fields`). With
+        `attachment_column`, 'attachment_cells' maps each distinct non-empty
+        value of that column to the number of pending addresses carrying it.
+        With `domains`, 'domains' maps each recipient domain to its number of
+        pending addresses. With `round_robin`, 'upcoming' follows the order
+        the engine sends in under DOMAIN_ROUND_ROBIN.
+        """
+        totals = None
+        next_up = []
+        invalid = []
+        first_pending = None
+        empty = dict.fromkeys(fields, 0)
+        attachment_cells = {}
+        domain_totals = {}
+        for chunk, plan in self.iter_plans():
+            totals = _add_counts(totals, plan.counts())
+            if len(next_up) < upcoming:
+                next_up += plan.upcoming(upcoming - len(next_up), round_robin)
+            if len(invalid) < rejected:
+                invalid += plan.rejected(rejected - len(invalid))
+            if not len(plan.pending):
+                continue
+            if first_pending is None:
+                index = plan.pending[0]
+                row = chunk.iloc[plan.positions[index]].to_dict()
+                row['company_email'] = plan.emails[index]
+                first_pending = (plan.emails[index], row)
+            pending = chunk.iloc[plan.positions[plan.pending]]
+            for field in empty:
+                empty[field] += int(pending[field].isna().sum()) if field in pending.columns else len(pending)
+            if domains:
+                for domain, count in plan.domain_counts().items():
+                    domain_totals[domain] = domain_totals.get(domain, 0) + count
+            if attachment_column in pending.columns:
+                for cell, count in pending[attachment_column].dropna().value_counts().items():
+                    attachment_cells[cell] = attachment_cells.get(cell, 0) + int(count)
+        self.total_rows = totals['rows']
+        self.total_addresses = totals['total']
+        totals['resumed_from'] = self.start_row
         return {
-            'total': total,
-            'already_sent': already_sent,
-            'missing_email': missing_email,
-            'manually_skipped': manually_skipped,
-            'to_be_skipped': missing_email + manually_skipped,
-            'net_to_send': to_send
+            'stats': totals,
+            'upcoming': next_up,
+            'rejected': invalid,
+            'first_pending': first_pending,
+            'empty': {field: count for field, count in empty.items() if count},
+            'attachment_cells': attachment_cells,
+            'domains': domain_totals,
         }
 
+    def get_stats(self):
+        """Statistics about the contacts list (the 'stats' of summarize())."""
+        return self.summarize()['stats']
+
     def generate_template(self):
         """Create a sample contacts.csv file."""
         os.makedirs(os.path.dirname(self.contacts_file), exist_ok=True)
+        import pandas as pd
         df = pd.DataFrame({
             'company_name': ['Example Corp', '!Ignore This Line'],
             'company_email': ['hello@example.com', 'test@test.com']
@@ -1,8 +1,16 @@
 import os.path
+import re
 import base64
+import hashlib
+import mimetypes
+import tempfile
+import threading
+from collections import OrderedDict
+from email import encoders
+from email.generator import _make_boundary
+from email.mime.base import MIMEBase
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
 
 def render_template(template_text, data):
     """Replace placeholders like <<key>> with values from data."""
@@ -10,27 +18,261 @@ def render_template(template_text, data):
         template_text = template_text.replace(f'<<{key}>>', str(value))
     return template_text
 
-def create_message(to, subject, body, attachments=None):
-    """Create a MIME message for Gmail with support for multiple attachments."""
+def _pad3(data):
+    """Pad with trailing newlines so the length is a multiple of 3.
+
+    Base64 of a 3-aligned prefix is independent of what follows, so aligned
+    segments can be encoded separately and concatenated. Trailing blank lines
+    after a base64 part body are ignored by MIME decoders.
+    """
+    return data + b'\n' * (-len(data) % 3)
+
+# Read size for streamed attachments; a multiple of 57 bytes keeps 76-char base64 lines
+STREAM_CHUNK_SIZE = 57 * 1024
+# Resumable upload chunk size (must be a multiple of 256 KB)
+STREAM_UPLOAD_CHUNK = 4 * 1024 * 1024
+
+def _attachment_part(path, data):
+    """A base64 MIME part for a file, typed from its extension (application/octet-stream if unknown)."""
+    ctype, encoding = mimetypes.guess_type(path)
+    if ctype is None or encoding is not None:
+        # Unknown, or compressed (e.g. .tar.gz): send the bytes as they are
+        ctype = 'application/octet-stream'
+    maintype, subtype = ctype.split('/', 1)
+    part = MIMEBase(maintype, subtype)
+    part.set_payload(data)
+    encoders.encode_base64(part)
+    part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(path))
+    return part
+
+# Default memory budget of an AttachmentCache
+ATTACHMENT_CACHE_BYTES = 64 * 1024 * 1024
+# File versions whose content hash is remembered (so unchanged files are not re-read)
+_MAX_DIGESTS = 16384
+
+class AttachmentCache:
+    """Encoded attachment parts, shared by every message that carries the same file.
+
+    Parts are keyed by a SHA-256 of the file content plus its name, so the
+    same proposal attached to thousands of rows (or copied under several
+    directories) is read and encoded once. A file is only re-hashed when its
+    size or mtime changes. Parts are kept in LRU order within `max_bytes`;
+    a part larger than the whole budget is built for each message instead.
+    """
+
+    def __init__(self, boundary=None, max_bytes=ATTACHMENT_CACHE_BYTES):
+        self.boundary = boundary or _make_boundary()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._parts = OrderedDict()
+        self._digests = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _content_key(self, path):
+        """(content hash, file name) of a file, plus its bytes if they had to be read."""
+        stat = os.stat(path)
+        version = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        data = None
+        with self._lock:
+            digest = self._digests.get(version)
+            if digest is not None:
+                self._digests.move_to_end(version)
+        if digest is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            with self._lock:
+                self._digests[version] = digest
+                if len(self._digests) > _MAX_DIGESTS:
+                    self._digests.popitem(last=False)
+        return (digest, os.path.basename(path)), data
+
+    def _lookup(self, key, count=True):
+        with self._lock:
+            part = self._parts.get(key)
+            if part is not None:
+                self._parts.move_to_end(key)
+            if count:
+                if part is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+            return part
+
+    def _store(self, key, part):
+        with self._lock:
+            if len(part) > self.max_bytes or key in self._parts:
+                return
+            self._parts[key] = part
+            self.size += len(part)
+            while self.size > self.max_bytes:
+                _, evicted = self._parts.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def _discard(self, key):
+        with self._lock:
+            part = self._parts.pop(key, None)
+            if part is not None:
+                self.size -= len(part)
+
+    def _segment(self, path, key, data, count=True):
+        segment = self._lookup(('raw',) + key, count)
+        if segment is None:
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            part = _attachment_part(path, data)
+            segment = _pad3(f'--{self.boundary}\n'.encode() + part.as_bytes() + b'\n')
+            self._store(('raw',) + key, segment)
+        return segment
+
+    def segment(self, path):
+        """Return the raw (3-byte aligned) multipart segment for a file."""
+        return self._segment(path, *self._content_key(path))
+
+    def get(self, path):
+        """Return the base64url-encoded multipart segment for a file."""
+        key, data = self._content_key(path)
+        encoded = self._lookup(('b64',) + key)
+        if encoded is None:
+            encoded = base64.urlsafe_b64encode(self._segment(path, key, data, count=False))
+            # Messages are built from the encoded form only; keep one copy
+            self._discard(('raw',) + key)
+            self._store(('b64',) + key, encoded)
+        return encoded
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'bytes': self.size, 'parts': len(self._parts)}
+
+    def clear(self):
+        with self._lock:
+            self._parts.clear()
+            self._digests.clear()
+            self.size = 0
+
+# Between the files listed in a contacts cell
+_ATTACHMENT_SEPARATOR = re.compile(r'\s*[;|\n]\s*')
+
+def split_attachment_cell(cell, base_dir=None):
+    """The attachment paths listed in a contacts cell ('a.pdf; b.docx'), in order.
+
+    Paths are separated by ';', '|' or newlines; relative ones are taken
+    from `base_dir` (the working directory when None). Empty cells (None,
+    NaN) give an empty list.
+    """
+    if not isinstance(cell, str):
+        return []
+    paths = [p for p in _ATTACHMENT_SEPARATOR.split(cell.strip()) if p]
+    if base_dir:
+        paths = [os.path.join(base_dir, p) for p in paths]
+    return paths
+
+def _normalize_attachments(attachments):
+    # Convert single string to list
+    if isinstance(attachments, str):
+        attachments = [attachments]
+    return [a for a in attachments or [] if a and os.path.exists(a)]
+
+def create_message(to, subject, body, attachments=None, cache=None):
+    """Create a MIME message for Gmail with support for multiple attachments.
+
+    When an AttachmentCache is given, attachment parts are taken pre-encoded
+    from the cache and only the per-recipient headers and body are encoded.
+    """
+    attachments = _normalize_attachments(attachments)
     message = MIMEMultipart('mixed')
     message['to'] = to
     message['subject'] = subject
     message.attach(MIMEText(body, 'plain', 'utf-8'))
 
-    # Convert single string to list
-    if isinstance(attachments, str):
-        attachments = [attachments]
-    
-    if attachments:
-        for attachment in attachments:
-            if attachment and os.path.exists(attachment):
-                with open(attachment, 'rb') as f:
-                    part = MIMEApplication(f.read(), _subtype='pdf')
-                    part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(attachment))
-                    message.attach(part)
+    if cache is not None and attachments:
+        message.set_boundary(cache.boundary)
+        closing = f'--{cache.boundary}--\n'.encode()
+        head = message.as_bytes()
+        head = _pad3(head[:len(head) - len(closing)])
+        chunks = [base64.urlsafe_b64encode(head)]
+        chunks.extend(cache.get(a) for a in attachments)
+        chunks.append(base64.urlsafe_b64encode(closing))
+        return {'raw': b''.join(chunks).decode()}
+
+    for attachment in attachments:
+        with open(attachment, 'rb') as f:
+            message.attach(_attachment_part(attachment, f.read()))
             
     return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
 
-def send_gmail_message(service, message_body):
-    """Send the message via Gmail API. Let exceptions bubble up for handled retry."""
-    return service.users().messages().send(userId='me', body=message_body).execute()
+def message_head(to, subject, body, boundary):
+    """Headers and text part of a multipart message, up to the attachments.
+
+    Append attachment segments (AttachmentCache.segment with the same
+    boundary) and closing_boundary(boundary) to complete the message.
+    """
+    message = MIMEMultipart('mixed', boundary=boundary)
+    message['to'] = to
+    message['subject'] = subject
+    message.attach(MIMEText(body, 'plain', 'utf-8'))
+    head = message.as_bytes()
+    return head[:len(head) - len(closing_boundary(boundary))]
+
+def closing_boundary(boundary):
+    return f'--{boundary}--\n'.encode()
+
+def message_tail(attachments, cache):
+    """Attachment segments plus the closing boundary, to follow a message_head."""
+    chunks = [cache.segment(a) for a in _normalize_attachments(attachments)]
+    chunks.append(closing_boundary(cache.boundary))
+    return b''.join(chunks)
+
+def create_message_file(to, subject, body, attachments=None, max_memory=1024 * 1024):
+    """Stream a MIME message into a spooled temp file.
+
+    Attachments are base64-encoded chunk by chunk straight into the spool, so
+    peak memory stays around `max_memory` whatever the attachment size. The
+    returned file is positioned at the start and is meant for send_gmail_message.
+    """
+    attachments = _normalize_attachments(attachments)
+    boundary = _make_boundary()
+    message = MIMEMultipart('mixed')
+    message['to'] = to
+    message['subject'] = subject
+    message.attach(MIMEText(body, 'plain', 'utf-8'))
+    message.set_boundary(boundary)
+    closing = f'--{boundary}--\n'.encode()
+    head = message.as_bytes()
+
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    spool.write(head[:len(head) - len(closing)])
+    for attachment in attachments:
+        spool.write(f'--{boundary}\n'.encode())
+        spool.write(_attachment_part(attachment, b'').as_bytes())
+        with open(attachment, 'rb') as f:
+            while chunk := f.read(STREAM_CHUNK_SIZE):
+                spool.write(base64.encodebytes(chunk))
+        spool.write(b'\n')
+    spool.write(closing)
+    spool.seek(0)
+    return spool
+
+def attachments_size(attachments):
+    """Total size in bytes of the attachments that exist."""
+    return sum(os.path.getsize(a) for a in _normalize_attachments(attachments))
+
+def send_gmail_message(service, message_body, http=None):
+    """Send the message via Gmail API. Let exceptions bubble up for handled retry.
+
+    `message_body` is either a {'raw': ...} dict or a file from
+    create_message_file, which is sent as a resumable media upload.
+    `http` overrides the service's own connection (e.g. one checked out of
+    an AuthorizedHttpPool).
+    """
+    if hasattr(message_body, 'read'):
+        from googleapiclient.http import MediaIoBaseUpload
+        message_body.seek(0)
+        media = MediaIoBaseUpload(message_body, mimetype='message/rfc822', chunksize=STREAM_UPLOAD_CHUNK, resumable=True)
+        return service.users().messages().send(userId='me', body={}, media_body=media).execute(http=http)
+    return service.users().messages().send(userId='me', body=message_body).execute(http=http)
@@ -1,7 +1,26 @@
+import os
+import smtplib
+import threading
 import time
+from collections import deque
+from itertools import islice
+import numpy as np
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from tqdm import tqdm
 from googleapiclient.errors import HttpError
-from .email_utils import create_message, send_gmail_message
+from .data_manager import PENDING
+from .metrics import Metrics
+from .progress import ProgressReporter
+from .quota import QuotaLedger
+from .email_utils import (
+    AttachmentCache, attachments_size, create_message, create_message_file, split_attachment_cell
+)
+from .rate_controller import AIMDRateController, parse_retry_after
+from .rate_limiter import TokenBucket
+from .retry_queue import RetryQueue
+from .scheduler import DomainThrottle
+from .spool import MessageSpool, prerender
+from .transport import GmailApiTransport
 
 # ANSI Colors
 RED = "\033[91m"
@@ -24,105 +43,822 @@ class FatalAuthError(EmailSendingError):
     """Raised when authentication fails mid-run."""
     pass
 
+class QuotaWindowExhausted(EmailSendingError):
+    """Raised just before the rolling 24h quota would be exceeded; the run stops cleanly."""
+    def __init__(self, message, next_window):
+        super().__init__(message)
+        self.next_window = next_window
+
+# Returned by EmailEngine._handle_send_error for rate-limited sends
+RETRY = 'retry'
+# 403 error reasons that are rate limits (retried) rather than quotas (fatal)
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+# Returned by EmailEngine._send_one when a failed send went to the retry queue
+DEFERRED = 'deferred'
+
+class _SendDeferred(Exception):
+    """A failed send to hand to the retry queue instead of retrying inline."""
+    def __init__(self, error, retry_after=None):
+        super().__init__(str(error))
+        self.error = error
+        self.retry_after = retry_after
+
+def _error_content(e):
+    return e.content.decode('utf-8') if hasattr(e, 'content') else str(e)
+
+def _error_reasons(e):
+    """The 'reason' codes in a Google API error body (HttpError.error_details)."""
+    details = getattr(e, 'error_details', None)
+    if not isinstance(details, list):
+        return set()
+    return {detail.get('reason') for detail in details if isinstance(detail, dict)}
+
+def _error_summary(e, limit=500):
+    return _error_content(e)[:limit]
+
+def _retry_after(e):
+    resp = getattr(e, 'resp', None)
+    return parse_retry_after(resp.get('retry-after')) if resp is not None else None
+
+def make_attachment_cache(config):
+    """An AttachmentCache with the memory budget of ATTACHMENT_CACHE_MB."""
+    budget = config.get('ATTACHMENT_CACHE_MB')
+    if budget is None:
+        return AttachmentCache()
+    return AttachmentCache(max_bytes=int(budget * 1024 * 1024))
+
+class SenderAccount:
+    """A sender mailbox: its Gmail service, name (recorded in the sent log) and token file.
+
+    Messages go out through `transport` (the Gmail API for `service` unless
+    another transport is given); concurrent Gmail API sends need an
+    `http_pool` of their own.
+    """
+
+    def __init__(self, name, service, token_file=None, daily_quota=None, transport=None, http_pool=None):
+        self.name = name
+        self.service = service
+        self.token_file = token_file
+        self.daily_quota = daily_quota
+        self.transport = transport or GmailApiTransport(service, http_pool)
+        self.limiter = None
+
 class EmailEngine:
-    def __init__(self, service, data_manager, template_manager, config):
+    def __init__(self, service, data_manager, template_manager, config, accounts=None, metrics=None, http_pool=None,
+                 transport=None, progress=None, attachment_cache=None, quota_ledger=None):
         self.service = service
+        self.transport = transport or GmailApiTransport(service, http_pool)
         self.data_manager = data_manager
         self.template_manager = template_manager
         self.config = config
+        self.accounts = accounts or []
+        self.attachment_cache = attachment_cache or make_attachment_cache(config)
+        # A ledger kept by the caller across runs (the daemon); otherwise rebuilt from the sent log
+        self.quota_ledger = quota_ledger
+        self.metrics = metrics or Metrics()
+        self.progress = progress or ProgressReporter(interval=config.get('PROGRESS_INTERVAL', 0.5))
+        self.spool = None
+        self.retry_queue = None
+        self.domain_throttle = None
+        self._draining = False
+        self._count_lock = threading.Lock()
 
-    def run(self, is_dry_run=False):
-        """Execute the sending process."""
-        contacts = self.data_manager.contacts
-        sent_emails = self.data_manager.sent_emails
-        total_contacts = len(contacts)
+    def run(self, is_dry_run=False, workers=None, batch_size=None, spool_dir=None):
+        """Execute the sending process.
+
+        With `spool_dir`, every pending message is first rendered into a
+        MessageSpool there (across a process pool) and the send phase reads
+        from the spool. A dry run with `spool_dir` stops after rendering,
+        leaving the messages in `self.spool` for inspection or export.
+
+        With RETRY_QUEUE_FILE set, failed and throttled sends are deferred
+        to a RetryQueue rather than retried inline (see _with_retries).
+        """
+        total_contacts = self.data_manager.total_rows
+        # Progress moves once per address, more often than once per row when cells were split
+        total_addresses = self.data_manager.total_addresses or total_contacts
+        workers = workers or self.config.get('MAX_WORKERS', 1)
+        batch_size = batch_size or self.config.get('BATCH_SIZE', 0)
         
-        sent_count = 0
-        skipped_count = 0
-        error_count = 0
+        self.sent_count = 0
+        self.skipped_count = 0
+        self.error_count = 0
 
-        print(f"\nProcessing {total_contacts} records...")
+        if total_contacts is None:
+            print(f"\nProcessing records from {self.data_manager.contacts_file}...")
+        elif total_addresses != total_contacts:
+            print(f"\nProcessing {total_contacts} records ({total_addresses} addresses)...")
+        else:
+            print(f"\nProcessing {total_contacts} records...")
         
-        pbar = tqdm(contacts.iterrows(), total=total_contacts, desc="Progress")
-        for _, row in pbar:
-            cmp_name = str(row.get('company_name', '')).strip()
-            cmp_email = str(row.get('company_email', '')).strip()
-            
-            # Skipping logic with clear reasons
-            skip_reason = None
-            if not cmp_email or cmp_email.lower() == 'nan':
-                skip_reason = "Empty email"
-            elif cmp_name.startswith('!'):
-                skip_reason = "Excluded name (!)"
-            elif cmp_email in sent_emails:
-                skip_reason = "Already sent"
-                
-            if skip_reason:
-                tqdm.write(f"{YELLOW}Skipping {cmp_name or '[Empty]'}: {skip_reason}{RESET}")
-                skipped_count += 1
+        interval = self.progress.interval
+        self.total = total_addresses
+        pbar = tqdm(total=total_addresses, desc="Progress", mininterval=interval)
+        self.progress.start(total=total_addresses, dry_run=is_dry_run, contacts=self.data_manager.contacts_file)
+        status = 'completed'
+        self.limiter = self._make_limiter()
+        self.quota = None if is_dry_run else self.quota_ledger or self._make_quota_ledger()
+        self.retry_queue = None if is_dry_run else self._make_retry_queue()
+        self.domain_throttle = None if is_dry_run else self._make_domain_throttle()
+        self.stream_threshold = self.config.get('STREAMING_THRESHOLD')
+        self.stream_messages = self._exceeds_threshold(self.config.get('ATTACHMENTS'))
+        try:
+            if spool_dir is not None:
+                self.spool = self._prerender(pbar, spool_dir)
+                if is_dry_run:
+                    self.sent_count = len(self.spool)
+                    return self.sent_count, self.skipped_count, self.error_count
+                pbar.close()
+                pbar = tqdm(total=len(self.spool), desc="Sending", mininterval=interval)
+
+            if is_dry_run:
+                for cmp_name, cmp_email, row in self._iter_pending(pbar):
+                    with self.metrics.timer('render'):
+                        self.template_manager.render(row)
+                    self.sent_count += 1
+                    pbar.update(1)
+                    self._report()
+            else:
+                self._send_pending(pbar, workers, batch_size, total_addresses)
+        except BaseException as e:
+            status = type(e).__name__
+            raise
+        finally:
+            pbar.close()
+            self._report(force=True)
+            retry_fields = {}
+            if self.retry_queue is not None:
+                retry_fields = {'retry_queued': len(self.retry_queue.entries),
+                                'dead_lettered': self.retry_queue.dead_lettered}
+                self.retry_queue.save()
+            if self.domain_throttle is not None:
+                self.metrics.incr('domain_parked_total', self.domain_throttle.parked_total)
+            self.progress.finish(status=status, sent=self.sent_count, skipped=self.skipped_count,
+                                 failed=self.error_count, **retry_fields)
+            self.data_manager.flush_log()
+            if not is_dry_run:
+                for limiter in [self.limiter] + [a.limiter for a in self.accounts]:
+                    if isinstance(limiter, AIMDRateController):
+                        limiter.save()
+        return self.sent_count, self.skipped_count, self.error_count
+
+    def _send_pending(self, pbar, workers, batch_size, total_contacts):
+        """Send every pending contact, then any retries deferred while doing so."""
+        self._draining = False
+        while True:
+            if self.accounts:
+                self._run_sharded(pbar, workers)
+            elif batch_size > 1 and self.transport.supports_batch:
+                self._run_batched(pbar, batch_size)
+            elif workers > 1:
+                self._run_concurrent(pbar, workers)
+            else:
+                self._run_sequential(pbar, total_contacts)
+            # Sends still in flight when the queue ran dry may have been deferred since
+            if self.retry_queue is None or not self.retry_queue.held:
+                return
+            self._draining = True
+
+    def _iter_pending(self, pbar, chunk_size=1000):
+        """Yield (name, email, row) for each contact that should be sent, counting skips.
+
+        Rows are classified by the SendPlan of each chunk of the contacts list
+        (the whole list when it fits in memory); only the sent set is re-checked
+        here, to catch duplicate addresses sent earlier in this run. With
+        DOMAIN_ROUND_ROBIN, skips come first and the pending contacts of each
+        chunk follow interleaved across their domains (see SendPlan.fair_order).
+        """
+        sent_emails = self.data_manager.sent_emails
+        data_manager = self.data_manager
+        round_robin = self.config.get('DOMAIN_ROUND_ROBIN')
+
+        for contacts, plan in data_manager.iter_plans():
+            first_row = contacts.index[0] if len(contacts) else 0
+            attachment_column = self._attachment_column(contacts.columns)
+            positions = plan.positions
+            # Addresses per row, when some cells held several
+            entries = plan.row_entries()
+            order = None
+            if round_robin:
+                order = np.concatenate([np.flatnonzero(plan.status != PENDING), plan.fair_order()])
+            for start in range(0, len(plan.status), chunk_size):
+                stop = min(start + chunk_size, len(plan.status))
+                indices = np.arange(start, stop) if order is None else order[start:stop]
+                pending_indices = indices[plan.status[indices] == PENDING]
+                rows = iter(contacts.iloc[positions[pending_indices]].to_dict('records'))
+
+                for index in indices.tolist():
+                    cmp_name = plan.names[index]
+                    cmp_email = plan.emails[index]
+                    row_number = first_row + int(positions[index])
+                    row_entries = 1 if entries is None else int(entries[positions[index]])
+
+                    # Skipping logic with clear reasons
+                    skip_reason = plan.skip_reason(index)
+                    row = next(rows) if skip_reason is None else None
+                    if skip_reason is None and cmp_email in sent_emails:
+                        skip_reason = "Already sent"
+                    if skip_reason is None and attachment_column and self._missing_attachment(row[attachment_column]):
+                        # Not marked done: the checkpoint stays here so a rerun picks the row up once the file exists
+                        self._skip(pbar, cmp_name, cmp_email, "Missing attachment")
+                        continue
+
+                    if skip_reason:
+                        self._skip(pbar, cmp_name, cmp_email, skip_reason)
+                        data_manager.mark_row_done(row_number, row_entries)
+                        continue
+
+                    # The cleaned address (one of several, for a split cell)
+                    row['company_email'] = cmp_email
+                    data_manager.track_row(cmp_email, row_number, row_entries)
+                    self._show_target(pbar, cmp_name)
+                    yield cmp_name, cmp_email, row
+
+    def _skip(self, pbar, name, email, reason):
+        """Count a skipped contact; reasons are aggregated rather than printed per row."""
+        self.skipped_count += 1
+        self.metrics.incr('skipped_total')
+        self.progress.skip(name, email, reason)
+        pbar.update(1)
+        self._report()
+
+    def _show_target(self, pbar, name):
+        if self.progress.should_render():
+            pbar.set_postfix({"Target": name}, refresh=False)
+
+    def _report(self, force=False):
+        self.progress.progress(self.sent_count, self.skipped_count, self.error_count, self.total, force=force)
+
+    def _pending(self, pbar):
+        """The send queue: spooled messages when pre-rendered, else the contacts.
+
+        With a retry queue, due retries are merged in (only those once the
+        contacts have all been handed out). Per-domain rate caps
+        (DOMAIN_RATE / DOMAIN_RATES) are applied last, over both.
+        """
+        if self.retry_queue is not None and self._draining:
+            items = self._with_retries(iter(()), pbar)
+        else:
+            items = self._iter_pending(pbar) if self.spool is None else self._iter_spool(pbar)
+            if self.retry_queue is not None:
+                items = self._with_retries(items, pbar)
+        if self.domain_throttle is None:
+            return items
+        return self.domain_throttle.throttle(items)
+
+    def _with_retries(self, items, pbar):
+        """Interleave due retries with `items`; once those run out, wait for the rest.
+
+        Contacts whose failure in an earlier run is not due yet are held back
+        until it is; dead-lettered contacts are skipped until replayed.
+        """
+        queue = self.retry_queue
+        for item in items:
+            yield from queue.pop_due()
+            cmp_name, cmp_email, _ = item
+            if queue.is_dead(cmp_email):
+                self._skip(pbar, cmp_name, cmp_email, "Dead-lettered")
+                self.data_manager.mark_email_done(cmp_email)
+            elif not queue.hold(item):
+                yield item
+
+        while queue.held:
+            due = queue.pop_due()
+            if due:
+                yield from due
                 continue
+            delay = max(0.0, queue.next_due() - time.time())
+            if delay >= 1:
+                tqdm.write(f"{YELLOW}Waiting {delay:.0f}s for {queue.held} deferred retries...{RESET}")
+            with self.metrics.timer('retry_wait'):
+                time.sleep(delay)
 
-            pbar.set_postfix({"Target": cmp_name})
+    def _iter_spool(self, pbar):
+        """Yield (name, email, spool entry) for each spooled message still to send."""
+        sent_emails = self.data_manager.sent_emails
+        for entry in self.spool:
+            if entry['email'] in sent_emails:
+                self._skip(pbar, entry['name'], entry['email'], "Already sent")
+                self.data_manager.mark_email_done(entry['email'])
+                continue
+            self._show_target(pbar, entry['name'])
+            yield entry['name'], entry['email'], entry
 
-            subject, body = self.template_manager.render(dict(row))
-            
-            if is_dry_run:
-                sent_count += 1
+    def _prerender(self, pbar, spool_dir):
+        """Render every pending message into an on-disk spool."""
+        pbar.set_description("Rendering")
+        if self.spool is not None:
+            self.spool.close()
+        spool = MessageSpool(spool_dir)
+        with self.metrics.timer('prerender'):
+            prerender(self._iter_pending(pbar), spool, self.template_manager, self.config.get('ATTACHMENTS'),
+                      self.config.get('RENDER_WORKERS'), on_rendered=pbar.update, cache=self.attachment_cache,
+                      row_attachments=self._row_attachments)
+        self.metrics.incr('prerendered_total', len(spool))
+        return spool
+
+    def _attachment_column(self, columns):
+        column = self.config.get('ATTACHMENT_COLUMN')
+        return column if column and column in columns else None
+
+    def _row_attachments(self, row):
+        column = self.config.get('ATTACHMENT_COLUMN')
+        if not column or not isinstance(row, dict):
+            return []
+        return split_attachment_cell(row.get(column), self.config.get('ATTACHMENT_DIR'))
+
+    def _missing_attachment(self, cell):
+        paths = split_attachment_cell(cell, self.config.get('ATTACHMENT_DIR'))
+        return any(not os.path.isfile(path) for path in paths)
+
+    def _attachments(self, row):
+        """ATTACHMENTS plus the files listed in the row's ATTACHMENT_COLUMN cell."""
+        attachments = self.config.get('ATTACHMENTS') or []
+        if isinstance(attachments, str):
+            attachments = [attachments]
+        personal = self._row_attachments(row)
+        if not personal:
+            return attachments
+        return list(attachments) + [path for path in personal if path not in attachments]
+
+    def _exceeds_threshold(self, attachments):
+        return bool(self.stream_threshold) and attachments_size(attachments) > self.stream_threshold
+
+    def _should_stream(self, row):
+        """Whether a message goes out as a media upload; personal attachments can tip it over."""
+        if self.stream_messages or self.spool is not None or not self._row_attachments(row):
+            return self.stream_messages
+        return self._exceeds_threshold(self._attachments(row))
+
+    def _build_message(self, cmp_email, row, stream=False):
+        if self.spool is not None:
+            with self.metrics.timer('spool_read'):
+                return self.spool.message_body(row, stream)
+        with self.metrics.timer('render'):
+            subject, body = self.template_manager.render(row)
+        attachments = self._attachments(row)
+        with self.metrics.timer('mime_build'):
+            if stream:
+                return create_message_file(cmp_email, subject, body, attachments)
+            return create_message(cmp_email, subject, body, attachments, cache=self.attachment_cache)
+
+    def _acquire(self, limiter):
+        with self.metrics.timer('pacing_wait'):
+            limiter.acquire()
+
+    def _backoff(self, seconds):
+        self.metrics.incr('retries_total')
+        self.metrics.incr('backoff_seconds_total', seconds)
+        with self.metrics.timer('backoff_wait'):
+            time.sleep(seconds)
+
+    def _send_one(self, cmp_name, cmp_email, row, account=None):
+        account_name = account.name if account else ''
+        self._reserve_quota(account_name)
+        ok = False
+        msg = None
+        stream = self._should_stream(row)
+        try:
+            msg = self._build_message(cmp_email, row, stream=stream)
+            if account is not None:
+                self._acquire(account.limiter)
+            ok = self._send_with_retry(msg, cmp_email, cmp_name, account)
+            return ok
+        except _SendDeferred as d:
+            return self._defer((cmp_name, cmp_email, row), d.error, d.retry_after)
+        finally:
+            self._settle_quota(account_name, ok)
+            if stream and msg is not None:
+                msg.close()
+
+    def _make_retry_queue(self):
+        path = self.config.get('RETRY_QUEUE_FILE')
+        if not path:
+            return None
+        return RetryQueue(
+            path,
+            self.config.get('DEAD_LETTER_FILE', 'data/dead_letters.jsonl'),
+            max_attempts=self.config.get('MAX_SEND_ATTEMPTS', 4),
+            base_delay=self.config.get('RETRY_BASE_DELAY', 15),
+            max_delay=self.config.get('RETRY_MAX_DELAY', 900)
+        ).load()
+
+    def _make_domain_throttle(self):
+        throttle = DomainThrottle(self.config.get('DOMAIN_RATES'), self.config.get('DOMAIN_RATE'),
+                                  sleep=self._domain_wait)
+        return throttle if throttle.enabled else None
+
+    def _domain_wait(self, seconds):
+        with self.metrics.timer('domain_wait'):
+            time.sleep(seconds)
+
+    def _defer(self, item, error, retry_after=None):
+        """Queue a failed (name, email, row) for a later attempt.
+
+        Returns DEFERRED, or False once the contact has used up its attempts
+        (it is then dead-lettered and counts as failed).
+        """
+        cmp_name, cmp_email, _ = item
+        due = self.retry_queue.defer(item, _error_summary(error), retry_after)
+        if due is None:
+            tqdm.write(f"{RED}Giving up on {cmp_name} after {self.retry_queue.max_attempts} attempts "
+                       f"(moved to {self.retry_queue.dead_letter_file}){RESET}")
+            self.metrics.incr('dead_letter_total')
+            self.progress.event('dead_letter', name=cmp_name, email=cmp_email, error=_error_summary(error))
+            return False
+        delay = max(0.0, due - time.time())
+        self.metrics.incr('deferred_total')
+        self.progress.event('deferred', name=cmp_name, email=cmp_email, attempt=self.retry_queue.attempts(cmp_email),
+                            delay=round(delay, 3))
+        return DEFERRED
+
+    def _make_quota_ledger(self):
+        default_limit = self.config.get('DAILY_QUOTA')
+        if not default_limit:
+            return None
+        limits = {a.name: a.daily_quota for a in self.accounts if a.daily_quota}
+        return QuotaLedger.from_sent_log(self.data_manager.sent_log, limits, default_limit)
+
+    def _reserve_quota(self, account_name):
+        """Claim a send from the rolling 24h quota, stopping the run if none is left."""
+        if self.quota is None or self.quota.reserve(account_name):
+            return
+        limit = self.quota.limit(account_name)
+        raise QuotaWindowExhausted(
+            f"Daily quota of {limit} sends used up for {account_name or 'this account'}",
+            self.quota.next_window(account_name)
+        )
+
+    def _settle_quota(self, account_name, sent):
+        if self.quota is not None:
+            if sent:
+                self.quota.commit(account_name)
             else:
-                msg = create_message(cmp_email, subject, body, self.config.get('ATTACHMENTS'))
-                
+                self.quota.release(account_name)
+
+    def _record(self, ok, pbar):
+        if ok is DEFERRED:
+            # Counted when its final attempt is recorded
+            return
+        with self._count_lock:
+            if ok:
+                self.sent_count += 1
+            else:
+                self.error_count += 1
+            pbar.update(1)
+        self.metrics.incr('sent_total' if ok else 'failed_total')
+        self._report()
+
+    def _run_sequential(self, pbar, total_contacts):
+        adaptive = isinstance(self.limiter, AIMDRateController)
+        for cmp_name, cmp_email, row in self._pending(pbar):
+            if adaptive:
+                self._acquire(self.limiter)
+            self._record(self._send_one(cmp_name, cmp_email, row), pbar)
+            
+            # Intra-email delay
+            if not adaptive and (total_contacts is None or self.sent_count + self.skipped_count + self.error_count < total_contacts):
+                with self.metrics.timer('pacing_wait'):
+                    time.sleep(self.config['WAIT_SECONDS'])
+
+    def _make_limiter(self, account_key=None):
+        rate = self.config.get('SEND_RATE') or 1 / max(self.config['WAIT_SECONDS'], 0.001)
+        if self.config.get('ADAPTIVE_RATE'):
+            return AIMDRateController.from_state(
+                self.config.get('RATE_STATE_FILE'),
+                account_key or self.config['TOKEN_FILE'],
+                rate,
+                min_rate=self.config.get('MIN_SEND_RATE', 0.05),
+                max_rate=self.config.get('MAX_SEND_RATE', 10.0)
+            )
+        return TokenBucket(rate, self.config.get('SEND_BURST', 1))
+
+    def _run_concurrent(self, pbar, workers):
+        """Keep up to `workers` sends in flight, paced by a token bucket.
+
+        The first fatal error stops new submissions; in-flight sends are
+        allowed to finish (and be logged) before the error is re-raised.
+        """
+        fatal = None
+        in_flight = set()
+
+        def collect(done):
+            nonlocal fatal
+            for future in done:
+                in_flight.discard(future)
                 try:
-                    if self._send_with_retry(msg, cmp_email, cmp_name):
-                        sent_count += 1
-                    else:
-                        error_count += 1
+                    self._record(future.result(), pbar)
                 except EmailSendingError as e:
-                    pbar.close()
-                    raise e # Re-raise to main.py
-                
-                # Intra-email delay
-                if sent_count + skipped_count + error_count < total_contacts:
-                    time.sleep(self.config['WAIT_SECONDS'])
+                    fatal = fatal or e
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for cmp_name, cmp_email, row in self._pending(pbar):
+                while len(in_flight) >= workers and not fatal:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+                if fatal:
+                    break
+                self._acquire(self.limiter)
+                in_flight.add(pool.submit(self._send_one, cmp_name, cmp_email, row))
+            collect(wait(in_flight)[0])
 
-        pbar.close()
-        return sent_count, skipped_count, error_count
+        if fatal:
+            raise fatal
 
-    def _send_with_retry(self, msg, email, name):
-        """Internal helper to handle retries for a single email."""
+    def _run_sharded(self, pbar, workers=1):
+        """Spread pending contacts over the sender accounts, up to `workers` sends in flight per account.
+
+        Each account is paced by its own limiter. When an account hits a fatal
+        error (daily quota, rate limit, auth), the contact it was sending goes
+        back to the queue and the remaining accounts take over its share. The
+        run only fails once every account has stopped with work left.
+        """
+        for account in self.accounts:
+            account.limiter = self._make_limiter(account.token_file or account.name)
+
+        pending = self._pending(pbar)
+        returned = deque()
+        # One slot per send an account may have in flight
+        idle = [account for _ in range(max(1, workers or 1)) for account in self.accounts]
+        stopped = set()
+        in_flight = {}
+        last_error = None
+
+        with ThreadPoolExecutor(max_workers=len(idle)) as pool:
+            while True:
+                while idle:
+                    item = returned.popleft() if returned else next(pending, None)
+                    if item is None:
+                        break
+                    account = idle.pop(0)
+                    in_flight[pool.submit(self._send_one, *item, account=account)] = (account, item)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    account, item = in_flight.pop(future)
+                    try:
+                        self._record(future.result(), pbar)
+                        if account.name not in stopped:
+                            idle.append(account)
+                    except EmailSendingError as e:
+                        returned.append(item)
+                        last_error = e
+                        if account.name in stopped:
+                            continue
+                        stopped.add(account.name)
+                        idle = [a for a in idle if a is not account]
+                        tqdm.write(f"{YELLOW}Account {account.name} stopped: {e}{RESET}")
+                        if len(stopped) < len(self.accounts):
+                            tqdm.write(f"{YELLOW}Its remaining contacts move to the other accounts.{RESET}")
+
+        if returned or next(pending, None) is not None:
+            if self.quota is not None and isinstance(last_error, QuotaWindowExhausted):
+                next_window = min(self.quota.next_window(a.name) for a in self.accounts)
+                if len(self.accounts) == 1:
+                    raise QuotaWindowExhausted(f"Daily quota used up for {self.accounts[0].name}", next_window)
+                raise QuotaWindowExhausted(f"Daily quota used up on all {len(self.accounts)} accounts", next_window)
+            raise last_error
+
+    def _run_batched(self, pbar, batch_size):
+        """Send pending messages in Gmail batch requests of up to `batch_size` (at most the transport's max_batch).
+
+        Batch parts carry the raw message inline, so a message that
+        _should_stream() is sent on its own as a media upload instead.
+        """
+        batch_size = min(batch_size, self.transport.max_batch)
+        pending = self._pending(pbar)
+        while True:
+            items = []
+            exhausted = None
+            for cmp_name, cmp_email, row in islice(pending, batch_size):
+                if self._should_stream(row):
+                    try:
+                        self._acquire(self.limiter)
+                        self._record(self._send_one(cmp_name, cmp_email, row), pbar)
+                    except QuotaWindowExhausted as e:
+                        exhausted = e
+                        break
+                    except BaseException:
+                        for _ in items:
+                            self._settle_quota('', False)
+                        raise
+                    continue
+                try:
+                    self._reserve_quota('')
+                except QuotaWindowExhausted as e:
+                    exhausted = e
+                    break
+                try:
+                    self._acquire(self.limiter)
+                    items.append((cmp_name, cmp_email, row, self._build_message(cmp_email, row)))
+                except BaseException:
+                    for _ in range(len(items) + 1):
+                        self._settle_quota('', False)
+                    raise
+            if items:
+                self._send_batch(items, pbar)
+            if exhausted:
+                raise exhausted
+            if not items:
+                break
+
+    def _send_batch(self, items, pbar):
+        """Send one batch, retrying only the items that were rate limited.
+
+        With a retry queue, failed items are deferred there instead. If the
+        run stops on a fatal error, the quota reserved for the items not yet
+        settled is released.
+        """
         retry_count = 0
         max_retries = 3
-        wait_time = 15 
-        
-        while retry_count <= max_retries:
-            try:
-                send_gmail_message(self.service, msg)
-                self.data_manager.log_send(email, name)
-                return True
-            except HttpError as e:
-                status = e.resp.status
-                content = e.content.decode('utf-8') if hasattr(e, 'content') else str(e)
+        wait_time = 15
+        # (position in the batch, item), so reservations can be settled once each
+        items = list(enumerate(items))
+        unsettled = set(range(len(items)))
+
+        def settle(index, sent):
+            unsettled.discard(index)
+            self._settle_quota('', sent)
+
+        try:
+            while items:
+                throttled = []
+                retry_afters = []
+                # Retry-After of every rate-limited item: the batch is one congestion event
+                congestion = []
+                fatal = []
+
+                def callback(index, response, exception):
+                    item = items[index]
+                    position, (cmp_name, cmp_email, _, _) = item
+                    if exception is None:
+                        with self.metrics.timer('log_write'):
+                            self.data_manager.log_send(cmp_email, cmp_name)
+                        if self.retry_queue is not None:
+                            self.retry_queue.done(cmp_email)
+                        self.limiter.on_success()
+                        settle(position, True)
+                        self._record(True, pbar)
+                        return
+                    try:
+                        outcome = self._handle_send_error(exception, cmp_name)
+                    except EmailSendingError as e:
+                        fatal.append(e)
+                        return
+                    retry_after = _retry_after(exception) if outcome is RETRY else None
+                    if outcome is RETRY:
+                        congestion.append(retry_after)
+                    if self.retry_queue is not None:
+                        settle(position, False)
+                        self._record(self._defer(item[1][:3], exception, retry_after), pbar)
+                    elif outcome is RETRY:
+                        if retry_after is not None:
+                            retry_afters.append(retry_after)
+                        throttled.append(item)
+                    else:
+                        settle(position, False)
+                        self._record(False, pbar)
+
+                try:
+                    with self.metrics.timer('batch_send'):
+                        self.transport.send_batch([msg for _, (_, _, _, msg) in items], callback)
+                except HttpError as e:
+                    outcome = self._handle_send_error(e, "batch")
+                    retry_after = _retry_after(e) if outcome is RETRY else None
+                    if outcome is RETRY:
+                        self.limiter.on_throttle(retry_after)
+                    if self.retry_queue is not None:
+                        for position, item in items:
+                            settle(position, False)
+                            self._record(self._defer(item[:3], e, retry_after), pbar)
+                        return
+                    if outcome is not RETRY:
+                        for position, _ in items:
+                            settle(position, False)
+                            self._record(False, pbar)
+                        return
+                    if retry_after is not None:
+                        retry_afters.append(retry_after)
+                    throttled = items
 
-                if status == 429:
+                if congestion:
+                    self.limiter.on_throttle(max((r for r in congestion if r is not None), default=None))
+                if fatal:
+                    raise fatal[0]
+                if throttled:
                     retry_count += 1
                     if retry_count > max_retries:
-                        raise FatalRateLimitError(f"Rate limit hit and max retries ({max_retries}) exhausted: {content}")
-                    
-                    tqdm.write(f"{YELLOW}Rate limit hit. Attempt {retry_count}/{max_retries}. Waiting {wait_time}s...{RESET}")
-                    time.sleep(wait_time)
+                        raise FatalRateLimitError(f"Rate limit hit and max retries ({max_retries}) exhausted for {len(throttled)} batched messages")
+                    delay = max(retry_afters) if retry_afters else wait_time
+                    tqdm.write(f"{YELLOW}Rate limit hit for {len(throttled)} batched messages. Attempt {retry_count}/{max_retries}. Waiting {delay:g}s...{RESET}")
+                    self.progress.event('throttled', messages=len(throttled), attempt=retry_count, delay=delay)
+                    self._backoff(delay)
                     wait_time *= 2 # Exponential backoff
-                elif status == 403:
-                    # Often "User rate limit exceeded" or daily quota
-                    if "quota" in content.lower() or "limit" in content.lower():
-                        raise FatalQuotaError(f"Daily quota or hard limit exceeded: {content}")
-                    # Other 403s might be retryable or specific permissions
-                    tqdm.write(f"{RED}Permission error for {name}: {content}{RESET}")
-                    return False
-                elif status == 401:
-                    raise FatalAuthError(f"Authentication session expired: {content}")
-                else:
-                    tqdm.write(f"{RED}API Error for {name} (Status {status}): {content}{RESET}")
-                    return False
+                items = throttled
+        finally:
+            for _ in unsettled:
+                self._settle_quota('', False)
+
+    def _handle_send_error(self, e, name):
+        """Classify a failed send: RETRY for rate limits, False for per-message errors.
+
+        Fatal conditions (daily quota, expired auth) are raised.
+        """
+        if isinstance(e, (smtplib.SMTPException, ConnectionError)):
+            return self._handle_smtp_error(e, name)
+        if not isinstance(e, HttpError):
+            tqdm.write(f"{RED}Unexpected Error for {name}: {e}{RESET}")
+            return False
+
+        status = e.resp.status
+        content = _error_content(e)
+
+        if status == 429:
+            return RETRY
+        elif status == 403:
+            # Per-user and per-project rate limits come as 403s that Gmail says to back off
+            # and retry; any other quota or limit (daily sending limit...) ends the run
+            if _error_reasons(e) & RATE_LIMIT_REASONS:
+                return RETRY
+            if "quota" in content.lower() or "limit" in content.lower():
+                raise FatalQuotaError(f"Daily quota or hard limit exceeded: {content}")
+            # Other 403s might be retryable or specific permissions
+            tqdm.write(f"{RED}Permission error for {name}: {content}{RESET}")
+            return False
+        elif status == 401:
+            raise FatalAuthError(f"Authentication session expired: {content}")
+        else:
+            tqdm.write(f"{RED}API Error for {name} (Status {status}): {content}{RESET}")
+            return False
+
+    def _handle_smtp_error(self, e, name):
+        """SMTP counterpart of _handle_send_error: 4xx and dropped connections are retried."""
+        if isinstance(e, smtplib.SMTPRecipientsRefused):
+            code, message = next(iter(e.recipients.values()))
+        elif isinstance(e, smtplib.SMTPResponseException):
+            code, message = e.smtp_code, e.smtp_error
+        elif isinstance(e, ConnectionRefusedError):
+            tqdm.write(f"{RED}SMTP server refused the connection for {name}: {e}{RESET}")
+            return False
+        else:
+            # Disconnected or connection reset
+            return RETRY
+        content = message.decode('utf-8', 'replace') if isinstance(message, bytes) else str(message)
+
+        if code in (530, 534, 535):
+            raise FatalAuthError(f"SMTP authentication failed: {content}")
+        if code >= 500 and ("5.4.5" in content or "quota" in content.lower()):
+            raise FatalQuotaError(f"Daily quota or hard limit exceeded: {content}")
+        if 400 <= code < 500:
+            return RETRY
+        tqdm.write(f"{RED}SMTP Error for {name} (Code {code}): {content}{RESET}")
+        return False
+
+    def _send_with_retry(self, msg, email, name, account=None):
+        """Internal helper to handle retries for a single email.
+
+        With a retry queue there is a single attempt here: a non-fatal
+        failure raises _SendDeferred for _send_one to queue.
+        """
+        transport = account.transport if account else self.transport
+        limiter = account.limiter if account else self.limiter
+        account_name = account.name if account else ''
+        retry_count = 0
+        max_retries = 3
+        wait_time = 15 
+        
+        while retry_count <= max_retries:
+            # Only the send itself is retried or deferred: once it has succeeded, a failure
+            # to record it must not lead to the message being sent again
+            try:
+                with self.metrics.timer('send'):
+                    transport.send(msg, email)
             except Exception as e:
-                tqdm.write(f"{RED}Unexpected Error for {name}: {e}{RESET}")
-                return False
+                outcome = self._handle_send_error(e, name)
+                retry_after = _retry_after(e) if outcome is RETRY else None
+                if outcome is RETRY:
+                    limiter.on_throttle(retry_after)
+                if self.retry_queue is not None:
+                    raise _SendDeferred(e, retry_after)
+                if outcome is not RETRY:
+                    return False
+
+                retry_count += 1
+                if retry_count > max_retries:
+                    raise FatalRateLimitError(f"Rate limit hit and max retries ({max_retries}) exhausted: {_error_content(e)}")
+                
+                delay = retry_after if retry_after is not None else wait_time
+                tqdm.write(f"{YELLOW}Rate limit hit. Attempt {retry_count}/{max_retries}. Waiting {delay:g}s...{RESET}")
+                self.progress.event('throttled', messages=1, attempt=retry_count, delay=delay)
+                self._backoff(delay)
+                wait_time *= 2 # Exponential backoff
+            else:
+                with self.metrics.timer('log_write'):
+                    self.data_manager.log_send(email, name, account_name)
+                if self.retry_queue is not None:
+                    self.retry_queue.done(email)
+                limiter.on_success()
+                return True
         return False
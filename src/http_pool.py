@@ -0,0 +1,96 @@
+import queue
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+class AuthorizedHttpPool:
+    """A fixed pool of keep-alive authorized HTTP connections.
+
+    httplib2.Http objects are not thread-safe, so each concurrent sender checks
+    one out for the duration of a request. All connections share the same
+    credentials object, so a token refresh is seen by every connection.
+    """
+
+    def __init__(self, credentials, size, timeout=60):
+        import google_auth_httplib2
+        import httplib2
+
+        self.credentials = credentials
+        self.size = size
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            # LIFO keeps reusing the most recently used (warm) connections
+            self._idle.put(google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout)))
+
+    @contextmanager
+    def checkout(self):
+        http = self._idle.get()
+        try:
+            yield http
+        finally:
+            self._idle.put(http)
+
+    def close(self):
+        while not self._idle.empty():
+            http = self._idle.get_nowait()
+            for connection in getattr(http.http, 'connections', {}).values():
+                connection.close()
+
+class CredentialRefresher:
+    """Refresh OAuth credentials in the background before they expire.
+
+    Refreshing `margin` ahead of expiry (earlier than google-auth's own
+    just-in-time refresh) means senders never block on re-auth mid-run.
+    Refreshed tokens are written back to `token_file`.
+    """
+
+    def __init__(self, credentials, token_file=None, margin=timedelta(minutes=10), check_interval=30):
+        self.credentials = credentials
+        self.token_file = token_file
+        self.margin = margin
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def due(self, now=None):
+        expiry = self.credentials.expiry
+        if expiry is None:
+            return False
+        # google-auth stores expiry as naive UTC
+        now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+        return expiry - now <= self.margin
+
+    def refresh_if_due(self):
+        with self.lock:
+            if not self.due() or not self.credentials.refresh_token:
+                return False
+            from google.auth.transport.requests import Request
+            try:
+                self.credentials.refresh(Request())
+            except Exception as e:
+                # Leave it to the next check (or google-auth's own refresh)
+                self.last_error = e
+                return False
+            self.last_error = None
+            if self.token_file:
+                with open(self.token_file, 'w') as token:
+                    token.write(self.credentials.to_json())
+            return True
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval):
+            self.refresh_if_due()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="credential-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
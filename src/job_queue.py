@@ -0,0 +1,145 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from .sent_log import TIMESTAMP_FORMAT
+
+STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+_COLUMNS = ['id', 'priority', 'status', 'contacts', 'template', 'attachments', 'subject', 'campaign',
+            'submitted', 'started', 'finished', 'not_before', 'sent', 'skipped', 'failed', 'error']
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+class JobQueue:
+    """Campaign jobs for the daemon, in SQLite (WAL mode) so other processes can submit and watch.
+
+    Jobs run highest `priority` first, then in submission order. A job that
+    is not ready yet (e.g. waiting for the daily quota window) carries a
+    `not_before` timestamp and is passed over until then.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, priority INTEGER NOT NULL DEFAULT 0, "
+                "status TEXT NOT NULL DEFAULT 'queued', contacts TEXT NOT NULL, template TEXT NOT NULL, "
+                "attachments TEXT NOT NULL DEFAULT '[]', subject TEXT, campaign TEXT NOT NULL DEFAULT '', "
+                "submitted TEXT, started TEXT, finished TEXT, not_before TEXT, "
+                "sent INTEGER NOT NULL DEFAULT 0, skipped INTEGER NOT NULL DEFAULT 0, "
+                "failed INTEGER NOT NULL DEFAULT 0, error TEXT)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs(status, priority DESC, id)")
+        return self._conn
+
+    def submit(self, contacts, template, attachments=None, subject=None, campaign='', priority=0):
+        """Queue a campaign; returns its job id. Paths are stored absolute."""
+        if isinstance(attachments, str):
+            attachments = [attachments]
+        attachments = [os.path.abspath(path) for path in attachments or []]
+        with self._lock:
+            cursor = self._connect().execute(
+                "INSERT INTO jobs (priority, contacts, template, attachments, subject, campaign, submitted) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [priority, os.path.abspath(contacts), os.path.abspath(template), json.dumps(attachments),
+                 subject, campaign or '', _now()]
+            )
+        return cursor.lastrowid
+
+    def claim(self):
+        """Mark the next ready job as running and return it, or None."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = 'queued' "
+                    "AND (not_before IS NULL OR not_before <= ?) ORDER BY priority DESC, id LIMIT 1",
+                    [_now()]
+                ).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE jobs SET status = 'running', started = ?, not_before = NULL, error = NULL "
+                                 "WHERE id = ?", [_now(), row[0]])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        job = _job(row)
+        job['status'] = 'running'
+        return job
+
+    def finish(self, job_id, status, sent=0, skipped=0, failed=0, error=None):
+        """Record a job's outcome ('done', 'failed' or 'cancelled'); counts add up over resumed runs."""
+        self._execute(
+            "UPDATE jobs SET status = ?, finished = ?, sent = sent + ?, skipped = skipped + ?, failed = failed + ?, "
+            "error = ? WHERE id = ?",
+            [status, _now(), sent, skipped, failed, error, job_id]
+        )
+
+    def defer(self, job_id, not_before, sent=0, skipped=0, failed=0, error=None):
+        """Put a running job back in the queue until `not_before` (a datetime)."""
+        self._execute(
+            "UPDATE jobs SET status = 'queued', not_before = ?, sent = sent + ?, skipped = skipped + ?, "
+            "failed = failed + ?, error = ? WHERE id = ?",
+            [not_before.strftime(TIMESTAMP_FORMAT), sent, skipped, failed, error, job_id]
+        )
+
+    def requeue_running(self):
+        """Return jobs left 'running' by a daemon that died back to the queue; returns how many."""
+        with self._lock:
+            return self._connect().execute("UPDATE jobs SET status = 'queued' WHERE status = 'running'").rowcount
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started. Returns False if it is running or finished."""
+        with self._lock:
+            cursor = self._connect().execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE id = ? AND status = 'queued'",
+                [_now(), job_id]
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connect().execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", [job_id]).fetchone()
+        return _job(row) if row is not None else None
+
+    def jobs(self, status=None, limit=50):
+        """Most recent jobs first, optionally only those with `status`."""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params = []
+        if status is not None:
+            query += " WHERE status = ?"
+            params.append(status)
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [_job(row) for row in rows]
+
+    def _execute(self, query, params):
+        with self._lock:
+            self._connect().execute(query, params)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+def _job(row):
+    job = dict(zip(_COLUMNS, row))
+    job['attachments'] = json.loads(job['attachments'] or '[]')
+    return job
@@ -0,0 +1,111 @@
+import csv
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+def open_event_stream(target):
+    """Open a JSONL event stream: 'fd:N' (an inherited file descriptor) or a file path (appended to)."""
+    if target.startswith('fd:'):
+        return os.fdopen(int(target[3:]), 'w', buffering=1, encoding='utf-8', closefd=False)
+    if os.path.dirname(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+    return open(target, 'a', buffering=1, encoding='utf-8')
+
+class ProgressReporter:
+    """Aggregated skip reporting, throttled progress updates and a JSONL event stream.
+
+    Skips are counted per reason instead of being printed one per row;
+    `skip_log` (optional) receives one CSV line per skipped contact. Terminal
+    postfix updates and 'progress' events are limited to one per `interval`
+    seconds. `events` is a text file (see open_event_stream) that receives
+    one JSON object per line: run_start, progress, throttled, run_end.
+    """
+
+    def __init__(self, skip_log=None, events=None, interval=0.5, clock=time.monotonic):
+        self.skip_log = skip_log
+        self.events = events
+        self.interval = interval
+        self.clock = clock
+        self.skip_counts = Counter()
+        self.started = None
+        self._lock = threading.Lock()
+        self._skip_file = None
+        self._skip_writer = None
+        self._last_render = None
+        self._last_event = None
+
+    def start(self, **fields):
+        self.skip_counts = Counter()
+        self.started = self.clock()
+        self._last_render = self._last_event = None
+        self.event('run_start', **fields)
+
+    def elapsed(self):
+        return self.clock() - self.started if self.started is not None else 0.0
+
+    def skip(self, name, email, reason):
+        with self._lock:
+            self.skip_counts[reason] += 1
+            if self.skip_log:
+                if self._skip_writer is None:
+                    self._open_skip_log()
+                self._skip_writer.writerow([reason, name, email])
+
+    def _open_skip_log(self):
+        if os.path.dirname(self.skip_log):
+            os.makedirs(os.path.dirname(self.skip_log), exist_ok=True)
+        new = not os.path.exists(self.skip_log) or os.path.getsize(self.skip_log) == 0
+        self._skip_file = open(self.skip_log, 'a', encoding='utf-8', newline='')
+        self._skip_writer = csv.writer(self._skip_file)
+        if new:
+            self._skip_writer.writerow(['reason', 'name', 'email'])
+
+    def _due(self, last):
+        now = self.clock()
+        return last is None or now - last >= self.interval, now
+
+    def should_render(self):
+        """True at most once per interval: time to refresh the terminal postfix."""
+        due, now = self._due(self._last_render)
+        if due:
+            self._last_render = now
+        return due
+
+    def progress(self, sent, skipped, failed, total=None, force=False):
+        """Emit a throttled 'progress' event with counts and send throughput."""
+        if self.events is None:
+            return
+        with self._lock:
+            due, now = self._due(self._last_event)
+            if not (due or force):
+                return
+            self._last_event = now
+        elapsed = self.elapsed()
+        self.event('progress', sent=sent, skipped=skipped, failed=failed, total=total,
+                   elapsed=round(elapsed, 3), rate=round(sent / elapsed, 3) if elapsed > 0 else 0.0)
+
+    def event(self, kind, **fields):
+        if self.events is None:
+            return
+        line = json.dumps({'ts': round(time.time(), 3), 'event': kind, **fields}, default=str)
+        with self._lock:
+            self.events.write(line + '\n')
+            self.events.flush()
+
+    def finish(self, **fields):
+        """Emit 'run_end' with the per-reason skip counts; keeps the streams open for another run."""
+        with self._lock:
+            if self._skip_file is not None:
+                self._skip_file.flush()
+        self.event('run_end', elapsed=round(self.elapsed(), 3), skipped_by_reason=dict(self.skip_counts), **fields)
+
+    def close(self):
+        with self._lock:
+            if self._skip_file is not None:
+                self._skip_file.close()
+                self._skip_file = self._skip_writer = None
+            if self.events is not None:
+                self.events.close()
+                self.events = None
@@ -0,0 +1,82 @@
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from .sent_log import TIMESTAMP_FORMAT
+
+QUOTA_WINDOW = timedelta(hours=24)
+
+class QuotaLedger:
+    """Sends per account over a rolling 24h window, rebuilt from the sent log.
+
+    Sends are reserved before they are attempted and released if they fail,
+    so concurrent senders never overshoot an account's limit.
+    """
+
+    def __init__(self, limits, default_limit, window=QUOTA_WINDOW, clock=datetime.now):
+        self.limits = limits
+        self.default_limit = default_limit
+        self.window = window
+        self.clock = clock
+        self._sends = {}
+        self._reserved = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_sent_log(cls, sent_log, limits, default_limit, **kwargs):
+        ledger = cls(limits, default_limit, **kwargs)
+        since = (ledger.clock() - ledger.window).strftime(TIMESTAMP_FORMAT)
+        for row in sent_log.rows(since=since):
+            try:
+                when = datetime.strptime(row['timestamp'], TIMESTAMP_FORMAT)
+            except (TypeError, ValueError):
+                continue
+            ledger._sends.setdefault(row.get('account') or '', deque()).append(when)
+        ledger._sends = {account: deque(sorted(sends)) for account, sends in ledger._sends.items()}
+        return ledger
+
+    def limit(self, account):
+        return self.limits.get(account, self.default_limit)
+
+    def _expire(self, account, now):
+        sends = self._sends.setdefault(account, deque())
+        while sends and sends[0] <= now - self.window:
+            sends.popleft()
+        return sends
+
+    def used(self, account):
+        with self._lock:
+            return len(self._expire(account, self.clock())) + self._reserved.get(account, 0)
+
+    def remaining(self, account):
+        return max(0, self.limit(account) - self.used(account))
+
+    def reserve(self, account):
+        """Claim one send for `account`. Returns False if its window is full."""
+        with self._lock:
+            sends = self._expire(account, self.clock())
+            if len(sends) + self._reserved.get(account, 0) >= self.limit(account):
+                return False
+            self._reserved[account] = self._reserved.get(account, 0) + 1
+            return True
+
+    def commit(self, account):
+        """Turn a reservation into a recorded send."""
+        with self._lock:
+            self._reserved[account] -= 1
+            self._sends.setdefault(account, deque()).append(self.clock())
+
+    def release(self, account):
+        """Give back a reservation for a send that did not go out."""
+        with self._lock:
+            self._reserved[account] -= 1
+
+    def next_window(self, account):
+        """When the oldest send in the window expires and capacity frees up."""
+        with self._lock:
+            sends = self._expire(account, self.clock())
+            if len(sends) < self.limit(account) or not sends:
+                return self.clock()
+            # Skip past enough of the oldest sends to get one slot back
+            excess = len(sends) - self.limit(account)
+            return sends[excess] + self.window
@@ -0,0 +1,100 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+def parse_retry_after(value):
+    """Parse a Retry-After header (seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+class AIMDRateController:
+    """Adaptive send pacing: additive increase while sends succeed, multiplicative decrease on 429.
+
+    Exposes the same acquire() interface as TokenBucket so the engine can use either.
+    The learned rate is stored per account in a small JSON state file.
+
+    Throttles that arrive within `window` seconds of a decrease (or one send
+    interval, if longer) belong to the same congestion event, e.g. a burst of
+    concurrent sends all answered with 429, and cut the rate only once.
+    """
+
+    def __init__(self, rate, min_rate=0.05, max_rate=10.0, increase=0.02, decrease=0.5, window=1.0,
+                 state_file=None, account='default', clock=time.monotonic, sleep=time.sleep):
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.rate = min(max(rate, min_rate), max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.state_file = state_file
+        self.account = account
+        self.clock = clock
+        self.sleep = sleep
+        self.next_slot = clock()
+        self.recovering_until = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_state(cls, state_file, account, default_rate, **kwargs):
+        """Start from the last learned rate for `account`, falling back to `default_rate`."""
+        rate = _read_state(state_file).get(account, {}).get('rate', default_rate)
+        return cls(rate, state_file=state_file, account=account, **kwargs)
+
+    def acquire(self):
+        """Block until the next send slot at the current rate."""
+        with self.lock:
+            now = self.clock()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + 1 / self.rate
+        if slot > now:
+            self.sleep(slot - now)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """Cut the rate (once per congestion event) and, if the server asked for it, hold all sends for `retry_after` seconds."""
+        with self.lock:
+            now = self.clock()
+            if self.recovering_until is None or now >= self.recovering_until:
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.recovering_until = now + max(self.window, 1 / self.rate)
+            if retry_after:
+                self.next_slot = max(self.next_slot, now + retry_after)
+
+    def save(self):
+        if not self.state_file:
+            return
+        state = _read_state(self.state_file)
+        state[self.account] = {
+            'rate': round(self.rate, 4),
+            'updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        if os.path.dirname(self.state_file):
+            os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_file, self.state_file)
+
+def _read_state(state_file):
+    if not state_file or not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
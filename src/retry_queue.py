@@ -0,0 +1,197 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from .sent_log import TIMESTAMP_FORMAT
+
+class RetryQueue:
+    """Deferred retries for failed sends, persisted across runs.
+
+    A failed message is not retried inline: defer() schedules its next
+    attempt (the server's Retry-After, else `base_delay` doubling per
+    attempt up to `max_delay`) and holds the item until pop_due() hands it
+    back to the send loop. After `max_attempts` failed attempts the contact
+    is appended to the dead-letter file and skipped until it is replayed.
+
+    The queue file is a journal of JSON lines (one per change), replayed by
+    load() and compacted by save(). Due times are wall-clock timestamps, so
+    a contact that failed in an earlier run waits out its delay in the next.
+    """
+
+    def __init__(self, path, dead_letter_file, max_attempts=4, base_delay=15, max_delay=900, clock=time.time):
+        self.path = path
+        self.dead_letter_file = dead_letter_file
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.entries = {}
+        self.dead = set()
+        self.dead_lettered = 0
+        self._held = []
+        self._seq = itertools.count()
+        self._journal = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Read the journal and the dead-letter file; returns self."""
+        self.entries = _replay_journal(self.path)
+        self.dead = {record['email'] for record in read_dead_letters(self.dead_letter_file)}
+        self.dead_lettered = 0
+        self._held = []
+        return self
+
+    @property
+    def held(self):
+        """Number of items waiting in this run for their next attempt."""
+        return len(self._held)
+
+    def is_dead(self, email):
+        return email in self.dead
+
+    def hold(self, item):
+        """Hold back a (name, email, row) item whose earlier failure is not due yet.
+
+        Returns False (and holds nothing) if the contact can be sent now.
+        """
+        with self._lock:
+            entry = self.entries.get(item[1])
+            if entry is None or entry['due'] <= self.clock():
+                return False
+            heapq.heappush(self._held, (entry['due'], next(self._seq), item))
+            return True
+
+    def defer(self, item, error, retry_after=None):
+        """Schedule another attempt for a failed (name, email, row) item.
+
+        Returns the due timestamp, or None if the contact has used up its
+        attempts and went to the dead-letter file instead.
+        """
+        name, email = item[0], item[1]
+        with self._lock:
+            attempts = self.entries.get(email, {}).get('attempts', 0) + 1
+            if attempts >= self.max_attempts:
+                self.entries.pop(email, None)
+                self.dead.add(email)
+                self.dead_lettered += 1
+                self._write({'email': email, 'done': True})
+                self._append_dead_letter({
+                    'timestamp': datetime.now().strftime(TIMESTAMP_FORMAT),
+                    'name': name, 'email': email, 'attempts': attempts, 'error': error,
+                })
+                return None
+            if retry_after is None:
+                retry_after = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+            due = self.clock() + retry_after
+            entry = {'name': name, 'attempts': attempts, 'due': round(due, 3), 'error': error}
+            self.entries[email] = entry
+            self._write({'email': email, **entry})
+            heapq.heappush(self._held, (due, next(self._seq), item))
+            return due
+
+    def attempts(self, email):
+        return self.entries.get(email, {}).get('attempts', 0)
+
+    def pop_due(self):
+        """Held items whose next attempt is due, earliest first."""
+        due = []
+        with self._lock:
+            now = self.clock()
+            while self._held and self._held[0][0] <= now:
+                due.append(heapq.heappop(self._held)[2])
+        return due
+
+    def next_due(self):
+        """Timestamp of the earliest held item, or None."""
+        with self._lock:
+            return self._held[0][0] if self._held else None
+
+    def done(self, email):
+        """Forget a contact once it has been sent."""
+        with self._lock:
+            if self.entries.pop(email, None) is not None:
+                self._write({'email': email, 'done': True})
+
+    def replay_dead_letters(self):
+        """Give every dead-lettered contact a fresh set of attempts.
+
+        The dead-letter file is moved aside (to *.replayed) so the contacts
+        are sent again on the next run. Returns how many were replayed.
+        """
+        records = read_dead_letters(self.dead_letter_file)
+        if not records:
+            return 0
+        self.load()
+        with self._lock:
+            for record in records:
+                self.dead.discard(record['email'])
+                if self.entries.pop(record['email'], None) is not None:
+                    self._write({'email': record['email'], 'done': True})
+        os.replace(self.dead_letter_file, f"{self.dead_letter_file}.replayed")
+        return len({record['email'] for record in records})
+
+    def _write(self, record):
+        if self._journal is None:
+            _make_parent(self.path)
+            self._journal = open(self.path, 'a', encoding='utf-8')
+        self._journal.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._journal.flush()
+
+    def _append_dead_letter(self, record):
+        _make_parent(self.dead_letter_file)
+        with open(self.dead_letter_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def save(self):
+        """Compact the journal down to the live entries (removing it when empty)."""
+        with self._lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if not self.entries:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+                return
+            _make_parent(self.path)
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for email, entry in self.entries.items():
+                    f.write(json.dumps({'email': email, **entry}, ensure_ascii=False, default=str) + '\n')
+            os.replace(tmp_file, self.path)
+
+def _make_parent(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+def _read_jsonl(path):
+    if not path or not os.path.exists(path):
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short by a crash mid-write
+                continue
+            if isinstance(record, dict) and record.get('email'):
+                records.append(record)
+    return records
+
+def _replay_journal(path):
+    entries = {}
+    for record in _read_jsonl(path):
+        email = record.pop('email')
+        if record.get('done'):
+            entries.pop(email, None)
+        else:
+            entries[email] = record
+    return entries
+
+def read_dead_letters(path):
+    """The dead-letter records (timestamp, name, email, attempts, error)."""
+    return _read_jsonl(path)
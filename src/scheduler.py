@@ -0,0 +1,128 @@
+import heapq
+import itertools
+import time
+from collections import deque
+
+import numpy as np
+
+from .rate_limiter import TokenBucket
+
+def domain_of(email):
+    return email.rpartition('@')[2].lower()
+
+def _domains(emails):
+    return np.array([domain_of(email) for email in emails], dtype=object)
+
+def fair_order(emails):
+    """Positions of `emails` interleaved round-robin across their domains.
+
+    The first address of every domain comes first, then the second of
+    every domain, and so on; within a round, domains keep the order in
+    which they first appear, and each domain keeps its own file order.
+    Sorting-based, so O(n log n) for any mix of domains.
+    """
+    if len(emails) < 2:
+        return np.arange(len(emails))
+    _, first, codes = np.unique(_domains(emails), return_index=True, return_inverse=True)
+    by_domain = np.argsort(codes, kind='stable')
+    sizes = np.bincount(codes)
+    starts = np.cumsum(sizes) - sizes
+    rank = np.empty(len(emails), dtype=np.intp)
+    rank[by_domain] = np.arange(len(emails)) - np.repeat(starts, sizes)
+    return np.lexsort((first[codes], rank))
+
+def domain_counts(emails):
+    """Number of addresses per domain."""
+    if not len(emails):
+        return {}
+    domains, counts = np.unique(_domains(emails), return_counts=True)
+    return dict(zip(domains.tolist(), counts.tolist()))
+
+class DomainThrottle:
+    """Per-recipient-domain rate caps applied to the stream of contacts to send.
+
+    `default_rate` caps every domain (messages per second) and `rates`
+    overrides it per domain; a domain with no cap passes straight through.
+    A contact whose domain is over its cap is parked, not waited on: the
+    contacts behind it keep flowing and parked ones are released, in order,
+    as their domain's bucket refills. Only when `max_parked` contacts are
+    waiting (or the input has run out) does the stream sleep.
+    """
+
+    def __init__(self, rates=None, default_rate=None, burst=1, max_parked=10000,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.rates = {domain.lower(): rate for domain, rate in (rates or {}).items()}
+        self.default_rate = default_rate
+        self.burst = burst
+        self.max_parked = max_parked
+        self.clock = clock
+        self.sleep = sleep
+        self.parked_total = 0
+        self.waited = 0.0
+        self._buckets = {}
+        self._parked = {}
+        self._ready = []
+        self._seq = itertools.count()
+        self._count = 0
+
+    @property
+    def enabled(self):
+        return bool(self.default_rate or any(self.rates.values()))
+
+    def _bucket(self, domain):
+        if domain not in self._buckets:
+            rate = self.rates.get(domain, self.default_rate)
+            self._buckets[domain] = TokenBucket(rate, self.burst, clock=self.clock) if rate else None
+        return self._buckets[domain]
+
+    def throttle(self, items):
+        """Yield (name, email, row) items from `items`, holding back those over their domain's cap."""
+        # Anything parked by an earlier stream that was abandoned midway is not ours to send
+        self._parked.clear()
+        self._ready.clear()
+        self._count = 0
+        for item in items:
+            yield from self._release()
+            domain = domain_of(item[1])
+            bucket = self._bucket(domain)
+            if bucket is None:
+                yield item
+            elif domain not in self._parked and bucket.try_acquire():
+                yield item
+            else:
+                self._park(domain, bucket, item)
+                while self._count >= self.max_parked:
+                    yield from self._wait()
+        while self._ready:
+            yield from self._wait()
+
+    def _park(self, domain, bucket, item):
+        queue = self._parked.get(domain)
+        if queue is None:
+            queue = self._parked[domain] = deque()
+            heapq.heappush(self._ready, (self.clock() + bucket.wait_time(), next(self._seq), domain))
+        queue.append(item)
+        self._count += 1
+        self.parked_total += 1
+
+    def _release(self):
+        """Parked items whose domain has a token now, earliest-ready domain first."""
+        now = self.clock()
+        while self._ready and self._ready[0][0] <= now:
+            _, _, domain = heapq.heappop(self._ready)
+            bucket = self._buckets[domain]
+            queue = self._parked[domain]
+            while queue and bucket.try_acquire():
+                self._count -= 1
+                yield queue.popleft()
+            if queue:
+                heapq.heappush(self._ready, (self.clock() + bucket.wait_time(), next(self._seq), domain))
+            else:
+                del self._parked[domain]
+
+    def _wait(self):
+        delay = max(0.0, self._ready[0][0] - self.clock())
+        if delay:
+            self.waited += delay
+            self.sleep(delay)
+        yield from self._release()
@@ -0,0 +1,240 @@
+import csv
+import io
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+
+FIELDS = ['timestamp', 'name', 'email', 'campaign', 'account']
+# Bytes copied at a time when an older log's header is rewritten
+COPY_BUFFER = 1024 * 1024
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _now():
+    return datetime.now().strftime(TIMESTAMP_FORMAT)
+
+def _ensure_dir(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+class CsvSentLog:
+    """Append-only CSV journal with buffered writes and group-commit fsync.
+
+    Every record is flushed to the OS as soon as it is written (so a crash of
+    the process loses nothing, as with the old per-row to_csv), while fsync
+    is batched every `fsync_every` records or `fsync_interval` seconds.
+    """
+
+    def __init__(self, path, fsync_every=100, fsync_interval=1.0):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._writer = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def load(self):
+        """Return the set of logged email addresses."""
+        if not os.path.exists(self.path):
+            return set()
+        try:
+            import pandas as pd
+            df = pd.read_csv(self.path, usecols=['email'], dtype=str)
+            return set(df['email'].dropna().unique())
+        except Exception:
+            return set()
+
+    def rows(self, since=None):
+        """Yield logged records as dicts, optionally only those at or after timestamp `since`."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                if since is None or (row.get('timestamp') or '') >= since:
+                    yield row
+
+    def _open(self):
+        _ensure_dir(self.path)
+        fields = FIELDS
+        needs_newline = False
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as f:
+                header = f.readline().decode('utf-8').strip()
+            # Keep appending in the layout of an existing (older) log, with any missing columns added
+            fields = next(csv.reader([header]))
+            missing = [field for field in FIELDS if field not in fields]
+            if missing:
+                fields = fields + missing
+                self._rewrite_header(fields)
+            with open(self.path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b'\n'
+            header = None
+        else:
+            header = FIELDS
+
+        self._file = open(self.path, 'a', encoding='utf-8', newline='')
+        if needs_newline:
+            # Terminate a record torn by an earlier crash
+            self._file.write('\n')
+        self._writer = csv.DictWriter(self._file, fieldnames=fields, extrasaction='ignore')
+        if header:
+            self._writer.writeheader()
+
+    def _rewrite_header(self, fields):
+        """Replace the header line of an older log with `fields`.
+
+        Rows already in the file keep their values and read the added
+        columns as empty. The file is copied once and swapped in atomically.
+        """
+        tmp_file = f"{self.path}.tmp"
+        with open(self.path, 'rb') as src, open(tmp_file, 'wb') as dst:
+            src.readline()
+            line = io.StringIO()
+            csv.writer(line).writerow(fields)
+            dst.write(line.getvalue().encode('utf-8'))
+            shutil.copyfileobj(src, dst, COPY_BUFFER)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp_file, self.path)
+
+    def append(self, email, name, **extra):
+        if self._file is None:
+            self._open()
+        self._writer.writerow({'timestamp': _now(), 'name': name, 'email': email, **extra})
+        self._file.flush()
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._last_sync = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def reset(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+class SqliteSentLog:
+    """Sent log in SQLite (WAL mode), indexed on email and campaign.
+
+    Each record is committed on its own; with synchronous=NORMAL a WAL commit
+    survives a process crash and the WAL is fsynced at checkpoints.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            _ensure_dir(self.path)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sent_log ("
+                "id INTEGER PRIMARY KEY, timestamp TEXT, name TEXT, email TEXT, campaign TEXT, account TEXT)"
+            )
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(sent_log)")}
+            for field in FIELDS:
+                if field not in columns:
+                    self._conn.execute(f"ALTER TABLE sent_log ADD COLUMN {field} TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sent_log_email ON sent_log(email)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sent_log_campaign ON sent_log(campaign, email)")
+        return self._conn
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return set()
+        return {email for (email,) in self._connect().execute("SELECT DISTINCT email FROM sent_log")}
+
+    def rows(self, since=None):
+        if not os.path.exists(self.path):
+            return
+        query = f"SELECT {', '.join(FIELDS)} FROM sent_log"
+        params = []
+        if since is not None:
+            query += " WHERE timestamp >= ?"
+            params.append(since)
+        cursor = self._connect().execute(query + " ORDER BY id", params)
+        for values in cursor:
+            yield dict(zip(FIELDS, values))
+
+    def contains(self, email, campaign=None):
+        query = "SELECT 1 FROM sent_log WHERE email = ?"
+        params = [email]
+        if campaign is not None:
+            query += " AND campaign = ?"
+            params.append(campaign)
+        return self._connect().execute(query + " LIMIT 1", params).fetchone() is not None
+
+    def append(self, email, name, **extra):
+        record = {'timestamp': _now(), 'name': name, 'email': email, **extra}
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT INTO sent_log ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                [record.get(field) for field in FIELDS]
+            )
+
+    def import_rows(self, rows, chunk_size=10000):
+        """Bulk-insert records (dicts with FIELDS keys) in large transactions."""
+        conn = self._connect()
+        insert = f"INSERT INTO sent_log ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})"
+        count = 0
+        chunk = []
+        for row in rows:
+            chunk.append([row.get(field) for field in FIELDS])
+            if len(chunk) >= chunk_size:
+                with conn:
+                    conn.executemany(insert, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            with conn:
+                conn.executemany(insert, chunk)
+            count += len(chunk)
+        return count
+
+    def sync(self):
+        if self._conn is not None:
+            self._conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def close(self):
+        if self._conn is not None:
+            self.sync()
+            self._conn.close()
+            self._conn = None
+
+    def reset(self):
+        self.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+def open_sent_log(path, **kwargs):
+    """Return the sent-log backend for `path`: SQLite for .db/.sqlite files, CSV otherwise."""
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        return SqliteSentLog(path)
+    return CsvSentLog(path, **kwargs)
+
+def import_csv_log(csv_path, target):
+    """One-shot import of an existing sent_log.csv into a SQLite sent log."""
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Sent log not found: {csv_path}")
+    if not isinstance(target, SqliteSentLog):
+        target = SqliteSentLog(target)
+    return target.import_rows(CsvSentLog(csv_path).rows())
@@ -0,0 +1,242 @@
+import base64
+import io
+import json
+import mmap
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .email_utils import AttachmentCache, message_head, message_tail
+from .template_manager import TemplateManager
+
+DATA_FILE = 'messages.bin'
+INDEX_FILE = 'index.jsonl'
+
+# Rows handed to a render worker at a time
+RENDER_BATCH = 256
+
+_MBOX_FROM = re.compile(rb'^(>*From )', re.MULTILINE)
+
+class MessageSpool:
+    """Pre-rendered messages on disk: RFC 822 bytes in one data file.
+
+    Each message is stored as its per-recipient head plus a reference to its
+    tail (encoded attachments and closing boundary). A tail is written once
+    however many messages share it, so a large attachment does not multiply
+    the spool size. `index.jsonl` holds one entry per message (name, email,
+    offset, length, tail_offset, tail_length) in send order and is read back
+    lazily, so the spool costs no memory per message. The data file is
+    memory-mapped for reading: sending a message joins two slices of the
+    map, not a render.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, DATA_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.count = 0
+        self._data = None
+        self._index = None
+        self._offset = 0
+        self._file = None
+        self._map = None
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Index entries (dicts with name, email, offset, length) in send order."""
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def create(self):
+        """Start a new, empty spool (replacing any previous one)."""
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self._data = open(self.data_path, 'wb')
+        self._index = open(self.index_path, 'w', encoding='utf-8')
+        self._offset = 0
+        self.count = 0
+        return self
+
+    def add_tail(self, tail):
+        """Store a message tail; returns the (offset, length) reference add() takes."""
+        return self._write(tail)
+
+    def add(self, name, email, head, tail=None):
+        """Append a message: its head, and the reference of its tail from add_tail()."""
+        offset, length = self._write(head)
+        entry = {'name': name, 'email': email, 'offset': offset, 'length': length}
+        if tail is not None:
+            entry['tail_offset'], entry['tail_length'] = tail
+        self._index.write(json.dumps(entry) + '\n')
+        self.count += 1
+
+    def _write(self, data):
+        offset = self._offset
+        self._data.write(data)
+        self._offset += len(data)
+        return offset, len(data)
+
+    def finish(self):
+        """Flush the spool written by add() and reopen it for reading."""
+        self._data.close()
+        self._index.close()
+        self._data = self._index = None
+        return self.open()
+
+    def open(self):
+        """Map an existing spool for reading."""
+        with open(self.index_path, 'rb') as f:
+            self.count = sum(1 for line in f if line.strip())
+        self._file = open(self.data_path, 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def close(self):
+        for handle in (self._data, self._index, self._map, self._file):
+            if handle is not None:
+                handle.close()
+        self._data = self._index = self._map = self._file = None
+
+    def raw(self, entry):
+        """RFC 822 bytes of the message an index entry points at."""
+        head = self._map[entry['offset']:entry['offset'] + entry['length']]
+        if 'tail_offset' not in entry:
+            return head
+        return head + self._map[entry['tail_offset']:entry['tail_offset'] + entry['tail_length']]
+
+    def message_body(self, entry, stream=False):
+        """The message in the form send_gmail_message takes.
+
+        With `stream`, a file object for a media upload; otherwise a
+        {'raw': ...} dict.
+        """
+        raw = self.raw(entry)
+        if stream:
+            return io.BytesIO(raw)
+        return {'raw': base64.urlsafe_b64encode(raw).decode()}
+
+    def export_mbox(self, path):
+        """Write every message to an mbox file (mboxrd quoting of From lines)."""
+        stamp = time.asctime()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            for entry in self:
+                raw = _MBOX_FROM.sub(rb'>\1', self.raw(entry))
+                f.write(f'From MAILER-DAEMON {stamp}\n'.encode())
+                f.write(raw)
+                f.write(b'\n' if raw.endswith(b'\n') else b'\n\n')
+        return self.count
+
+    def export_eml(self, directory):
+        """Write each message to its own numbered .eml file."""
+        os.makedirs(directory, exist_ok=True)
+        for index, entry in enumerate(self):
+            safe = re.sub(r'[^\w.@-]', '_', entry['email'])
+            with open(os.path.join(directory, f'{index + 1:06d}_{safe}.eml'), 'wb') as f:
+                f.write(self.raw(entry))
+        return self.count
+
+    def export(self, path):
+        """Export to mbox when `path` ends in .mbox, else to a directory of .eml files."""
+        if path.lower().endswith('.mbox'):
+            return self.export_mbox(path)
+        return self.export_eml(path)
+
+_worker = {}
+
+def _init_worker(template_file, subject_format, boundary):
+    template_manager = TemplateManager(template_file, subject_format)
+    template_manager.load_template()
+    _worker.update(template_manager=template_manager, boundary=boundary)
+
+def _render_batch(items):
+    """Render a batch to message heads; attachments are appended by the parent."""
+    template_manager = _worker['template_manager']
+    boundary = _worker['boundary']
+    rendered = []
+    for name, email, row in items:
+        subject, body = template_manager.render(row)
+        rendered.append((name, email, message_head(email, subject, body, boundary)))
+    return rendered
+
+def prerender(items, spool, template_manager, attachments, workers=None, on_rendered=None, cache=None,
+              row_attachments=None):
+    """Render (name, email, row) items into `spool`, in order, across a process pool.
+
+    Workers only render the per-recipient head of each message; attachment
+    segments are encoded here (once per file, through `cache`), so only
+    small payloads cross process boundaries. Each distinct set of files
+    becomes one tail in the spool, shared by every message that carries it.
+    `row_attachments(row)` gives a row's own files, sent after the shared
+    `attachments`. At most two batches per worker are in flight,
+    so memory stays bounded for any list length. `on_rendered(count)` is
+    called as batches land.
+    """
+    workers = workers or os.cpu_count() or 1
+    cache = cache or AttachmentCache()
+    if isinstance(attachments, str):
+        attachments = [attachments]
+    attachments = list(attachments or [])
+    initargs = (template_manager.template_file, template_manager.subject_format, cache.boundary)
+    batches = _batched(items, RENDER_BATCH)
+    # Spool reference of the tail for each distinct list of files
+    stored = {}
+
+    def stored_tail(paths):
+        key = tuple(paths)
+        if key not in stored:
+            stored[key] = spool.add_tail(message_tail(paths, cache))
+        return stored[key]
+
+    def tails(batch):
+        """Per-message tail references for the rows with files of their own (None elsewhere)."""
+        if row_attachments is None:
+            return None
+        extra = [row_attachments(row) for _, _, row in batch]
+        if not any(extra):
+            return None
+        return [stored_tail(attachments + [p for p in paths if p not in attachments]) if paths else tail
+                for paths in extra]
+
+    def write(rendered, own_tails):
+        for index, (name, email, head) in enumerate(rendered):
+            spool.add(name, email, head, tail if own_tails is None else own_tails[index])
+        if on_rendered:
+            on_rendered(len(rendered))
+
+    spool.create()
+    tail = stored_tail(attachments)
+    if workers == 1:
+        _init_worker(*initargs)
+        for batch in batches:
+            write(_render_batch(batch), tails(batch))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+            in_flight = deque()
+            for batch in batches:
+                in_flight.append((pool.submit(_render_batch, batch), tails(batch)))
+                if len(in_flight) >= workers * 2:
+                    future, own_tails = in_flight.popleft()
+                    write(future.result(), own_tails)
+            while in_flight:
+                future, own_tails = in_flight.popleft()
+                write(future.result(), own_tails)
+    return spool.finish()
+
+def _batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,171 @@
+import csv
+import hashlib
+import json
+import mmap
+import os
+
+import numpy as np
+
+from .addresses import clean_address
+
+UNSUBSCRIBE = 1
+BOUNCE = 2
+
+SOURCE_NAMES = {'unsubscribe': UNSUBSCRIBE, 'bounce': BOUNCE}
+# Saved with the index; bumped whenever normalize_address changes, so older indexes are rebuilt
+NORMALIZATION = 2
+
+def normalize_address(address):
+    """Canonical form of an email address for suppression checks.
+
+    The cleaning contact addresses get (addresses.clean_address: NFKC, so
+    full-width characters become ASCII, zero-width characters and
+    surrounding whitespace dropped), then lower-cased.
+    """
+    return clean_address(address).lower()
+
+def address_key(normalized):
+    """Stable 64-bit key of a normalized address."""
+    return int.from_bytes(hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def read_address_file(path):
+    """Yield addresses from a plain list (one per line) or a CSV with an `email` column."""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if ',' in first:
+            reader = csv.DictReader(f)
+            column = next((c for c in reader.fieldnames or [] if c.strip().lower() in ('email', 'company_email', 'address')), None)
+            if column is None:
+                raise ValueError(f"No email column found in {path}")
+            for row in reader:
+                if row.get(column):
+                    yield row[column]
+        else:
+            for line in f:
+                if line.strip() and not line.startswith('#'):
+                    yield line
+
+class SuppressionIndex:
+    """Compact on-disk index of suppressed addresses.
+
+    Stores sorted 64-bit address keys, a source bitmask per key and the exact
+    normalized addresses (a UTF-8 blob plus offsets). Everything is
+    memory-mapped, so lookups cost a binary search over the keys and a single
+    string comparison to rule out hash collisions.
+    """
+
+    def __init__(self, keys, sources, offsets, blob):
+        self.keys = keys
+        self.sources = sources
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def build(cls, entries):
+        """Build an in-memory index from (address, source_bit) pairs."""
+        merged = {}
+        for address, source in entries:
+            normalized = normalize_address(address)
+            if normalized:
+                merged[normalized] = merged.get(normalized, 0) | source
+        addresses = sorted(merged, key=address_key)
+        keys = np.fromiter((address_key(a) for a in addresses), dtype=np.uint64, count=len(addresses))
+        sources = np.fromiter((merged[a] for a in addresses), dtype=np.uint8, count=len(addresses))
+        encoded = [a.encode('utf-8') for a in addresses]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        return cls(keys, sources, offsets, b''.join(encoded))
+
+    def save(self, base_path):
+        np.save(f"{base_path}.keys.npy", self.keys)
+        np.save(f"{base_path}.sources.npy", self.sources)
+        np.save(f"{base_path}.offsets.npy", self.offsets)
+        with open(f"{base_path}.blob", 'wb') as f:
+            f.write(self.blob)
+
+    @classmethod
+    def load(cls, base_path):
+        keys = np.load(f"{base_path}.keys.npy", mmap_mode='r')
+        sources = np.load(f"{base_path}.sources.npy", mmap_mode='r')
+        offsets = np.load(f"{base_path}.offsets.npy", mmap_mode='r')
+        blob = b''
+        if os.path.getsize(f"{base_path}.blob"):
+            with open(f"{base_path}.blob", 'rb') as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(keys, sources, offsets, blob)
+
+    def lookup_many(self, normalized_addresses):
+        """Return the source bitmask (0 = not suppressed) for each normalized address."""
+        result = np.zeros(len(normalized_addresses), dtype=np.uint8)
+        if not len(self.keys) or not len(normalized_addresses):
+            return result
+        wanted = np.fromiter((address_key(a) for a in normalized_addresses), dtype=np.uint64, count=len(normalized_addresses))
+        positions = np.searchsorted(self.keys, wanted)
+        positions[positions == len(self.keys)] = 0
+        hits = np.flatnonzero(self.keys[positions] == wanted)
+        found = positions[hits]
+        starts = self.offsets[found].tolist()
+        ends = self.offsets[found + 1].tolist()
+        blob = self.blob
+        # Confirm against the exact address; keys are 64-bit hashes
+        confirmed = [blob[start:end] == normalized_addresses[i].encode('utf-8')
+                     for i, start, end in zip(hits.tolist(), starts, ends)]
+        hits = hits[np.array(confirmed, dtype=bool)] if confirmed else hits
+        result[hits] = self.sources[positions[hits]]
+        return result
+
+    def lookup(self, address):
+        return int(self.lookup_many([normalize_address(address)])[0])
+
+def _source_files(sources):
+    files = []
+    for name, paths in sources.items():
+        for path in [paths] if isinstance(paths, str) else paths:
+            if os.path.exists(path):
+                files.append((name, path))
+    return files
+
+def sources_fingerprint(sources):
+    """Name, path, size and mtime of each existing source file; changes whenever one is edited."""
+    return [[name, path, os.path.getsize(path), os.stat(path).st_mtime_ns] for name, path in _source_files(sources)]
+
+def load_suppression_index(sources, base_path):
+    """Return the index for the configured source files, rebuilding it only when they change.
+
+    `sources` maps a source name ('unsubscribe', 'bounce') to a file path or list of paths.
+    """
+    unknown = [name for name in sources if name not in SOURCE_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown SUPPRESSION_FILES source: {', '.join(map(repr, unknown))} "
+                         f"(expected {' or '.join(map(repr, SOURCE_NAMES))})")
+    files = _source_files(sources)
+    if not files:
+        return None
+
+    fingerprint = {'normalization': NORMALIZATION, 'sources': sources_fingerprint(sources)}
+    meta_path = f"{base_path}.meta.json"
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                if json.load(f) == fingerprint:
+                    return SuppressionIndex.load(base_path)
+        except (OSError, ValueError):
+            pass
+
+    def entries():
+        for name, path in files:
+            bit = SOURCE_NAMES[name]
+            for address in read_address_file(path):
+                yield address, bit
+
+    index = SuppressionIndex.build(entries())
+    if os.path.dirname(base_path):
+        os.makedirs(os.path.dirname(base_path), exist_ok=True)
+    index.save(base_path)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(fingerprint, f)
+    return SuppressionIndex.load(base_path)
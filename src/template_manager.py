@@ -1,10 +1,87 @@
 import os
+import re
+from string import Formatter
+
+PLACEHOLDER = re.compile(r'<<(.+?)>>')
+
+class CompiledTemplate:
+    """A template parsed once into literal text and field segments.
+
+    `literals` always has one more entry than `fields`; rendering interleaves
+    them in a single join. Body templates use <<field>> placeholders, subject
+    templates use str.format fields ({field}, {field!r}, {field:>10}).
+    """
+
+    def __init__(self, literals, fields, formats=None, missing='keep'):
+        self.literals = literals
+        self.fields = fields
+        self.formats = formats
+        self.missing = missing
+
+    @classmethod
+    def from_placeholders(cls, text):
+        parts = PLACEHOLDER.split(text)
+        return cls(parts[0::2], parts[1::2])
+
+    @classmethod
+    def from_format(cls, fmt):
+        literals = ['']
+        fields = []
+        formats = []
+        for literal, field, spec, conversion in Formatter().parse(fmt):
+            literals[-1] += literal
+            if field is None:
+                continue
+            if not field or not field.isidentifier():
+                # Positional or attribute/index fields: fall back to str.format
+                return _FormatFallback(fmt)
+            fields.append(field)
+            formats.append((conversion, spec))
+            literals.append('')
+        return cls(literals, fields, formats, missing='raise')
+
+    @property
+    def field_names(self):
+        return set(self.fields)
+
+    def render(self, context):
+        literals = self.literals
+        out = [literals[0]]
+        for i, field in enumerate(self.fields):
+            if field in context:
+                value = context[field]
+                if self.formats is None:
+                    out.append(str(value))
+                else:
+                    conversion, spec = self.formats[i]
+                    if conversion:
+                        value = {'r': repr, 's': str, 'a': ascii}[conversion](value)
+                    out.append(format(value, spec))
+            elif self.missing == 'raise':
+                raise KeyError(field)
+            else:
+                out.append(f"<<{field}>>")
+            out.append(literals[i + 1])
+        return ''.join(out)
+
+class _FormatFallback:
+    """Subject formats the compiler does not handle are rendered with str.format."""
+
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self.field_names = {field.split('.')[0].split('[')[0]
+                            for _, field, _, _ in Formatter().parse(fmt) if field}
+
+    def render(self, context):
+        return self.fmt.format(**context)
 
 class TemplateManager:
     def __init__(self, template_file, subject_format):
         self.template_file = template_file
         self.subject_format = subject_format
         self.template_content = None
+        self.body_template = None
+        self.subject_template = CompiledTemplate.from_format(subject_format)
 
     def load_template(self):
         """Read the template file."""
@@ -12,6 +89,7 @@ class TemplateManager:
             raise FileNotFoundError(f"Template file not found: {self.template_file}")
         with open(self.template_file, 'r', encoding='utf-8') as f:
             self.template_content = f.read()
+        self.body_template = CompiledTemplate.from_placeholders(self.template_content)
         return self.template_content
 
     def render(self, context):
@@ -19,28 +97,41 @@ class TemplateManager:
         if self.template_content is None:
             self.load_template()
             
-        body = self.template_content
-        for key, value in context.items():
-            placeholder = f"<<{key}>>"
-            body = body.replace(placeholder, str(value))
-        
-        subject = self.subject_format.format(**context)
+        body = self.body_template.render(context)
+        subject = self.subject_template.render(context)
         return subject, body
 
-    def get_preview(self, contacts, sent_emails):
-        """Generate a preview for the first pending email."""
-        for _, row in contacts.iterrows():
-            email = str(row.get('company_email', '')).strip()
-            name = str(row.get('company_name', '')).strip()
-            
-            if email and not name.startswith('!') and email not in sent_emails:
-                subject, body = self.render(dict(row))
-                return {
-                    'to': email,
-                    'subject': subject,
-                    'body': body
-                }
-        return None
+    def field_names(self):
+        """Every contact field referenced by the body or the subject."""
+        if self.template_content is None:
+            self.load_template()
+        return self.body_template.field_names | self.subject_template.field_names
+
+    def validate(self, columns, empty_counts=None):
+        """Check placeholders against the contact list before sending.
+
+        `columns` are the contacts columns and `empty_counts` maps a field to
+        the number of pending rows with no value (see DataManager.summarize).
+        Returns a dict with 'unknown' (fields with no matching column) and
+        'empty' (field -> count, for known fields only).
+        """
+        fields = self.field_names()
+        unknown = sorted(f for f in fields if f not in columns)
+        empty = {field: count for field, count in sorted((empty_counts or {}).items())
+                 if count and field in fields and field not in unknown}
+        return {'unknown': unknown, 'empty': empty}
+
+    def get_preview(self, first_pending):
+        """Generate a preview for the first pending email, given as (email, row)."""
+        if first_pending is None:
+            return None
+        email, row = first_pending
+        subject, body = self.render(row)
+        return {
+            'to': email,
+            'subject': subject,
+            'body': body
+        }
 
     def generate_template(self):
         """Create a sample template.txt file."""
@@ -0,0 +1,276 @@
+import base64
+import queue
+import re
+import smtplib
+import ssl
+import threading
+from contextlib import contextmanager
+
+from .email_utils import send_gmail_message
+
+class GmailApiTransport:
+    """Sends through the Gmail REST API (users.messages.send).
+
+    Accepts the {'raw': ...} dicts and message files the engine builds.
+    With an AuthorizedHttpPool, each send checks out its own connection.
+    """
+
+    supports_batch = True
+    # Gmail's limit on requests per batch
+    max_batch = 100
+
+    def __init__(self, service, http_pool=None):
+        self.service = service
+        self.http_pool = http_pool
+
+    def send(self, message, to=None):
+        if self.http_pool is not None:
+            with self.http_pool.checkout() as http:
+                return send_gmail_message(self.service, message, http=http)
+        return send_gmail_message(self.service, message)
+
+    def send_batch(self, messages, callback):
+        """Send up to `max_batch` {'raw': ...} messages in one batch request.
+
+        `callback(index, response, exception)` is called for each message,
+        with its index in `messages`.
+        """
+        def on_response(request_id, response, exception):
+            callback(int(request_id), response, exception)
+
+        batch = self.service.new_batch_http_request(callback=on_response)
+        for index, message in enumerate(messages):
+            batch.add(self.service.users().messages().send(userId='me', body=message), request_id=str(index))
+        if self.http_pool is not None:
+            with self.http_pool.checkout() as http:
+                return batch.execute(http=http)
+        return batch.execute()
+
+    def close(self):
+        if self.http_pool is not None:
+            self.http_pool.close()
+
+def message_bytes(message):
+    """RFC 822 bytes of a message in any of the forms the engine builds."""
+    if isinstance(message, (bytes, bytearray)):
+        return bytes(message)
+    if hasattr(message, 'read'):
+        message.seek(0)
+        return message.read()
+    return base64.urlsafe_b64decode(message['raw'])
+
+def xoauth2_string(user, token):
+    return f"user={user}\1auth=Bearer {token}\1\1"
+
+_HEADER_END = re.compile(rb'\r?\n\r?\n')
+_FROM_HEADER = re.compile(rb'(?im)^from:')
+_LEADING_DOT = re.compile(rb'(?m)^\.')
+_EOL = re.compile(rb'\r\n|\n|\r(?!\n)')
+
+def _dot_stuff(data):
+    """CRLF line endings and dot-stuffing for the DATA phase."""
+    if b'\r' in data:
+        data = _EOL.sub(b'\r\n', data)
+    else:
+        # Messages built by email_utils use bare LF; replace() is much faster than the regex
+        data = data.replace(b'\n', b'\r\n')
+    if data.startswith(b'.') or b'\n.' in data:
+        data = _LEADING_DOT.sub(b'..', data)
+    if not data.endswith(b'\r\n'):
+        data += b'\r\n'
+    return data
+
+class _StaleConnection(smtplib.SMTPServerDisconnected):
+    """A pooled connection that failed before MAIL FROM was answered."""
+
+class SmtpTransport:
+    """Sends over SMTP through a pool of persistent, authenticated connections.
+
+    Works with smtp.gmail.com (XOAUTH2 with the OAuth credentials, which need
+    the https://mail.google.com/ scope) or any relay (LOGIN/PLAIN or no auth).
+    Connections are opened on demand up to `pool_size`, reused for many
+    messages and replaced when the server drops them. When the server
+    advertises PIPELINING, MAIL FROM, RCPT TO and DATA go out in a single
+    write, saving two round trips per message.
+
+    SMTP errors are raised as smtplib exceptions; EmailEngine classifies them.
+    """
+
+    supports_batch = False
+
+    def __init__(self, host, port=587, sender=None, username=None, password=None, credentials=None,
+                 auth=None, starttls=True, use_ssl=False, pool_size=1, timeout=60, pipelining=True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.credentials = credentials
+        self.sender = sender or username
+        if not self.sender:
+            raise ValueError("SMTP transport needs a sender address (SMTP 'sender' or 'username')")
+        self.auth = auth or ('xoauth2' if credentials is not None else 'login' if password else None)
+        self.starttls = starttls and not use_ssl
+        self.use_ssl = use_ssl
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.pipelining = pipelining
+        self._idle = queue.LifoQueue()
+        self._slots = threading.Semaphore(self.pool_size)
+        self._from_header = f"From: {self.sender}\r\n".encode()
+
+    @classmethod
+    def from_config(cls, settings, credentials=None, pool_size=None):
+        """Build from the CONFIG['SMTP'] dict."""
+        return cls(
+            settings['host'],
+            settings.get('port', 587),
+            sender=settings.get('sender'),
+            username=settings.get('username'),
+            password=settings.get('password'),
+            credentials=credentials if settings.get('auth', 'xoauth2') == 'xoauth2' else None,
+            auth=settings.get('auth'),
+            starttls=settings.get('starttls', True),
+            use_ssl=settings.get('ssl', False),
+            pool_size=pool_size or settings.get('pool_size', 1),
+            timeout=settings.get('timeout', 60),
+            pipelining=settings.get('pipelining', True),
+        )
+
+    def _connect(self):
+        context = ssl.create_default_context()
+        if self.use_ssl:
+            conn = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout, context=context)
+        else:
+            conn = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            conn.ehlo()
+            if self.starttls:
+                conn.starttls(context=context)
+                conn.ehlo()
+            if self.auth == 'xoauth2':
+                if not self.credentials.valid:
+                    from google.auth.transport.requests import Request
+                    self.credentials.refresh(Request())
+                token = self.credentials.token
+                conn.auth('XOAUTH2', lambda challenge=None: '' if challenge else xoauth2_string(self.username or self.sender, token))
+            elif self.auth:
+                conn.login(self.username, self.password)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    @contextmanager
+    def _checkout(self):
+        """A connection and whether it came from the pool (rather than being opened for this send)."""
+        with self._slots:
+            try:
+                conn, pooled = self._idle.get_nowait(), True
+            except queue.Empty:
+                conn, pooled = self._connect(), False
+            try:
+                yield conn, pooled
+            except smtplib.SMTPResponseException as e:
+                if e.smtp_code == 421:
+                    # Server is closing the connection
+                    conn.close()
+                else:
+                    self._idle.put(conn)
+                raise
+            except smtplib.SMTPRecipientsRefused:
+                self._idle.put(conn)
+                raise
+            except OSError:
+                # Dropped or broken connection (smtplib errors are OSErrors too)
+                conn.close()
+                raise
+            except Exception:
+                self._idle.put(conn)
+                raise
+            else:
+                self._idle.put(conn)
+
+    def send(self, message, to):
+        data = message_bytes(message)
+        if not _FROM_HEADER.search(_HEADER_END.split(data, 1)[0]):
+            data = self._from_header + data
+        while True:
+            try:
+                with self._checkout() as (conn, pooled):
+                    if self.pipelining and conn.has_extn('pipelining'):
+                        return self._send_pipelined(conn, pooled, to, data)
+                    return self._send_plain(conn, pooled, to, data)
+            except _StaleConnection:
+                # Closed while idle, before the server saw the message: try the next connection.
+                # Each stale one is discarded, so this ends on a fresh connection at the latest.
+                continue
+
+    def _begin(self, conn, pooled, commands):
+        """Send the commands that open a transaction and return the reply to MAIL FROM.
+
+        Only a failure here, on a pooled connection, is retried by send();
+        once MAIL FROM has been answered the server may go on to accept the
+        message, so later disconnects are left to the engine rather than
+        risking a duplicate.
+        """
+        try:
+            conn.send(commands)
+            return conn.getreply()
+        except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+            if pooled:
+                raise _StaleConnection(str(e)) from e
+            raise
+
+    def _send_plain(self, conn, pooled, to, data):
+        code, reply = self._begin(conn, pooled, f"MAIL FROM:<{self.sender}>\r\n")
+        if code != 250:
+            conn.rset()
+            raise smtplib.SMTPSenderRefused(code, reply, self.sender)
+        code, reply = conn.rcpt(to)
+        if code not in (250, 251):
+            conn.rset()
+            raise smtplib.SMTPRecipientsRefused({to: (code, reply)})
+        conn.putcmd('data')
+        code, reply = conn.getreply()
+        if code != 354:
+            conn.rset()
+            raise smtplib.SMTPDataError(code, reply)
+        return self._send_data(conn, data)
+
+    def _send_pipelined(self, conn, pooled, to, data):
+        mail = self._begin(conn, pooled, f"MAIL FROM:<{self.sender}>\r\nRCPT TO:<{to}>\r\nDATA\r\n")
+        rcpt = conn.getreply()
+        ready = conn.getreply()
+        if ready[0] == 354 and (mail[0] != 250 or rcpt[0] not in (250, 251)):
+            # The server accepted DATA anyway; abort the transaction cleanly
+            conn.send(b'.\r\n')
+            conn.getreply()
+        if mail[0] != 250:
+            conn.rset()
+            raise smtplib.SMTPSenderRefused(mail[0], mail[1], self.sender)
+        if rcpt[0] not in (250, 251):
+            conn.rset()
+            raise smtplib.SMTPRecipientsRefused({to: rcpt})
+        if ready[0] != 354:
+            conn.rset()
+            raise smtplib.SMTPDataError(*ready)
+        return self._send_data(conn, data)
+
+    def _send_data(self, conn, data):
+        conn.send(_dot_stuff(data) + b'.\r\n')
+        code, reply = conn.getreply()
+        if code != 250:
+            conn.rset()
+            raise smtplib.SMTPDataError(code, reply)
+        return {}
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.quit()
+            except (smtplib.SMTPException, OSError):
+                conn.close()
@@ -32,44 +32,88 @@ class UI:
             print(f"Attachments: None")
 
     @staticmethod
-    def show_stats(stats, args, contacts_df, sent_emails, attachments_list):
+    def show_stats(stats, args, upcoming, attachments_list, rejected=None, personal_attachments=None):
         print(f"\n{YELLOW}Contacts Summary:{RESET}")
-        print(f"- Total Records: {stats['total']}")
+        resumed = stats.get('resumed_from', 0)
+        print(f"- Total Records: {stats['rows'] + resumed}")
+        if resumed:
+            print(f"- Resuming at:   row {resumed + 1} (earlier rows finished in a previous run)")
         if stats['already_sent'] > 0:
             print(f"- Already Sent:  {stats['already_sent']}")
+        if stats.get('split_cells'):
+            print(f"- Split Cells:   {stats['split_cells']} (cells with several addresses, each sent separately; "
+                  f"{stats['total']} addresses in {stats['rows']} records)")
+        if stats.get('rejected'):
+            print(f"- {RED}Rejected:      {stats['rejected']}{RESET} (invalid addresses, will not be sent)")
+            for name, address in rejected or []:
+                print(f"    {name} <{address}>")
+        # personal_attachments: file path -> pending contacts it goes to
+        personal = personal_attachments or {}
+        missing = [path for path in personal if not os.path.isfile(path)]
+        if missing:
+            print(f"- {RED}Missing Files: {len(missing)}{RESET} (contacts listing them will be skipped)")
+            for path in missing[:5]:
+                print(f"    {path}")
         
         if args.stats:
             print(f"- Missing Email: {stats['missing_email']}")
             print(f"- Tagged Skip (!): {stats['manually_skipped']}")
+            print(f"- Duplicates:    {stats['duplicates']}")
+            print(f"- Suppressed:    {stats['suppressed']} (unsubscribed/bounced)")
             
-            if attachments_list:
+            if attachments_list or personal:
                 print(f"\n{YELLOW}Attachment Audit:{RESET}")
                 for att in attachments_list:
                     exists = os.path.exists(att)
                     status = f"{GREEN}OK{RESET}" if exists else f"{RED}MISSING{RESET}"
                     size = UI.format_size(os.path.getsize(att)) if exists else "N/A"
                     print(f"- {os.path.basename(att)}: {status} ({size})")
+                if personal:
+                    found = [path for path in personal if path not in missing]
+                    size = UI.format_size(sum(os.path.getsize(path) for path in found))
+                    print(f"- Per-contact files: {len(personal)} for {sum(personal.values())} contacts "
+                          f"({len(found)} found, {size})")
             
             # Upcoming Batch
-            upcoming = []
-            for _, row in contacts_df.iterrows():
-                email = str(row.get('company_email', '')).strip()
-                name = str(row.get('company_name', '')).strip()
-                if email and not name.startswith('!') and email not in sent_emails:
-                    upcoming.append(f"{name} <{email}>")
-                if len(upcoming) >= 5:
-                    break
-            
             if upcoming:
-                print(f"\n{YELLOW}Upcoming Batch (Next 5):{RESET}")
-                for i, contact in enumerate(upcoming, 1):
-                    print(f"{i}. {contact}")
+                print(f"\n{YELLOW}Upcoming Batch (Next {len(upcoming)}):{RESET}")
+                for i, (name, email) in enumerate(upcoming, 1):
+                    print(f"{i}. {name} <{email}>")
         else:
             if stats['to_be_skipped'] > 0:
                 print(f"- To be Skipped: {stats['to_be_skipped']}")
                 
         print(f"- Net to Send:   {stats['net_to_send']}")
 
+    @staticmethod
+    def show_domains(domains, config, limit=10):
+        """Pending contacts per recipient domain, largest first, with any DOMAIN_RATE(S) cap."""
+        if not domains:
+            return
+        rates = {domain.lower(): rate for domain, rate in (config.get('DOMAIN_RATES') or {}).items()}
+        default_rate = config.get('DOMAIN_RATE')
+        total = sum(domains.values())
+        order = "round-robin" if config.get('DOMAIN_ROUND_ROBIN') else "file order"
+        print(f"\n{YELLOW}Recipient Domains ({len(domains)}, sent in {order}):{RESET}")
+        for domain, count in sorted(domains.items(), key=lambda item: (-item[1], item[0]))[:limit]:
+            rate = rates.get(domain, default_rate)
+            cap = f"  max {rate:g}/s" if rate else ""
+            print(f"- {domain:<30} {count:>7} ({count / total:.0%}){cap}")
+        if len(domains) > limit:
+            rest = sorted(domains.values(), reverse=True)[limit:]
+            print(f"- ...and {len(rest)} more domains with {sum(rest)} contacts")
+
+    @staticmethod
+    def show_template_problems(problems):
+        """Report placeholder problems. Returns False if sending cannot proceed."""
+        for field, count in problems['empty'].items():
+            print(f"{YELLOW}Warning: {count} pending contacts have no value for <<{field}>>.{RESET}")
+        if problems['unknown']:
+            print(f"\n{RED}Error: Template uses fields with no matching contacts column: {', '.join(problems['unknown'])}{RESET}")
+            print(f"Tip: Add these columns to the contacts file or fix the placeholders in the template/subject.")
+            return False
+        return True
+
     @staticmethod
     def show_preview(preview):
         if preview:
@@ -115,10 +159,52 @@ class UI:
         print(f"When you rerun the script, it will skip the {len(data_manager.sent_emails)} emails already sent.")
 
     @staticmethod
-    def show_final_summary(sent, skipped, errors, dry_run, log_file):
+    def show_quota_pause(e, scheduled):
+        print(f"\n{YELLOW}Daily quota reached: {e}{RESET}")
+        print(f"The next sending window opens at {GREEN}{e.next_window:%Y-%m-%d %H:%M}{RESET}.")
+        if scheduled:
+            print("Scheduler mode: waiting for the window, then resuming automatically...")
+        else:
+            print(f"Rerun then, or use {YELLOW}--schedule{RESET} to wait and resume automatically.")
+
+    @staticmethod
+    def show_spool(spool, exported=None, export_path=None):
+        print(f"Rendered messages: {len(spool)} in {YELLOW}{spool.directory}{RESET}")
+        if exported is not None:
+            print(f"Exported {exported} messages to {GREEN}{export_path}{RESET}")
+
+    @staticmethod
+    def show_jobs(jobs):
+        if not jobs:
+            print(f"{YELLOW}No jobs queued.{RESET} Add one with --submit.")
+            return
+        colors = {'done': GREEN, 'failed': RED, 'running': YELLOW}
+        print(f"{'ID':>5}  {'Status':<10} {'Pri':>4} {'Sent':>7} {'Skip':>7} {'Fail':>6}  Contacts")
+        for job in jobs:
+            color = colors.get(job['status'], '')
+            status = f"{color}{job['status']:<10}{RESET if color else ''}"
+            print(f"{job['id']:>5}  {status} {job['priority']:>4} {job['sent']:>7} {job['skipped']:>7} "
+                  f"{job['failed']:>6}  {os.path.basename(job['contacts'])}")
+            if job['status'] == 'queued' and job['not_before']:
+                print(f"{'':>7}waiting until {job['not_before']}")
+            if job['error'] and job['status'] != 'done':
+                print(f"{'':>7}{job['error']}")
+
+    @staticmethod
+    def show_final_summary(sent, skipped, errors, dry_run, log_file, skip_reasons=None, skip_log=None, retry_queue=None):
         print(f"\n{GREEN}Mission complete!{RESET}")
         print(f"Successfully processed: {sent}")
         print(f"Failed: {errors}")
         print(f"Skipped: {skipped}")
+        for reason, count in sorted((skip_reasons or {}).items(), key=lambda item: -item[1]):
+            print(f"  - {reason}: {count}")
+        if skipped and skip_log:
+            print(f"Skipped contacts listed in: {skip_log}")
+        if retry_queue is not None:
+            if retry_queue.dead_lettered:
+                print(f"{YELLOW}Gave up on {retry_queue.dead_lettered} contacts; see {retry_queue.dead_letter_file} "
+                      f"(resend with --replay-dead-letters){RESET}")
+            if retry_queue.entries:
+                print(f"Waiting in the retry queue for the next run: {len(retry_queue.entries)}")
         if not dry_run:
             print(f"Log updated at: {log_file}")
@@ -0,0 +1,107 @@
+"""Per-item handling of Gmail batch responses, against the real client over HttpMockSequence."""
+import pandas as pd
+import pytest
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpMockSequence
+
+import src.engine
+from config import CONFIG
+from src.data_manager import DataManager
+from src.engine import EmailEngine
+from src.template_manager import TemplateManager
+
+BOUNDARY = 'batch_boundary'
+
+def batch_response(*parts):
+    """A multipart batch response; `parts` are (request_id, status, reason, json body)."""
+    chunks = []
+    for request_id, status, reason, body in parts:
+        chunks.append(
+            f"--{BOUNDARY}\r\n"
+            "Content-Type: application/http\r\n"
+            f"Content-ID: <response-id + {request_id}>\r\n\r\n"
+            f"HTTP/1.1 {status} {reason}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n"
+            f"{body}\r\n"
+        )
+    headers = {'status': '200', 'content-type': f'multipart/mixed; boundary="{BOUNDARY}"'}
+    return headers, ''.join(chunks) + f"--{BOUNDARY}--"
+
+def error_body(status, reason, message):
+    return ('{"error": {"code": %d, "message": "%s", "errors": [{"reason": "%s", "message": "%s"}]}}'
+            % (status, message, reason, message))
+
+@pytest.fixture
+def campaign(tmp_path):
+    contacts = tmp_path / 'contacts.csv'
+    pd.DataFrame({
+        'company_name': ['Acme', 'Globex', 'Initech'],
+        'company_email': ['a@acme.com', 'b@globex.com', 'c@initech.com'],
+    }).to_csv(contacts, index=False)
+    template = tmp_path / 'template.txt'
+    template.write_text('Hello <<company_name>>', encoding='utf-8')
+    return str(contacts), str(template), str(tmp_path / 'sent_log.csv')
+
+def run_batched(campaign, responses, monkeypatch):
+    contacts, template, log_file = campaign
+    data_manager = DataManager(contacts, log_file)
+    data_manager.load_contacts()
+    data_manager.load_sent_log()
+    template_manager = TemplateManager(template, 'Hi {company_name}')
+    template_manager.load_template()
+    config = dict(CONFIG, ATTACHMENTS=[], WAIT_SECONDS=0, DAILY_QUOTA=None, ADAPTIVE_RATE=False,
+                  SEND_RATE=1000, SEND_BURST=10, RETRY_QUEUE_FILE=None)
+    http = HttpMockSequence(responses)
+    service = build('gmail', 'v1', http=http, static_discovery=True)
+    waits = []
+    monkeypatch.setattr(src.engine.time, 'sleep', waits.append)
+    counts = EmailEngine(service, data_manager, template_manager, config).run(batch_size=3)
+    data_manager.load_sent_log()
+    return counts, data_manager.sent_emails, waits
+
+def test_batch_items_are_handled_individually(campaign, monkeypatch):
+    first = batch_response(
+        (0, 200, 'OK', '{"id": "1", "labelIds": ["SENT"]}'),
+        (1, 429, 'Too Many Requests', error_body(429, 'rateLimitExceeded', 'Rate limit exceeded')),
+        (2, 403, 'Forbidden', error_body(403, 'forbidden', 'Recipient address rejected')),
+    )
+    # Only the rate-limited message is sent again, as the first item of a new batch
+    retry = batch_response((0, 200, 'OK', '{"id": "2", "labelIds": ["SENT"]}'))
+
+    counts, sent, waits = run_batched(campaign, [first, retry], monkeypatch)
+
+    assert counts == (2, 0, 1)
+    assert sent == {'a@acme.com', 'b@globex.com'}
+    assert waits
+
+@pytest.mark.parametrize('reason', ['rateLimitExceeded', 'userRateLimitExceeded'])
+def test_rate_limit_403_is_retried(campaign, monkeypatch, reason):
+    first = batch_response(
+        (0, 200, 'OK', '{"id": "1", "labelIds": ["SENT"]}'),
+        (1, 403, 'Forbidden', error_body(403, reason, 'User-rate limit exceeded')),
+        (2, 200, 'OK', '{"id": "3", "labelIds": ["SENT"]}'),
+    )
+    retry = batch_response((0, 200, 'OK', '{"id": "2", "labelIds": ["SENT"]}'))
+
+    counts, sent, _ = run_batched(campaign, [first, retry], monkeypatch)
+
+    assert counts == (3, 0, 0)
+    assert sent == {'a@acme.com', 'b@globex.com', 'c@initech.com'}
+
+@pytest.mark.parametrize('reason', ['dailyLimitExceeded', 'quotaExceeded'])
+def test_quota_403_in_a_batch_stops_the_run(campaign, monkeypatch, reason):
+    first = batch_response(
+        (0, 200, 'OK', '{"id": "1", "labelIds": ["SENT"]}'),
+        (1, 403, 'Forbidden', error_body(403, reason, 'Daily sending quota exceeded')),
+        (2, 200, 'OK', '{"id": "3", "labelIds": ["SENT"]}'),
+    )
+
+    with pytest.raises(src.engine.FatalQuotaError):
+        run_batched(campaign, [first], monkeypatch)
+
+    # The messages the batch did deliver are still logged
+    contacts, _, log_file = campaign
+    data_manager = DataManager(contacts, log_file)
+    data_manager.load_sent_log()
+    assert data_manager.sent_emails == {'a@acme.com', 'c@initech.com'}
@@ -0,0 +1,38 @@
+"""Checkpoint watermark advancing and resuming."""
+from src.checkpoint import Checkpoint
+
+def make_checkpoint(tmp_path, **kwargs):
+    contacts = tmp_path / 'contacts.csv'
+    if not contacts.exists():
+        contacts.write_text('company_name,company_email\n', encoding='utf-8')
+    checkpoint = Checkpoint(str(tmp_path / 'checkpoint.json'), str(contacts), **kwargs)
+    checkpoint.resume_row()
+    return checkpoint
+
+def test_out_of_order_rows_advance_once_the_gap_closes(tmp_path):
+    checkpoint = make_checkpoint(tmp_path)
+    for row in (2, 3, 1):
+        checkpoint.done(row)
+    assert checkpoint.row == 0
+
+    checkpoint.done(0)
+    assert checkpoint.row == 4
+
+    checkpoint.save()
+    assert make_checkpoint(tmp_path).row == 4
+
+def test_a_row_that_never_finishes_holds_a_bounded_number_of_rows(tmp_path):
+    checkpoint = make_checkpoint(tmp_path, max_held=10)
+    checkpoint.done(0)
+    # Row 1 failed; the rows after it keep finishing
+    for row in range(2, 1000):
+        checkpoint.done(row)
+
+    assert len(checkpoint._done) <= 10
+    assert checkpoint.row == 1
+    checkpoint.save()
+    assert make_checkpoint(tmp_path).row == 1
+
+    # If row 1 finishes after all, the watermark only moves past rows it still knows are done
+    checkpoint.done(1)
+    assert checkpoint.row == 2
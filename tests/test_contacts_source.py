@@ -0,0 +1,60 @@
+"""Row offsets and resuming in ContactsSource."""
+import pytest
+
+import src.contacts_source
+from src.contacts_source import ContactsSource
+
+HEADER = 'company_name,company_email,notes\n'
+WELL_FORMED = [
+    'Acme,a@acme.com,plain',
+    '"Globex, Inc.",b@globex.com,"two\nlines"',
+    '"Initech ""IT""",c@initech.com,',
+    '',
+    'Umbrella,d@umbrella.com,"ends with ""quote"""',
+    'Hooli,e@hooli.com,last',
+]
+
+def write(tmp_path, rows):
+    path = tmp_path / 'contacts.csv'
+    path.write_text(HEADER + '\n'.join(rows) + '\n', encoding='utf-8')
+    return str(path)
+
+def read_all(source, start=0, seek=None):
+    frames = list(source.chunks(start, seek))
+    return [tuple(row) for frame in frames for row in frame.itertuples()]
+
+@pytest.fixture(params=[3, 1024 * 1024], ids=['small blocks', 'one block'])
+def scan_block(request, monkeypatch):
+    monkeypatch.setattr(src.contacts_source, 'SCAN_BLOCK', request.param)
+
+def test_seeking_resumes_at_the_same_rows(tmp_path, scan_block):
+    source = ContactsSource(write(tmp_path, WELL_FORMED), chunk_size=2)
+    rows = read_all(source)
+    assert [row[1] for row in rows] == ['Acme', 'Globex, Inc.', 'Initech "IT"', 'Umbrella', 'Hooli']
+
+    assert source.seekable
+    seek = (4, source.offset(4))
+    assert ContactsSource(source.path, chunk_size=2).offset(4) is None
+    assert read_all(ContactsSource(source.path, chunk_size=2), 4, seek) == rows[4:]
+    assert read_all(ContactsSource(source.path, chunk_size=2), 3) == rows[3:]
+
+@pytest.mark.parametrize('stray', ['Acme 5" Disks,a@acme.com,x', '"Acme" Disks,a@acme.com,x'])
+def test_literal_quotes_turn_seeking_off(tmp_path, scan_block, stray):
+    lines = WELL_FORMED[:2] + [stray] + [f'Company {i},c{i}@example.com,"n\n{i}"' for i in range(6)]
+    source = ContactsSource(write(tmp_path, lines), chunk_size=2)
+    rows = read_all(source)
+    assert len(rows) == 9
+
+    assert not source.seekable
+    assert source.offset(8) is None
+    # Without a usable scan, resuming parses the rows before the resume point and drops them
+    assert read_all(ContactsSource(source.path, chunk_size=2), 6) == rows[6:]
+
+def test_line_endings_the_scan_does_not_know(tmp_path):
+    path = tmp_path / 'contacts.csv'
+    path.write_bytes(b'company_name,company_email\rA,a@x.com\rB,b@x.com\rC,c@x.com\r')
+    source = ContactsSource(str(path), chunk_size=2)
+
+    assert [row[1] for row in read_all(source)] == ['A', 'B', 'C']
+    assert not source.seekable
+    assert [row[1] for row in read_all(ContactsSource(str(path), chunk_size=2), 2)] == ['C']
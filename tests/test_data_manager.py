@@ -0,0 +1,37 @@
+"""DataManager summaries of the contacts list."""
+import pandas as pd
+
+from benchmarks.fake_gmail import FakeGmailService
+from config import CONFIG
+from src.data_manager import DataManager
+from src.engine import EmailEngine
+from src.template_manager import TemplateManager
+
+def test_split_cells_count_rows_and_addresses_separately(tmp_path):
+    contacts = tmp_path / 'contacts.csv'
+    pd.DataFrame({
+        'company_name': ['Acme', 'Globex', '!Initech', 'Hooli'],
+        'company_email': ['a@acme.com; sales@acme.com', 'b@globex.com', 'c@initech.com',
+                          'Hooli <d@hooli.com>, e@hooli.com'],
+    }).to_csv(contacts, index=False)
+    data_manager = DataManager(str(contacts), str(tmp_path / 'sent_log.csv'))
+    data_manager.load_contacts()
+    data_manager.load_sent_log()
+
+    stats = data_manager.summarize()['stats']
+
+    assert (stats['rows'], stats['total'], stats['split_cells']) == (4, 6, 2)
+    assert (stats['net_to_send'], stats['manually_skipped']) == (5, 1)
+    assert (data_manager.total_rows, data_manager.total_addresses) == (4, 6)
+
+    template = tmp_path / 'template.txt'
+    template.write_text('Hello <<company_name>>', encoding='utf-8')
+    template_manager = TemplateManager(str(template), 'Hi {company_name}')
+    template_manager.load_template()
+    config = dict(CONFIG, ATTACHMENTS=[], WAIT_SECONDS=0, DAILY_QUOTA=None, ADAPTIVE_RATE=False,
+                  RETRY_QUEUE_FILE=None)
+    engine = EmailEngine(FakeGmailService(), data_manager, template_manager, config)
+
+    assert engine.run() == (5, 1, 0)
+    # The progress total is the number of addresses, one step each
+    assert engine.total == 6
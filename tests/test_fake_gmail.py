@@ -0,0 +1,106 @@
+"""The offline path the benchmarks run on: FakeGmailService and EmailEngine against it."""
+import base64
+import email
+
+import pandas as pd
+import pytest
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_gmail import FakeGmailService
+from config import CONFIG
+from src.data_manager import DataManager
+from src.engine import EmailEngine
+from src.template_manager import TemplateManager
+
+def raw(address):
+    return {'raw': base64.urlsafe_b64encode(f'To: {address}\r\n\r\nHello'.encode()).decode()}
+
+def test_send_delivers_and_counts():
+    service = FakeGmailService(keep_messages=True)
+
+    response = service.users().messages().send(userId='me', body=raw('a@acme.com')).execute()
+
+    assert response == {'id': '1', 'labelIds': ['SENT']}
+    assert service.sent == 1
+    assert service.bytes_received == len(raw('a@acme.com')['raw'])
+    assert service.delivered == [raw('a@acme.com')]
+
+def test_injected_errors():
+    throttled = FakeGmailService(rate_limit_rate=1.0, retry_after=3)
+    with pytest.raises(HttpError) as error:
+        throttled.send(body=raw('a@acme.com')).execute()
+    assert error.value.resp.status == 429
+    assert error.value.resp['retry-after'] == '3'
+
+    forbidden = FakeGmailService(forbidden_rate=1.0)
+    with pytest.raises(HttpError) as error:
+        forbidden.send(body=raw('a@acme.com')).execute()
+    assert error.value.resp.status == 403
+    assert (throttled.rate_limited, forbidden.forbidden, throttled.sent + forbidden.sent) == (1, 1, 0)
+
+def test_batch_calls_back_per_request():
+    service = FakeGmailService(rate_limit_rate=0.5, seed=1)
+    results = {}
+    batch = service.new_batch_http_request(callback=lambda request_id, response, exception: results.update(
+        {request_id: exception.resp.status if exception else response['id']}))
+    for i in range(10):
+        batch.add(service.send(body=raw(f'c{i}@acme.com')), request_id=str(i))
+
+    batch.execute()
+
+    assert service.batches == 1
+    assert sorted(results) == sorted(map(str, range(10)))
+    assert list(results.values()).count(429) == service.rate_limited > 0
+
+@pytest.fixture
+def campaign(tmp_path):
+    contacts = tmp_path / 'contacts.csv'
+    pd.DataFrame({
+        'company_name': [f'Company {i}' if i % 5 else f'!Company {i}' for i in range(20)],
+        'company_email': [f'contact{i}@domain{i % 3}.example.com' for i in range(20)],
+    }).to_csv(contacts, index=False)
+    template = tmp_path / 'template.txt'
+    template.write_text('Hello <<company_name>>', encoding='utf-8')
+    return tmp_path
+
+def run_engine(campaign, service, **overrides):
+    data_manager = DataManager(str(campaign / 'contacts.csv'), str(campaign / 'sent_log.csv'))
+    data_manager.load_contacts()
+    data_manager.load_sent_log()
+    template_manager = TemplateManager(str(campaign / 'template.txt'), 'Hi {company_name}')
+    template_manager.load_template()
+    config = dict(CONFIG, ATTACHMENTS=[], WAIT_SECONDS=0, DAILY_QUOTA=None, ADAPTIVE_RATE=False,
+                  SEND_RATE=10000, SEND_BURST=8, RETRY_QUEUE_FILE=str(campaign / 'retry_queue.jsonl'),
+                  DEAD_LETTER_FILE=str(campaign / 'dead_letters.jsonl'), RETRY_BASE_DELAY=0.01)
+    config.update(overrides)
+    return EmailEngine(service, data_manager, template_manager, config).run(
+        workers=config.get('MAX_WORKERS', 1), batch_size=config.get('BATCH_SIZE', 0))
+
+@pytest.mark.parametrize('mode', [{}, {'MAX_WORKERS': 4}, {'BATCH_SIZE': 5}])
+def test_engine_sends_every_pending_contact(campaign, mode):
+    service = FakeGmailService(keep_messages=True)
+
+    sent, skipped, errors = run_engine(campaign, service, **mode)
+
+    assert (sent, skipped, errors) == (16, 4, 0)
+    recipients = {email.message_from_bytes(base64.urlsafe_b64decode(body['raw']))['To']
+                  for body in service.delivered}
+    assert recipients == {f'contact{i}@domain{i % 3}.example.com' for i in range(20) if i % 5}
+    assert service.batches == (4 if mode.get('BATCH_SIZE') else 0)
+
+def test_engine_defers_rate_limited_sends_until_delivered(campaign):
+    service = FakeGmailService(rate_limit_rate=0.3, retry_after=0, seed=2)
+
+    sent, skipped, errors = run_engine(campaign, service, MAX_SEND_ATTEMPTS=20)
+
+    assert (sent, skipped, errors) == (16, 4, 0)
+    assert service.rate_limited > 0
+    assert service.sent == 16
+
+def test_engine_counts_rejected_recipients_as_failed(campaign):
+    service = FakeGmailService(forbidden_rate=1.0)
+
+    sent, skipped, errors = run_engine(campaign, service, RETRY_QUEUE_FILE=None)
+
+    assert (sent, skipped, errors) == (0, 4, 16)
+    assert service.forbidden == 16
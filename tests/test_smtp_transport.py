@@ -0,0 +1,62 @@
+"""SmtpTransport against the local stand-in server (benchmarks/fake_smtp.py)."""
+import smtplib
+import time
+
+import pytest
+
+from benchmarks.fake_smtp import FakeSmtpServer
+from src.transport import SmtpTransport
+
+MESSAGE = b'Subject: Hello\n\nHello there\n.leading dot\n'
+
+@pytest.fixture
+def server():
+    with FakeSmtpServer(keep_messages=True) as server:
+        yield server
+
+def transport_for(server, **kwargs):
+    host, port = server.address
+    return SmtpTransport(host, port, sender='me@example.com', starttls=False, **kwargs)
+
+def wait_for_drop(server):
+    deadline = time.monotonic() + 5
+    while server.clients and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_sends_over_one_connection(server, pipelining):
+    transport = transport_for(server, pipelining=pipelining)
+
+    for i in range(3):
+        transport.send(MESSAGE, f'c{i}@example.com')
+    transport.close()
+
+    assert (server.sent, server.connections) == (3, 1)
+    sender, recipients, data = server.delivered[0]
+    assert (sender, recipients) == ('me@example.com', ['c0@example.com'])
+    assert data.startswith(b'From: me@example.com\r\n') and b'\r\n.leading dot\r\n' in data
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_connection_closed_while_idle_is_replaced(server, pipelining):
+    transport = transport_for(server, pipelining=pipelining)
+    transport.send(MESSAGE, 'a@example.com')
+    server.drop_connections()
+    wait_for_drop(server)
+
+    transport.send(MESSAGE, 'b@example.com')
+
+    assert (server.sent, server.connections) == (2, 2)
+    assert [recipients for _, recipients, _ in server.delivered] == [['a@example.com'], ['b@example.com']]
+
+@pytest.mark.parametrize('pipelining', [True, False])
+def test_disconnect_after_data_is_not_resent(pipelining):
+    with FakeSmtpServer() as server:
+        transport = transport_for(server, pipelining=pipelining)
+        transport.send(MESSAGE, 'a@example.com')
+        server.unanswered = 1
+
+        # The server stored the message but the reply never came: resending could duplicate it
+        with pytest.raises(smtplib.SMTPServerDisconnected):
+            transport.send(MESSAGE, 'b@example.com')
+
+        assert server.sent == 2
@@ -0,0 +1,45 @@
+"""Suppression index: normalization and source configuration."""
+import json
+
+import pytest
+
+from src.suppression import BOUNCE, UNSUBSCRIBE, load_suppression_index, normalize_address
+
+def test_normalize_address_matches_contact_cleaning():
+    assert normalize_address(' Ａlice＠Example.com ') == 'alice@example.com'
+    assert normalize_address('\u200bbob@example.com\ufeff') == 'bob@example.com'
+    assert normalize_address('carol\u200d@example.com') == 'carol@example.com'
+
+def test_sources_are_looked_up_by_normalized_address(tmp_path):
+    unsubscribes = tmp_path / 'unsubscribes.txt'
+    unsubscribes.write_text('\u200bAlice@Example.com\n# comment\nbob@example.com\n', encoding='utf-8')
+    bounces = tmp_path / 'bounces.csv'
+    bounces.write_text('email,reason\nＢob@example.com,mailbox full\n', encoding='utf-8')
+
+    index = load_suppression_index({'unsubscribe': str(unsubscribes), 'bounce': [str(bounces)]},
+                                   str(tmp_path / 'index' / 'suppression'))
+
+    assert index.lookup('alice@example.com') == UNSUBSCRIBE
+    assert index.lookup('BOB@example.com\u200b') == UNSUBSCRIBE | BOUNCE
+    assert index.lookup('carol@example.com') == 0
+
+def test_index_built_with_older_normalization_is_rebuilt(tmp_path):
+    unsubscribes = tmp_path / 'unsubscribes.txt'
+    unsubscribes.write_text('\u200balice@example.com\n', encoding='utf-8')
+    sources = {'unsubscribe': str(unsubscribes)}
+    base = str(tmp_path / 'suppression')
+    load_suppression_index(sources, base)
+    # What an index written before zero-width characters were dropped kept as its fingerprint
+    with open(f'{base}.meta.json', 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    with open(f'{base}.meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta['sources'], f)
+
+    assert load_suppression_index(sources, base).lookup('alice@example.com') == UNSUBSCRIBE
+
+def test_unknown_source_name_is_a_config_error(tmp_path):
+    path = tmp_path / 'complaints.txt'
+    path.write_text('a@example.com\n', encoding='utf-8')
+
+    with pytest.raises(ValueError, match="Unknown SUPPRESSION_FILES source: 'complaint'"):
+        load_suppression_index({'unsubscribe': str(path), 'complaint': str(path)}, str(tmp_path / 'suppression'))